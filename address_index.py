@@ -0,0 +1,249 @@
+import os
+import time
+import random
+import hashlib
+
+# "on": address_history is maintained by insert_mapped_data, "off": skip it (e.g. during bulk loads)
+ADDRESS_INDEX = os.getenv("ADDRESS_INDEX", "on")
+# Rows per history page
+PAGE_SIZE = 100
+
+# One row per funded output, clustered by (scripthash, height) so an address's history
+# is a single index seek plus a sequential read. Keys are binary to keep the index small.
+ADDRESS_INDEX_DDL = """
+CREATE TABLE IF NOT EXISTS address_history (
+    scripthash BINARY(32) NOT NULL,    -- sha256(scriptPubKey)
+    height INTEGER NOT NULL,
+    txid BINARY(32) NOT NULL,
+    vout INTEGER NOT NULL,
+    value BIGINT NOT NULL,             -- satoshis
+    spent_txid BINARY(32) NULL,
+    spent_height INTEGER NULL,
+    PRIMARY KEY (scripthash, height, txid, vout),
+    UNIQUE KEY uq_address_history_outpoint (txid, vout),
+    KEY idx_address_history_height (height),
+    KEY idx_address_history_spent_height (spent_height)
+)
+"""
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BECH32M_CONST = 0x2bc830a3
+
+
+def create_address_index(cursor):
+    """Create address_history (DDL commits implicitly, so call before any DML)"""
+    cursor.execute(ADDRESS_INDEX_DDL)
+
+
+def _base58check_decode(address):
+    value = 0
+    for char in address:
+        value = value * 58 + BASE58_ALPHABET.index(char)
+    raw = value.to_bytes(25, "big")
+    if hashlib.sha256(hashlib.sha256(raw[:-4]).digest()).digest()[:4] != raw[-4:]:
+        raise ValueError(f"Bad checksum: {address}")
+    return raw[0], raw[1:-4]
+
+
+def _bech32_polymod(values):
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if (top >> i) & 1 else 0
+    return chk
+
+
+def _segwit_decode(address):
+    address = address.lower()
+    hrp, data = address.rsplit("1", 1)
+    values = [BECH32_CHARSET.index(char) for char in data]
+    check = _bech32_polymod([ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp] + values)
+    version = values[0]
+    if check != (1 if version == 0 else BECH32M_CONST):
+        raise ValueError(f"Bad checksum: {address}")
+    acc, bits, program = 0, 0, []
+    for value in values[1:-6]:
+        acc = (acc << 5) | value
+        bits += 5
+        while bits >= 8:
+            bits -= 8
+            program.append((acc >> bits) & 0xff)
+    return version, bytes(program)
+
+
+def address_to_script(address):
+    """scriptPubKey bytes for a mainnet/testnet P2PKH, P2SH or segwit address"""
+    if address.lower().startswith(("bc1", "tb1", "bcrt1")):
+        version, program = _segwit_decode(address)
+        return bytes([version + 0x50 if version else 0, len(program)]) + program
+    prefix, payload = _base58check_decode(address)
+    if prefix in (0x00, 0x6f):
+        return b"\x76\xa9\x14" + payload + b"\x88\xac"
+    if prefix in (0x05, 0xc4):
+        return b"\xa9\x14" + payload + b"\x87"
+    raise ValueError(f"Unsupported address: {address}")
+
+
+def scripthash(address=None, script_hex=None):
+    """Index key: sha256 of the output script, given an address or the script hex"""
+    script = bytes.fromhex(script_hex) if script_hex is not None else address_to_script(address)
+    return hashlib.sha256(script).digest()
+
+
+def unindex_height(cursor, height):
+    """Undo a height's entries before it is re-ingested (retry or reorg)"""
+    cursor.execute("DELETE FROM address_history WHERE height = %s", (height,))
+    cursor.execute("""
+        UPDATE address_history SET spent_txid = NULL, spent_height = NULL
+        WHERE spent_height = %s
+    """, (height,))
+
+
+def index_mapped_block(cursor, mapped_data, height):
+    """Add a mapped block's outputs to address_history and mark the outputs its inputs spend
+
+    `mapped_data` is the output of map_json_to_tables; vin/vout entries are (row, raw) tuples.
+    Returns (outputs indexed, outputs marked spent).
+    """
+    outputs = []
+    for vout_data, vout_raw in mapped_data.get("vout", []):
+        script = vout_raw.get("scriptPubKey") or {}
+        if not script.get("hex") or script.get("type") == "nulldata":
+            continue
+        outputs.append((
+            hashlib.sha256(bytes.fromhex(script["hex"])).digest(), height,
+            bytes.fromhex(vout_data["txid"]), vout_raw["n"], int(round(vout_raw.get("value", 0) * 100_000_000)),
+        ))
+    cursor.executemany("""
+        INSERT IGNORE INTO address_history (scripthash, height, txid, vout, value)
+        VALUES (%s, %s, %s, %s, %s)
+    """, outputs)
+
+    spends = [
+        (bytes.fromhex(vin_data["txid"]), height, bytes.fromhex(vin_raw["txid"]), vin_raw["vout"])
+        for vin_data, vin_raw in mapped_data.get("vin", [])
+        if "txid" in vin_raw
+    ]
+    cursor.executemany("""
+        UPDATE address_history SET spent_txid = %s, spent_height = %s
+        WHERE txid = %s AND vout = %s
+    """, spends)
+    return len(outputs), len(spends)
+
+
+def _encode_page_token(height, txid, vout):
+    return f"{height}:{bytes(txid).hex()}:{vout}"
+
+
+def _decode_page_token(token):
+    height, txid, vout = token.split(":")
+    return int(height), bytes.fromhex(txid), int(vout)
+
+
+def lookup_history(cursor, key, limit=PAGE_SIZE, after=None, unspent_only=False):
+    """One page of an address's history in height order
+
+    `key` is a scripthash (see scripthash()); `after` is the `next` token of the previous
+    page. Keyset pagination keeps every page an index range scan, however deep.
+    """
+    sql = "SELECT height, txid, vout, value, spent_txid, spent_height FROM address_history WHERE scripthash = %s"
+    args = [key]
+    if after:
+        sql += " AND (height, txid, vout) > (%s, %s, %s)"
+        args.extend(_decode_page_token(after))
+    if unspent_only:
+        sql += " AND spent_txid IS NULL"
+    sql += " ORDER BY height, txid, vout LIMIT %s"
+    args.append(limit)
+    cursor.execute(sql, args)
+    rows = cursor.fetchall()
+    items = [
+        {
+            "height": height,
+            "txid": bytes(txid).hex(),
+            "vout": vout,
+            "value": value / 100_000_000,
+            "spent": spent_txid is not None,
+            "spent_txid": bytes(spent_txid).hex() if spent_txid is not None else None,
+            "spent_height": spent_height,
+        }
+        for height, txid, vout, value, spent_txid, spent_height in rows
+    ]
+    next_token = _encode_page_token(*rows[-1][:3]) if len(rows) == limit else None
+    return {"items": items, "next": next_token}
+
+
+def _synthetic_mapped_block(height, txs, addresses, rng):
+    vout, vin = [], []
+    for index in range(txs):
+        txid = hashlib.sha256(f"tx:{height}:{index}".encode()).hexdigest()
+        for n in range(2):
+            # Skewed towards a few busy addresses, like real reuse
+            script_hex = "0014" + hashlib.sha256(f"addr:{int(rng.paretovariate(1.2)) % addresses}".encode()).hexdigest()[:40]
+            vout.append(({"txid": txid}, {"value": rng.randint(1, 10 ** 8) / 10 ** 8, "n": n,
+                                          "scriptPubKey": {"hex": script_hex, "type": "witness_v0_keyhash",
+                                                           "address": f"bc1stub{script_hex[4:24]}"}}))
+        if height and index:
+            prev = hashlib.sha256(f"tx:{height - 1}:{index}".encode()).hexdigest()
+            vin.append(({"txid": txid}, {"txid": prev, "vout": 0}))
+    return {"vout": vout, "vin": vin}
+
+
+def benchmark_address_history(conn, blocks=2000, txs_per_block=200, addresses=50_000, queries=200, seed=0):
+    """History lookups via address_history vs the script_pubkey.address scan joined to vout/transaction
+
+    Loads synthetic blocks into both layouts of a scratch database first.
+    """
+    rng = random.Random(seed)
+    with conn.cursor() as cursor:
+        create_address_index(cursor)
+        vout_id = 0
+        for height in range(blocks):
+            mapped = _synthetic_mapped_block(height, txs_per_block, addresses, rng)
+            index_mapped_block(cursor, mapped, height)
+            txids = sorted({vout_data["txid"] for vout_data, _ in mapped["vout"]})
+            cursor.executemany("INSERT IGNORE INTO transaction (txid, height) VALUES (%s, %s)",
+                               [(txid, height) for txid in txids])
+            cursor.executemany("INSERT INTO vout (id, txid, height, value, n) VALUES (%s, %s, %s, %s, %s)",
+                               [(vout_id + i, vout_data["txid"], height, raw["value"], raw["n"])
+                                for i, (vout_data, raw) in enumerate(mapped["vout"])])
+            cursor.executemany("INSERT INTO script_pubkey (vout_id, hex, address, type) VALUES (%s, %s, %s, %s)",
+                               [(vout_id + i, raw["scriptPubKey"]["hex"], raw["scriptPubKey"]["address"],
+                                 raw["scriptPubKey"]["type"]) for i, (_, raw) in enumerate(mapped["vout"])])
+            vout_id += len(mapped["vout"])
+            conn.commit()
+
+        sample = [rng.randrange(addresses) for _ in range(queries)]
+        scripts = ["0014" + hashlib.sha256(f"addr:{i}".encode()).hexdigest()[:40] for i in sample]
+
+        started = time.perf_counter()
+        for script_hex in scripts:
+            cursor.execute("""
+                SELECT t.height, o.txid, o.n, o.value
+                FROM script_pubkey sp
+                JOIN vout o ON o.id = sp.vout_id
+                JOIN transaction t ON t.txid = o.txid
+                WHERE sp.address = %s
+                ORDER BY t.height
+                LIMIT %s
+            """, (f"bc1stub{script_hex[4:24]}", PAGE_SIZE))
+            cursor.fetchall()
+        scan_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for script_hex in scripts:
+            lookup_history(cursor, scripthash(script_hex=script_hex))
+        index_seconds = time.perf_counter() - started
+
+    report = {
+        "outputs": vout_id,
+        "scan_ms_per_query": round(scan_seconds * 1000 / queries, 2),
+        "index_ms_per_query": round(index_seconds * 1000 / queries, 2),
+    }
+    print(f"⏱️ Address history over {vout_id} outputs: scan {report['scan_ms_per_query']} ms/query, "
+          f"index {report['index_ms_per_query']} ms/query")
+    return report
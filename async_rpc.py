@@ -0,0 +1,178 @@
+import json
+import time
+import asyncio
+
+# Connection pool size per client
+MAX_CONNECTIONS = 256
+# JSON-RPC requests in flight at once
+FETCH_CONCURRENCY = 1000
+# Heights per pipelined JSON-RPC batch
+BATCH_SIZE = 10
+# Decoded verbosity-2 blocks fetched ahead of the writer (the reorder buffer held in memory)
+BUFFER_BLOCKS = 100
+
+
+class ReorderWindow:
+    """Lets batch `index` fetch its blocks only while it is fewer than `size` batches ahead of the writer
+
+    Bounds the batches fetched but not yet written independently of request concurrency.
+    Any batch within the window may proceed, so the one the writer waits for never starves.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.next = 0
+        self._waiting = {}
+
+    async def wait_turn(self, index):
+        if index >= self.next + self.size:
+            event = self._waiting.setdefault(index, asyncio.Event())
+            await event.wait()
+
+    def advance(self):
+        """The writer finished batch `next`; admit the batch that now fits in the window"""
+        self.next += 1
+        event = self._waiting.pop(self.next + self.size - 1, None)
+        if event:
+            event.set()
+
+
+class AsyncRpcClient:
+    """aiohttp JSON-RPC client with a pooled, keep-alive connector"""
+
+    def __init__(self, rpc_url, auth=None, max_connections=MAX_CONNECTIONS, timeout=120):
+        self.rpc_url = rpc_url
+        self.auth = auth
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._session = None
+
+    async def __aenter__(self):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            auth=aiohttp.BasicAuth(*self.auth) if self.auth else None,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"content-type": "text/plain"},
+            json_serialize=json.dumps,
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    async def _post(self, payload):
+        async with self._session.post(self.rpc_url, data=json.dumps(payload)) as response:
+            return await response.json(content_type=None)
+
+    async def call(self, method, params=None):
+        body = await self._post({"jsonrpc": "1.0", "id": method, "method": method, "params": params or []})
+        if body.get("error"):
+            raise RuntimeError(f"RPC error: {body['error']}")
+        return body["result"]
+
+    async def batch(self, calls):
+        """Send [(method, params)] as one pipelined JSON-RPC batch, results in order"""
+        payload = [{"jsonrpc": "1.0", "id": i, "method": method, "params": params}
+                   for i, (method, params) in enumerate(calls)]
+        replies = sorted(await self._post(payload), key=lambda reply: reply["id"])
+        for reply in replies:
+            if reply.get("error"):
+                raise RuntimeError(f"RPC error: {reply['error']}")
+        return [reply["result"] for reply in replies]
+
+    async def fetch_batches(self, batches, queue, window, requests):
+        """Fetch verbosity-2 blocks for each batch of heights and put (batch index, blocks) on `queue`
+
+        `requests` bounds the RPC calls in flight. Block hashes are small and fetched as
+        fast as it allows; the blocks of a batch are only fetched once it is inside the
+        writer's reorder `window`, so fetched-but-unwritten blocks stay bounded.
+        """
+        async def fetch_batch(index, batch_heights):
+            async with requests:
+                hashes = await self.batch([("getblockhash", [height]) for height in batch_heights])
+            await window.wait_turn(index)
+            async with requests:
+                blocks = await self.batch([("getblock", [block_hash, 2]) for block_hash in hashes])
+            await queue.put((index, blocks))
+
+        await asyncio.gather(*[fetch_batch(index, batch_heights) for index, batch_heights in enumerate(batches)])
+
+
+async def run_writer(queue, write, batch_count, window):
+    """Write batches from `queue` with `write(block)` (sync or async) in batch order
+
+    Batches arrive in completion order and are held until every earlier one is written, so
+    blocks are written in height order (address_index marks spends of already-indexed outputs).
+    """
+    pending = {}
+    next_index = 0
+    written = 0
+    while next_index < batch_count:
+        index, blocks = await queue.get()
+        pending[index] = blocks
+        while next_index in pending:
+            for block in pending.pop(next_index):
+                result = write(block)
+                if asyncio.iscoroutine(result):
+                    await result
+                written += 1
+            next_index += 1
+            window.advance()
+    return written
+
+
+async def fetch_range(rpc_url, auth, heights, write, concurrency=FETCH_CONCURRENCY, batch_size=BATCH_SIZE,
+                      buffer_blocks=BUFFER_BLOCKS):
+    """Fetch `heights` concurrently and feed each block to `write` in height order; returns blocks written
+
+    At most `concurrency` requests are in flight and about `buffer_blocks` decoded blocks
+    wait for the writer. If the writer or a fetch fails, the other side is cancelled and
+    the error is raised.
+    """
+    heights = sorted(heights)
+    batches = [heights[offset:offset + batch_size] for offset in range(0, len(heights), batch_size)]
+    queue = asyncio.Queue()
+    window = ReorderWindow(max(1, buffer_blocks // batch_size))
+    requests = asyncio.Semaphore(concurrency)
+    async with AsyncRpcClient(rpc_url, auth, max_connections=min(concurrency, MAX_CONNECTIONS)) as client:
+        fetcher = asyncio.create_task(client.fetch_batches(batches, queue, window, requests))
+        writer = asyncio.create_task(run_writer(queue, write, len(batches), window))
+        try:
+            done, _ = await asyncio.wait({fetcher, writer}, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+            return writer.result()
+        finally:
+            for task in (fetcher, writer):
+                task.cancel()
+            await asyncio.gather(fetcher, writer, return_exceptions=True)
+
+
+def benchmark_async_vs_sync(blocks=1000, latency=0.01, concurrency=FETCH_CONCURRENCY, batch_size=BATCH_SIZE):
+    """Blocks/s of the sync requests client vs the asyncio client against the local RPC stub"""
+    from rpc_stub import StubChain, start_stub_server
+    from executor import fetch_blocks_shard, shard_heights
+
+    # The stub sleeps per call, so it stands in for a node with `latency` seconds of RTT
+    server, url, _ = start_stub_server(StubChain(latency=latency))
+    report = {}
+    try:
+        started = time.perf_counter()
+        for heights in shard_heights(0, blocks - 1, batch_size):
+            fetch_blocks_shard(url, None, heights)
+        report["sync_blocks_per_second"] = round(blocks / (time.perf_counter() - started), 1)
+
+        started = time.perf_counter()
+        written = asyncio.run(fetch_range(url, None, range(blocks), lambda block: None, concurrency, batch_size))
+        report["async_blocks_per_second"] = round(written / (time.perf_counter() - started), 1)
+    finally:
+        server.shutdown()
+    print(f"⏱️ sync: {report['sync_blocks_per_second']} blocks/s, async: {report['async_blocks_per_second']} blocks/s")
+    return report
+
+
+if __name__ == "__main__":
+    benchmark_async_vs_sync()
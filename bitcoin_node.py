@@ -0,0 +1,192 @@
+import modal
+import time
+import signal
+import requests
+
+from tunnel_cache import TunnelUrlCache
+from node_bootstrap import build_bitcoind_args, find_utxo_snapshot, load_utxo_snapshot, wait_for_rpc_ready
+from node_supervisor import BitcoindSupervisor
+
+app = modal.App(name="fy-bitcoin-node")
+
+# ✅ Define the volume for storing Bitcoin data
+bitcoin_data_vol = modal.Volume.from_name("bitcoin-fy-data")
+
+# ✅ Published tunnel url, so lookups don't need a volume reload
+endpoint_dict = modal.Dict.from_name("fy-bitcoin-node-endpoints", create_if_missing=True)
+
+# ✅ Define the Docker image for running bitcoind
+bitcoind_image = modal.Image.from_dockerfile("./Dockerfile")
+
+# ✅ RPC config
+rpc_user = "bitcoinrpc"
+rpc_password = "supersecurepassword"
+
+# common function params
+function_params = {
+    "image": bitcoind_image,
+    "volumes": {"/root/.bitcoin": bitcoin_data_vol},
+}
+
+# ✅ read tunnel url from the volume (slow path)
+def read_tunnel_url_from_volume():
+    bitcoin_data_vol.reload()  # ✅ make sure the volume is up-to-date
+    with open("/root/.bitcoin/tunnel_url.txt", "r") as f:
+        rpc_url = f.read().strip()
+        print(f"✅ Readed Tunnel URL: {rpc_url}")
+    return rpc_url
+
+# ✅ look up the published tunnel url, falling back to the volume
+def load_tunnel_url():
+    rpc_url = endpoint_dict.get("tunnel_url")
+    if rpc_url:
+        return rpc_url
+    return read_tunnel_url_from_volume()
+
+tunnel_url_cache = TunnelUrlCache(load_tunnel_url)
+
+# ✅ read tunnel url (cached)
+def read_tunnel_url():
+    return tunnel_url_cache.get()
+
+# ✅ send rpc request
+def send_rpc_request(rpc_url, method, params=[]):
+    payload = {
+        "jsonrpc": "1.0",
+        "id": method,
+        "method": method,
+        "params": params
+    }
+    try:
+        return requests.post(rpc_url, auth=(rpc_user, rpc_password), json=payload)
+    except requests.exceptions.ConnectionError:
+        # ✅ tunnel moved (node restarted), drop the cached url and retry once
+        tunnel_url_cache.invalidate()
+        return requests.post(read_tunnel_url(), auth=(rpc_user, rpc_password), json=payload)
+
+# ✅ rpc call returning the result, raising on RPC errors
+def rpc_result(rpc_url, method, params=[], timeout=60 * 60):
+    response = requests.post(
+        rpc_url,
+        auth=(rpc_user, rpc_password),
+        json={"jsonrpc": "1.0", "id": method, "method": method, "params": params},
+        timeout=timeout,
+    )
+    body = response.json()
+    if body.get("error"):
+        raise RuntimeError(f"RPC error: {body['error']}")
+    return body["result"]
+
+# ✅ rpc call to bitcoind inside the node container
+def local_rpc(method, params=[], timeout=60 * 60):
+    return rpc_result("http://127.0.0.1:8332", method, params, timeout)
+
+# ✅ block until the node answers RPC (skipped once run_bitcoind reported ready)
+def wait_until_node_ready():
+    if endpoint_dict.get("rpc_ready"):
+        return
+    wait_for_rpc_ready(lambda method, params: rpc_result(read_tunnel_url(), method, params))
+
+@app.function(
+    image=bitcoind_image,
+    volumes={"/root/.bitcoin": bitcoin_data_vol},
+    timeout=60 * 60 * 24,  # longest timeout
+    keep_warm=1,           # keep warm for 1 hour
+)
+def run_bitcoind(fast_start: bool = True):
+    endpoint_dict["rpc_ready"] = False
+    with modal.forward(8332, unencrypted=True) as tunnel:
+        print(f"🔗 Tunnel URL: {tunnel.url}")
+        print(f"🔌 Tunnel TLS Socket: {tunnel.tls_socket}")
+
+
+        # ✅ save tunnel url to a file
+        with open("/root/.bitcoin/tunnel_url.txt", "w") as f:
+            f.write(tunnel.url)
+            
+        bitcoin_data_vol.commit()
+
+        # ✅ publish tunnel url for O(1) lookup
+        endpoint_dict["tunnel_url"] = tunnel.url
+        
+        # ✅ report time-to-RPC-ready (on first start and after every restart)
+        def on_ready(ready_seconds):
+            print(f"⏱️ Time to RPC ready: {ready_seconds:.1f}s (fast_start={fast_start})")
+            endpoint_dict["rpc_ready_seconds"] = ready_seconds
+            endpoint_dict["rpc_ready"] = True
+
+            # ✅ activate an assumeutxo snapshot stored on the volume
+            snapshot = find_utxo_snapshot()
+            if snapshot:
+                try:
+                    load_utxo_snapshot(local_rpc, snapshot)
+                    bitcoin_data_vol.commit()
+                except Exception as e:
+                    print(f"❌ Failed to load UTXO snapshot: {e}")
+
+        # ✅ persist chainstate whenever bitcoind stops (restart or shutdown)
+        def on_stop():
+            endpoint_dict["rpc_ready"] = False
+            bitcoin_data_vol.commit()
+            print("✅ Volume committed after bitcoind shutdown")
+
+        # ✅ supervise bitcoind: log streaming, liveness checks, restart with backoff
+        supervisor = BitcoindSupervisor(build_bitcoind_args(fast_start), local_rpc, on_ready=on_ready, on_stop=on_stop)
+        signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: supervisor.stop())
+        supervisor.run()
+
+
+@app.function(**function_params)
+def get_latest_block():
+    wait_until_node_ready()
+    rpc_url = read_tunnel_url()
+    response = send_rpc_request(rpc_url, "getbestblockhash")
+    best_block_hash = response.json().get("result")
+
+    if best_block_hash:
+        response = send_rpc_request(rpc_url, "getblock", [best_block_hash, 2])
+        print(response.json())
+        return response.json()
+
+    return {"error": "Failed to fetch block hash"}
+
+@app.function(**function_params)
+def get_block_count():
+    wait_until_node_ready()
+    rpc_url = read_tunnel_url()
+    response = send_rpc_request(rpc_url, "getblockcount")
+    # ✅ parse response
+    if response.status_code == 200:
+        block_height = response.json()["result"]
+        print(f"✅ Latest Block Height: {block_height}")
+        return block_height
+    else:
+        print(f"❌ RPC Error: {response.text}")
+        return None
+
+@app.function(**function_params)
+def benchmark_tunnel_lookup(n=20):
+    """Compare per-call tunnel url lookup latency: volume reload vs cache"""
+    def measure(lookup):
+        timings = []
+        for _ in range(n):
+            started = time.perf_counter()
+            lookup()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {"p50_ms": round(timings[len(timings) // 2], 3), "max_ms": round(timings[-1], 3)}
+
+    report = {
+        "volume_reload": measure(read_tunnel_url_from_volume),
+        "modal_dict": measure(lambda: endpoint_dict.get("tunnel_url")),
+        "cached": measure(read_tunnel_url),
+    }
+    for name, stats in report.items():
+        print(f"⏱️ {name}: p50={stats['p50_ms']} ms, max={stats['max_ms']} ms")
+    return report
+
+@app.local_entrypoint()
+def main():
+    print("Starting bitcoind in a Modal container...")
+    bitcoind_future = run_bitcoind.spawn()
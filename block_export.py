@@ -0,0 +1,179 @@
+import io
+import json
+
+# Heights covered by one server-side query; keeps each statement's index range and snapshot short
+CHUNK_BLOCKS = 100
+# Rows pulled from the server-side cursor per batch (one NDJSON chunk / Arrow record batch)
+BATCH_ROWS = 5000
+
+# Exportable tables and the column that makes (height, key) unique and index-ordered
+EXPORT_TABLES = {
+    "bitcoin_block": "hash",
+    "transaction": "txid",
+    "vin": "id",
+    "vout": "id",
+}
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def ensure_export_indexes(cursor):
+    """Add a height index to tables created before it was in the schema
+
+    InnoDB appends the primary key to secondary indexes, so (height) orders rows by (height, key).
+    """
+    for table in EXPORT_TABLES:
+        cursor.execute("""
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND SEQ_IN_INDEX = 1 AND COLUMN_NAME = 'height'
+        """, (table,))
+        if cursor.fetchone()[0] == 0:
+            print(f"🔧 Adding height index to {table}")
+            cursor.execute(f"ALTER TABLE `{table}` ADD INDEX idx_{table}_height (height)")
+
+
+def resume_token(table, row):
+    """Token for the keyset position just after `row`; pass it back as `after` to resume"""
+    return f"{table}:{row['height']}:{row[EXPORT_TABLES[table]]}"
+
+
+def _parse_token(table, token):
+    token_table, height, key = token.split(":", 2)
+    if token_table != table:
+        raise ValueError(f"Resume token is for {token_table}, not {table}")
+    return int(height), int(key) if EXPORT_TABLES[table] == "id" else key
+
+
+def cold_batches(store, table, start_height, end_height, position=None, batch_rows=BATCH_ROWS):
+    """Yield lists of row dicts for cold-tiered heights in [start, end], (height, key) order, after `position`"""
+    key = EXPORT_TABLES[table]
+    batch = []
+    for record in store.iter_blocks(start_height, end_height):
+        for row in sorted(record.get(table, []), key=lambda row: row[key]):
+            if position and (record["height"], row[key]) <= position:
+                continue
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def export_batches(conn, table, start_height, end_height, after=None,
+                   chunk_blocks=CHUNK_BLOCKS, batch_rows=BATCH_ROWS, cold_store=None, horizon=-1):
+    """Yield lists of row dicts for [start, end] in (height, key) order
+
+    Rows are streamed from a server-side cursor one height chunk at a time, so memory
+    stays at one batch regardless of the range size. Heights at or below the cold
+    `horizon` no longer have transaction/vin/vout rows in MySQL and are read from `cold_store`.
+    """
+    import pymysql.cursors
+    from cold_storage import COLD_TABLES
+
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table: {table}")
+    key = EXPORT_TABLES[table]
+    position = _parse_token(table, after) if after else None
+
+    if table in COLD_TABLES and start_height <= horizon:
+        if cold_store is None:
+            raise ValueError(f"{table} rows at heights <= {horizon} are in the cold tier")
+        cold_end = min(end_height, horizon)
+        if not position or position[0] <= cold_end:
+            yield from cold_batches(cold_store, table, start_height, cold_end, position, batch_rows)
+            position = None
+        start_height = cold_end + 1
+
+    chunk_start = position[0] if position else start_height
+
+    while chunk_start <= end_height:
+        chunk_end = min(chunk_start + chunk_blocks - 1, end_height)
+        sql = f"SELECT * FROM `{table}` WHERE height BETWEEN %s AND %s"
+        args = [chunk_start, chunk_end]
+        if position:
+            sql += f" AND (height, `{key}`) > (%s, %s)"
+            args.extend(position)
+            position = None
+        sql += f" ORDER BY height, `{key}`"
+        with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(sql, args)
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield rows
+        chunk_start = chunk_end + 1
+
+
+def ndjson_chunks(batches):
+    for rows in batches:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in rows).encode()
+
+
+ARROW_TYPES = {
+    "int": "int64", "integer": "int64", "bigint": "int64", "smallint": "int64", "tinyint": "int64",
+    "double": "float64", "float": "float64", "real": "float64", "decimal": "float64",
+    "binary": "binary", "varbinary": "binary", "blob": "binary",
+}
+
+
+def arrow_schema(conn, table):
+    """Arrow schema from the table's column types (string for anything not numeric or binary)"""
+    import pyarrow as pa
+
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY ORDINAL_POSITION
+        """, (table,))
+        columns = cursor.fetchall()
+    return pa.schema([(name, getattr(pa, ARROW_TYPES.get(data_type, "string"))()) for name, data_type in columns])
+
+
+def arrow_chunks(batches, schema):
+    """Arrow IPC stream: the schema message, then one record batch per row batch"""
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    string_columns = [field.name for field in schema if pa.types.is_string(field.type)]
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield drain()
+        for rows in batches:
+            for row in rows:
+                for name in string_columns:
+                    if row[name] is not None and not isinstance(row[name], str):
+                        row[name] = str(row[name])
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+            yield drain()
+    yield drain()
+
+
+def export_stream(conn, table, start_height, end_height, fmt="ndjson", after=None, batch_rows=BATCH_ROWS,
+                  cold_store=None, horizon=-1):
+    """Yield (bytes, resume token after those bytes) for an export in `fmt`"""
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unknown export format: {fmt}")
+    tokens = []
+
+    def tracked():
+        for rows in export_batches(conn, table, start_height, end_height, after, batch_rows=batch_rows,
+                                   cold_store=cold_store, horizon=horizon):
+            tokens.append(resume_token(table, rows[-1]))
+            yield rows
+
+    chunks = ndjson_chunks(tracked()) if fmt == "ndjson" else arrow_chunks(tracked(), arrow_schema(conn, table))
+    for data in chunks:
+        if data:
+            yield data, tokens[-1] if tokens else after
@@ -19,19 +19,23 @@ CREATE TABLE IF NOT EXISTS bitcoin_block (
     previousblockhash VARCHAR(64),
     strippedsize INTEGER,
     size INTEGER,
-    weight INTEGER
+    weight INTEGER,
+    INDEX idx_bitcoin_block_height (height)
 );
 
 -- Table storing Bitcoin transactions
 CREATE TABLE IF NOT EXISTS transaction (
     txid VARCHAR(64) PRIMARY KEY,
     block_hash VARCHAR(64),
+    height INTEGER,
+    tx_index INTEGER,          -- position in the block (coinbase = 0), needed to rebuild the merkle root
     hash VARCHAR(64),
     version INTEGER,
     size INTEGER,
     vsize INTEGER,
     weight INTEGER,
     locktime INTEGER,
+    INDEX idx_transaction_height (height),
     FOREIGN KEY (block_hash) REFERENCES bitcoin_block(hash)
 );
 
@@ -39,8 +43,10 @@ CREATE TABLE IF NOT EXISTS transaction (
 CREATE TABLE IF NOT EXISTS vin (
     id INTEGER PRIMARY KEY AUTO_INCREMENT,
     txid VARCHAR(64),
+    height INTEGER,
     coinbase TEXT,
     sequence INTEGER,
+    INDEX idx_vin_height (height),
     FOREIGN KEY (txid) REFERENCES transaction(txid)
 );
 
@@ -56,8 +62,10 @@ CREATE TABLE IF NOT EXISTS vin_witness (
 CREATE TABLE IF NOT EXISTS vout (
     id INTEGER PRIMARY KEY AUTO_INCREMENT,
     txid VARCHAR(64),
+    height INTEGER,
     value REAL,
     n INTEGER,
+    INDEX idx_vout_height (height),
     FOREIGN KEY (txid) REFERENCES transaction(txid)
 );
 
@@ -71,3 +79,82 @@ CREATE TABLE IF NOT EXISTS script_pubkey (
     type VARCHAR(50),
     FOREIGN KEY (vout_id) REFERENCES vout(id)
 );
+
+-- Per-height ingestion status, written in the same transaction as the block data
+CREATE TABLE IF NOT EXISTS ingestion_ledger (
+    height INTEGER PRIMARY KEY,
+    block_hash VARCHAR(64),
+    status ENUM('pending', 'claimed', 'done') NOT NULL DEFAULT 'pending',
+    content_hash CHAR(64),
+    worker_id VARCHAR(128),
+    claimed_at TIMESTAMP NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_ingestion_ledger_status (status, height)
+);
+
+-- Address index: funded outputs per scriptPubKey hash, clustered for height-ordered history scans
+CREATE TABLE IF NOT EXISTS address_history (
+    scripthash BINARY(32) NOT NULL,    -- sha256(scriptPubKey)
+    height INTEGER NOT NULL,
+    txid BINARY(32) NOT NULL,
+    vout INTEGER NOT NULL,
+    value BIGINT NOT NULL,             -- satoshis
+    spent_txid BINARY(32) NULL,
+    spent_height INTEGER NULL,
+    PRIMARY KEY (scripthash, height, txid, vout),
+    UNIQUE KEY uq_address_history_outpoint (txid, vout),
+    KEY idx_address_history_height (height),
+    KEY idx_address_history_spent_height (spent_height)
+);
+
+-- Per-block statistics from getblockstats (fees and values in satoshis, fee rates in sat/vB)
+CREATE TABLE IF NOT EXISTS block_stats (
+    height INTEGER PRIMARY KEY,
+    blockhash VARCHAR(64),
+    txs INTEGER,
+    ins INTEGER,
+    outs INTEGER,
+    total_out BIGINT,
+    total_size BIGINT,
+    total_weight BIGINT,
+    totalfee BIGINT,
+    avgfee BIGINT,
+    medianfee BIGINT,
+    minfee BIGINT,
+    maxfee BIGINT,
+    avgfeerate BIGINT,
+    minfeerate BIGINT,
+    maxfeerate BIGINT,
+    feerate_p10 BIGINT,
+    feerate_p25 BIGINT,
+    feerate_p50 BIGINT,
+    feerate_p75 BIGINT,
+    feerate_p90 BIGINT,
+    avgtxsize INTEGER,
+    mediantxsize INTEGER,
+    swtxs INTEGER,
+    swtotal_size BIGINT,
+    swtotal_weight BIGINT,
+    subsidy BIGINT,
+    utxo_increase INTEGER,
+    utxo_size_inc BIGINT,
+    time INTEGER,
+    mediantime INTEGER,
+    INDEX idx_block_stats_time (time)
+);
+
+-- Change-data-capture outbox: one row per committed block (connect) or reorged-out block (disconnect)
+CREATE TABLE IF NOT EXISTS block_outbox (
+    event_offset BIGINT PRIMARY KEY,   -- gap-free, allocated from block_outbox_head
+    event ENUM('connect', 'disconnect') NOT NULL,
+    height INTEGER NOT NULL,
+    block_hash VARCHAR(64) NOT NULL,
+    previousblockhash VARCHAR(64),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_block_outbox_created_at (created_at)
+);
+
+CREATE TABLE IF NOT EXISTS block_outbox_head (
+    id TINYINT PRIMARY KEY,
+    last_offset BIGINT NOT NULL
+);
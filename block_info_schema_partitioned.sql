@@ -0,0 +1,103 @@
+CREATE DATABASE IF NOT EXISTS bitcoin;
+USE bitcoin;
+
+-- Height-range partitioned layout of block_info_schema.sql.
+-- MySQL does not support foreign keys on partitioned tables and requires the
+-- partition column in every unique key, so height is part of each primary key
+-- and referential integrity is checked by the writers / bulk_load.find_orphans.
+-- Partitions are added ahead of the tip by partitioning.ensure_partitions_ahead.
+
+-- Table storing general information about a Bitcoin block
+CREATE TABLE IF NOT EXISTS bitcoin_block (
+    hash VARCHAR(64),
+    confirmations INTEGER,
+    height INTEGER NOT NULL,
+    version INTEGER,
+    versionHex VARCHAR(16),
+    merkleroot VARCHAR(64),
+    time INTEGER,
+    mediantime INTEGER,
+    nonce INTEGER,
+    bits VARCHAR(16),
+    difficulty REAL,
+    chainwork VARCHAR(255),
+    nTx INTEGER,
+    previousblockhash VARCHAR(64),
+    strippedsize INTEGER,
+    size INTEGER,
+    weight INTEGER,
+    PRIMARY KEY (hash, height),
+    INDEX idx_bitcoin_block_height (height)
+)
+PARTITION BY RANGE (height) (
+    PARTITION p100000 VALUES LESS THAN (100000),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- Table storing Bitcoin transactions
+CREATE TABLE IF NOT EXISTS transaction (
+    txid VARCHAR(64),
+    block_hash VARCHAR(64),
+    height INTEGER NOT NULL,
+    tx_index INTEGER,          -- position in the block (coinbase = 0), needed to rebuild the merkle root
+    hash VARCHAR(64),
+    version INTEGER,
+    size INTEGER,
+    vsize INTEGER,
+    weight INTEGER,
+    locktime INTEGER,
+    PRIMARY KEY (txid, height),
+    INDEX idx_transaction_block (height, block_hash)
+)
+PARTITION BY RANGE (height) (
+    PARTITION p100000 VALUES LESS THAN (100000),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- Table storing transaction inputs
+CREATE TABLE IF NOT EXISTS vin (
+    id INTEGER AUTO_INCREMENT,
+    txid VARCHAR(64),
+    height INTEGER NOT NULL,
+    coinbase TEXT,
+    sequence INTEGER,
+    PRIMARY KEY (id, height),
+    INDEX idx_vin_txid (height, txid)
+)
+PARTITION BY RANGE (height) (
+    PARTITION p100000 VALUES LESS THAN (100000),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- Table storing witness data for SegWit-enabled transactions
+CREATE TABLE IF NOT EXISTS vin_witness (
+    id INTEGER PRIMARY KEY AUTO_INCREMENT,
+    vin_id INTEGER,
+    witness TEXT,
+    INDEX idx_vin_witness_vin (vin_id)
+);
+
+-- Table storing transaction outputs
+CREATE TABLE IF NOT EXISTS vout (
+    id INTEGER AUTO_INCREMENT,
+    txid VARCHAR(64),
+    height INTEGER NOT NULL,
+    value REAL,
+    n INTEGER,
+    PRIMARY KEY (id, height),
+    INDEX idx_vout_txid (height, txid)
+)
+PARTITION BY RANGE (height) (
+    PARTITION p100000 VALUES LESS THAN (100000),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- Table storing locking script details for Bitcoin transaction outputs
+CREATE TABLE IF NOT EXISTS script_pubkey (
+    vout_id INTEGER PRIMARY KEY,
+    asm TEXT,
+    description TEXT,
+    hex TEXT,
+    address VARCHAR(100),
+    type VARCHAR(50)
+);
@@ -0,0 +1,93 @@
+# Per-block figures from getblockstats, one row per height, so fee and volume
+# analytics don't need to aggregate vin/vout
+BLOCK_STATS_DDL = """
+CREATE TABLE IF NOT EXISTS block_stats (
+    height INTEGER PRIMARY KEY,
+    blockhash VARCHAR(64),
+    txs INTEGER,
+    ins INTEGER,
+    outs INTEGER,
+    total_out BIGINT,          -- satoshis, excluding coinbase
+    total_size BIGINT,
+    total_weight BIGINT,
+    totalfee BIGINT,           -- satoshis
+    avgfee BIGINT,
+    medianfee BIGINT,
+    minfee BIGINT,
+    maxfee BIGINT,
+    avgfeerate BIGINT,         -- sat/vB
+    minfeerate BIGINT,
+    maxfeerate BIGINT,
+    feerate_p10 BIGINT,
+    feerate_p25 BIGINT,
+    feerate_p50 BIGINT,
+    feerate_p75 BIGINT,
+    feerate_p90 BIGINT,
+    avgtxsize INTEGER,
+    mediantxsize INTEGER,
+    swtxs INTEGER,             -- SegWit transactions
+    swtotal_size BIGINT,
+    swtotal_weight BIGINT,
+    subsidy BIGINT,
+    utxo_increase INTEGER,
+    utxo_size_inc BIGINT,
+    time INTEGER,
+    mediantime INTEGER,
+    INDEX idx_block_stats_time (time)
+)
+"""
+
+STATS_FIELDS = [
+    "height", "blockhash", "txs", "ins", "outs", "total_out", "total_size", "total_weight",
+    "totalfee", "avgfee", "medianfee", "minfee", "maxfee", "avgfeerate", "minfeerate", "maxfeerate",
+    "avgtxsize", "mediantxsize", "swtxs", "swtotal_size", "swtotal_weight", "subsidy",
+    "utxo_increase", "utxo_size_inc", "time", "mediantime",
+]
+PERCENTILE_COLUMNS = ["feerate_p10", "feerate_p25", "feerate_p50", "feerate_p75", "feerate_p90"]
+STATS_COLUMNS = STATS_FIELDS + PERCENTILE_COLUMNS
+
+
+def ensure_block_stats_table(cursor):
+    """Create block_stats (DDL commits implicitly, so call before any DML)"""
+    cursor.execute(BLOCK_STATS_DDL)
+
+
+def stats_row(stats):
+    """Map a getblockstats result to a block_stats row"""
+    row = {field: stats.get(field) for field in STATS_FIELDS}
+    percentiles = stats.get("feerate_percentiles") or [None] * len(PERCENTILE_COLUMNS)
+    row.update(zip(PERCENTILE_COLUMNS, percentiles))
+    return row
+
+
+def write_block_stats(cursor, rows):
+    """Upsert block_stats rows (a reorged height is overwritten)"""
+    if not rows:
+        return 0
+    cursor.executemany(f"""
+        INSERT INTO block_stats ({', '.join(STATS_COLUMNS)})
+        VALUES ({', '.join(['%s'] * len(STATS_COLUMNS))})
+        ON DUPLICATE KEY UPDATE
+        {', '.join(f'{col} = VALUES({col})' for col in STATS_COLUMNS if col != 'height')}
+    """, [[row[col] for col in STATS_COLUMNS] for row in rows])
+    return len(rows)
+
+
+def delete_block_stats(cursor, block_hash):
+    """Drop the stats of a block replaced by a reorg"""
+    cursor.execute("DELETE FROM block_stats WHERE blockhash = %s", (block_hash,))
+
+
+def backfill_block_stats(conn, rpc_batch, start_height, end_height, batch_size=100):
+    """Fill block_stats for a height range with one getblockstats batch per `batch_size` heights"""
+    with conn.cursor() as cursor:
+        ensure_block_stats_table(cursor)
+    written = 0
+    for batch_start in range(start_height, end_height + 1, batch_size):
+        heights = range(batch_start, min(batch_start + batch_size, end_height + 1))
+        results = rpc_batch([("getblockstats", [height]) for height in heights])
+        with conn.cursor() as cursor:
+            written += write_block_stats(cursor, [stats_row(stats) for stats in results])
+        conn.commit()
+        print(f"📊 Block stats {heights[0]}..{heights[-1]} written")
+    return written
@@ -0,0 +1,212 @@
+import os
+import json
+import codecs
+
+# Bytes read from the response per chunk
+STREAM_CHUNK_BYTES = 64 * 1024
+# Consumed buffer text is dropped once this many characters (or half the buffer) have been parsed past
+COMPACT_CHARS = 1024 * 1024
+
+WHITESPACE = " \t\n\r"
+
+
+class BlockStream:
+    """Incremental parser for a getblock (verbosity 2) JSON-RPC response
+
+    Reads the response body chunk by chunk and decodes one transaction at a time with
+    raw_decode, so memory holds one chunk plus the transaction being decoded instead of
+    the whole block. Fields before "tx" (hash, height, ...) are in `header` once the first
+    transaction is yielded; the rest once transactions() is exhausted.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self.header = {}
+        self.tx_count = 0
+
+    def _fill(self):
+        if self._eof:
+            return False
+        if self._pos > COMPACT_CHARS or self._pos * 2 > len(self._buffer):
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+        self._buffer += self._decoder.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def _peek(self):
+        """Next non-whitespace character, without consuming it"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of getblock response")
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self._pos} of getblock response")
+        self._pos += 1
+
+    def _value(self):
+        """Decode the next complete JSON value, reading more chunks until it is whole"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+                # A number ending at the buffer edge may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _object_keys(self):
+        """Yield the keys of the object at the cursor; the caller consumes each value"""
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            yield key
+            separator = self._peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or '}}' at offset {self._pos - 1} of getblock response")
+
+    def transactions(self):
+        """Yield the block's transactions in order, filling `header` along the way"""
+        error = None
+        for key in self._object_keys():
+            if key == "result" and self._peek() == "{":
+                yield from self._block()
+            elif key == "error":
+                error = self._value()
+            else:
+                self._value()
+        if error:
+            from rpc_router import RpcError
+            raise RpcError(f"getblock: {error}")
+
+    def _block(self):
+        for key in self._object_keys():
+            if key != "tx":
+                self.header[key] = self._value()
+                continue
+            self._expect("[")
+            if self._peek() == "]":
+                self._pos += 1
+                continue
+            while True:
+                yield self._value()
+                self.tx_count += 1
+                separator = self._peek()
+                self._pos += 1
+                if separator == "]":
+                    break
+                if separator != ",":
+                    raise ValueError(f"Expected ',' or ']' at offset {self._pos - 1} of getblock response")
+
+
+def file_chunks(path, chunk_bytes=STREAM_CHUNK_BYTES):
+    """Chunks of a recorded response file"""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                return
+            yield chunk
+
+
+def record_response(chunks, path):
+    """Save a streamed RPC response body for benchmarks and replays"""
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return path
+
+
+def synthetic_block_response(path, n_tx=5000, inputs=2, outputs=3, witness_bytes=107):
+    """Write a verbosity-2 response shaped like a full mainnet block (for local benchmarks)"""
+    def tx(i):
+        txid = f"{i:064x}"
+        return {
+            "txid": txid, "hash": txid, "version": 2, "size": 400, "vsize": 250, "weight": 1000, "locktime": 0,
+            "vin": [{"txid": f"{i + j:064x}", "vout": j, "scriptSig": {"asm": "", "hex": ""},
+                     "txinwitness": ["ab" * witness_bytes, "cd" * 33], "sequence": 4294967293}
+                    for j in range(inputs)],
+            "vout": [{"value": 0.0001 * (j + 1), "n": j,
+                      "scriptPubKey": {"asm": f"0 {'ef' * 20}", "desc": f"addr(bc1q{i:x}{j})#checksum",
+                                       "hex": "0014" + "ef" * 20, "address": f"bc1q{i:x}{j}",
+                                       "type": "witness_v0_keyhash"}}
+                     for j in range(outputs)],
+            "hex": "02" * 400,
+        }
+
+    header = {"hash": "00" * 32, "confirmations": 1, "height": 800000, "version": 536870912,
+              "versionHex": "20000000", "merkleroot": "11" * 32}
+    trailer = {"time": 1690000000, "mediantime": 1689999000, "nonce": 1, "bits": "17053894",
+               "difficulty": 5.3e13, "chainwork": "00" * 32, "nTx": n_tx, "previousblockhash": "22" * 32,
+               "strippedsize": 800000, "size": 1600000, "weight": 4000000}
+    with open(path, "w") as f:
+        f.write('{"result":' + json.dumps(header)[:-1] + ',"tx":[')
+        for i in range(n_tx):
+            f.write(("," if i else "") + json.dumps(tx(i)))
+        f.write("]," + json.dumps(trailer)[1:] + ',"error":null,"id":"getblock"}')
+    return path
+
+
+def benchmark_parse(path, chunk_bytes=STREAM_CHUNK_BYTES):
+    """Peak traced memory of loading a recorded block into bulk-load TSV rows, whole vs streamed"""
+    import time
+    import tempfile
+    import tracemalloc
+    from bulk_load import TsvChunkWriter, write_block_rows
+
+    results = {"response_bytes": os.path.getsize(path)}
+    ids = {"vin": 1, "vin_witness": 1, "vout": 1}
+
+    def run(label, load):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = TsvChunkWriter(directory)
+            tracemalloc.start()
+            started = time.perf_counter()
+            tx_count = load(writer)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            writer.close()
+        results[label] = {"peak_mb": round(peak / 1e6, 1), "seconds": round(elapsed, 2), "tx": tx_count}
+        print(f"⏱️ {label}: peak {results[label]['peak_mb']} MB, {elapsed:.2f}s, {tx_count} tx")
+
+    def whole(writer):
+        with open(path, "rb") as f:
+            block = json.loads(f.read())["result"]
+        write_block_rows(writer, block, dict(ids))
+        return len(block["tx"])
+
+    def streamed(writer):
+        stream = BlockStream(file_chunks(path, chunk_bytes))
+        write_block_rows(writer, stream, dict(ids))
+        return stream.tx_count
+
+    run("whole", whole)
+    run("streamed", streamed)
+    return results
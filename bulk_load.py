@@ -0,0 +1,440 @@
+import os
+import re
+import time
+import hashlib
+import tempfile
+
+# Column layout of each table, in load order (parents before children)
+TABLE_COLUMNS = {
+    "bitcoin_block": [
+        "hash", "confirmations", "height", "version", "versionHex", "merkleroot", "time", "mediantime",
+        "nonce", "bits", "difficulty", "chainwork", "nTx", "previousblockhash", "strippedsize", "size", "weight",
+    ],
+    "transaction": ["txid", "block_hash", "height", "tx_index", "hash", "version", "size", "vsize", "weight", "locktime"],
+    "vin": ["id", "txid", "height", "coinbase", "sequence"],
+    "vin_witness": ["id", "vin_id", "witness"],
+    "vout": ["id", "txid", "height", "value", "n"],
+    "script_pubkey": ["vout_id", "asm", "description", "hex", "address", "type"],
+}
+
+# Address index rows written alongside the block data: funded outputs, and the spends that are
+# applied to them from a temporary table once the outputs are loaded (see address_index.py)
+ADDRESS_COLUMNS = {
+    "address_history": ["scripthash", "height", "txid", "vout", "value"],
+    "address_spend": ["spent_txid", "spent_height", "txid", "vout"],
+}
+ADDRESS_SPEND_DDL = """
+CREATE TEMPORARY TABLE IF NOT EXISTS address_spend (
+    spent_txid BINARY(32) NOT NULL, spent_height INTEGER NOT NULL, txid BINARY(32) NOT NULL, vout INTEGER NOT NULL
+)
+"""
+
+# Bulk-load tables: primary keys only, no foreign keys or secondary indexes
+BULK_DDL = [
+    """CREATE TABLE IF NOT EXISTS bitcoin_block (
+        hash VARCHAR(64) PRIMARY KEY, confirmations INTEGER, height INTEGER, version INTEGER,
+        versionHex VARCHAR(16), merkleroot VARCHAR(64), time INTEGER, mediantime INTEGER, nonce INTEGER,
+        bits VARCHAR(16), difficulty REAL, chainwork VARCHAR(255), nTx INTEGER, previousblockhash VARCHAR(64),
+        strippedsize INTEGER, size INTEGER, weight INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS transaction (
+        txid VARCHAR(64) PRIMARY KEY, block_hash VARCHAR(64), height INTEGER, tx_index INTEGER, hash VARCHAR(64), version INTEGER,
+        size INTEGER, vsize INTEGER, weight INTEGER, locktime INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS vin (
+        id INTEGER PRIMARY KEY AUTO_INCREMENT, txid VARCHAR(64), height INTEGER, coinbase TEXT, sequence INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS vin_witness (
+        id INTEGER PRIMARY KEY AUTO_INCREMENT, vin_id INTEGER, witness TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS vout (
+        id INTEGER PRIMARY KEY AUTO_INCREMENT, txid VARCHAR(64), height INTEGER, value REAL, n INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS script_pubkey (
+        vout_id INTEGER PRIMARY KEY, asm TEXT, description TEXT, hex TEXT, address VARCHAR(100), type VARCHAR(50)
+    )""",
+]
+
+# Foreign keys of block_info_schema.sql: (table, column, parent table, parent column)
+FOREIGN_KEYS = [
+    ("transaction", "block_hash", "bitcoin_block", "hash"),
+    ("vin", "txid", "transaction", "txid"),
+    ("vin_witness", "vin_id", "vin", "id"),
+    ("vout", "txid", "transaction", "txid"),
+    ("script_pubkey", "vout_id", "vout", "id"),
+]
+
+# Secondary indexes of block_info_schema.sql, rebuilt after the load: (table, index name, columns)
+SECONDARY_INDEXES = [
+    ("bitcoin_block", "idx_bitcoin_block_height", "height"),
+    ("transaction", "idx_transaction_height", "height"),
+    ("vin", "idx_vin_height", "height"),
+    ("vout", "idx_vout_height", "height"),
+]
+
+# Id columns written relative to the load and shifted at LOAD DATA time: column -> table it numbers
+ID_COLUMNS = {
+    "vin": {"id": "vin"},
+    "vin_witness": {"id": "vin_witness", "vin_id": "vin"},
+    "vout": {"id": "vout"},
+    "script_pubkey": {"vout_id": "vout"},
+}
+# Binary key columns, written as hex and decoded with UNHEX at LOAD DATA time
+HEX_COLUMNS = {
+    "address_history": ("scripthash", "txid"),
+    "address_spend": ("spent_txid", "txid"),
+}
+# Named lock held while a load takes its id ranges and inserts, so concurrent loads never share ids
+BULK_LOAD_LOCK = "bulk_load_ids"
+# Seconds to wait for another load to release the id lock
+BULK_LOAD_LOCK_TIMEOUT = 60 * 60
+
+CHUNK_ROWS = 100_000
+
+
+def tsv_value(value):
+    """Encode a value for LOAD DATA's default escaping"""
+    if value is None:
+        return "\\N"
+    text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+class TsvChunkWriter:
+    """Append rows to per-table TSV files, rolling over every `chunk_rows` rows"""
+
+    def __init__(self, directory, chunk_rows=CHUNK_ROWS):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.chunks = {table: [] for table in list(TABLE_COLUMNS) + list(ADDRESS_COLUMNS)}
+        self._files = {}
+        self._rows = {}
+
+    def write(self, table, row):
+        if table not in self._files or self._rows[table] >= self.chunk_rows:
+            self._roll(table)
+        self._files[table].write("\t".join(tsv_value(value) for value in row) + "\n")
+        self._rows[table] += 1
+
+    def _roll(self, table):
+        if table in self._files:
+            self._files[table].close()
+        path = os.path.join(self.directory, f"{table}.{len(self.chunks[table]):05d}.tsv")
+        self._files[table] = open(path, "w", encoding="utf-8")
+        self._rows[table] = 0
+        self.chunks[table].append(path)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+def next_ids(cursor):
+    """First free id of each AUTO_INCREMENT table; bulk rows get explicit ids"""
+    ids = {}
+    for table in ("vin", "vin_witness", "vout"):
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+        ids[table] = cursor.fetchone()[0]
+    return ids
+
+
+def write_block_rows(writer, block, ids):
+    """Write one verbosity-2 block as TSV rows for every table
+
+    `block` is a decoded dict or a BlockStream (see block_stream.py), which is consumed one
+    transaction at a time. The block row is written last: a streamed header is only
+    complete once its transactions have been read.
+    """
+    if isinstance(block, dict):
+        header, transactions = block, block.get("tx", [])
+    else:
+        header, transactions = block.header, block.transactions()
+    for tx_index, tx in enumerate(transactions):
+        write_transaction_rows(writer, header["hash"], header["height"], tx_index, tx, ids)
+    writer.write("bitcoin_block", [header.get(col) for col in TABLE_COLUMNS["bitcoin_block"]])
+    return header
+
+
+def write_transaction_rows(writer, block_hash, height, tx_index, tx, ids):
+    from address_index import ADDRESS_INDEX
+
+    writer.write("transaction", [
+        tx["txid"], block_hash, height, tx_index, tx.get("hash"), tx.get("version"), tx.get("size"),
+        tx.get("vsize"), tx.get("weight"), tx.get("locktime"),
+    ])
+    for vin in tx.get("vin", []):
+        vin_id = ids["vin"]
+        ids["vin"] += 1
+        writer.write("vin", [vin_id, tx["txid"], height, vin.get("coinbase"), vin.get("sequence")])
+        for witness in vin.get("txinwitness", vin.get("witness", [])) or []:
+            writer.write("vin_witness", [ids["vin_witness"], vin_id, witness])
+            ids["vin_witness"] += 1
+        if ADDRESS_INDEX == "on" and "txid" in vin:
+            writer.write("address_spend", [tx["txid"], height, vin["txid"], vin["vout"]])
+    for vout in tx.get("vout", []):
+        vout_id = ids["vout"]
+        ids["vout"] += 1
+        writer.write("vout", [vout_id, tx["txid"], height, vout.get("value"), vout.get("n")])
+        script = vout.get("scriptPubKey")
+        if script:
+            address = script.get("address") or (script.get("addresses") or [None])[0]
+            writer.write("script_pubkey", [
+                vout_id, script.get("asm", ""), script.get("desc", ""), script.get("hex", ""),
+                address, script.get("type", ""),
+            ])
+            if ADDRESS_INDEX == "on" and script.get("hex") and script.get("type") != "nulldata":
+                writer.write("address_history", [
+                    hashlib.sha256(bytes.fromhex(script["hex"])).hexdigest(), height, tx["txid"], vout["n"],
+                    int(round(vout.get("value", 0) * 100_000_000)),
+                ])
+
+
+def create_bulk_tables(cursor):
+    """Create empty tables without foreign keys or secondary indexes (plus address_history when indexing)"""
+    from address_index import ADDRESS_INDEX, create_address_index
+
+    for ddl in BULK_DDL:
+        cursor.execute(ddl)
+    if ADDRESS_INDEX == "on":
+        create_address_index(cursor)
+
+
+def begin_bulk_session(cursor):
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    cursor.execute("SET SESSION unique_checks = 0")
+
+
+def end_bulk_session(cursor):
+    cursor.execute("SET SESSION unique_checks = 1")
+    cursor.execute("SET SESSION foreign_key_checks = 1")
+
+
+def _load_columns(table, offsets):
+    """LOAD DATA column list and SET clause: relative ids of `table` shifted by `offsets`, hex keys decoded"""
+    id_columns = ID_COLUMNS.get(table, {})
+    hex_columns = HEX_COLUMNS.get(table, ())
+    table_columns = TABLE_COLUMNS.get(table) or ADDRESS_COLUMNS[table]
+    columns = ", ".join(f"@{col}" if col in id_columns or col in hex_columns else f"`{col}`" for col in table_columns)
+    assignments = [f"`{col}` = @{col} + {int(offsets[numbered])}" for col, numbered in id_columns.items()]
+    assignments += [f"`{col}` = UNHEX(@{col})" for col in hex_columns]
+    return f"({columns})" + (f" SET {', '.join(assignments)}" if assignments else "")
+
+
+def _load_chunk(cursor, table, path, offsets):
+    cursor.execute(f"""
+        LOAD DATA LOCAL INFILE %s
+        INTO TABLE {table}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY '\\t'
+        LINES TERMINATED BY '\\n'
+        {_load_columns(table, offsets)}
+    """, (path,))
+    return cursor.rowcount
+
+
+def load_address_spends(conn, cursor, paths):
+    """Mark the address_history outputs spent by the staged inputs; outputs must already be loaded"""
+    cursor.execute(ADDRESS_SPEND_DDL)
+    spends = 0
+    for path in paths:
+        spends += _load_chunk(cursor, "address_spend", path, {})
+    cursor.execute("""
+        UPDATE address_history h JOIN address_spend s ON s.txid = h.txid AND s.vout = h.vout
+        SET h.spent_txid = s.spent_txid, h.spent_height = s.spent_height
+    """)
+    cursor.execute("DROP TEMPORARY TABLE address_spend")
+    conn.commit()
+    return spends
+
+
+def bulk_load_blocks(conn, blocks, chunk_rows=CHUNK_ROWS, tmp_dir=None):
+    """Load verbosity-2 blocks via LOAD DATA LOCAL INFILE; `conn` needs local_infile=True
+
+    `blocks` may be a generator of BlockStream parsers, so only one transaction is in
+    memory at a time. Ids are numbered from 1 in the TSV chunks and shifted past the
+    current MAX(id) under BULK_LOAD_LOCK, so parallel loads only serialize the LOAD DATA
+    step. Returns {table: rows loaded}.
+    """
+    loaded = {table: 0 for table in list(TABLE_COLUMNS) + list(ADDRESS_COLUMNS)}
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as directory:
+        with conn.cursor() as cursor:
+            writer = TsvChunkWriter(directory, chunk_rows)
+            ids = {table: 1 for table in ("vin", "vin_witness", "vout")}
+            for block in blocks:
+                write_block_rows(writer, block, ids)
+            writer.close()
+
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (BULK_LOAD_LOCK, BULK_LOAD_LOCK_TIMEOUT))
+            if cursor.fetchone()[0] != 1:
+                raise RuntimeError(f"Timed out waiting for the {BULK_LOAD_LOCK} lock")
+            try:
+                begin_bulk_session(cursor)
+                offsets = {table: first_id - 1 for table, first_id in next_ids(cursor).items()}
+                for table in list(TABLE_COLUMNS) + ["address_history"]:
+                    for path in writer.chunks[table]:
+                        loaded[table] += _load_chunk(cursor, table, path, offsets)
+                        conn.commit()
+                loaded["address_spend"] = load_address_spends(conn, cursor, writer.chunks["address_spend"])
+                end_bulk_session(cursor)
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (BULK_LOAD_LOCK,))
+    return loaded
+
+
+def find_orphans(cursor):
+    """Count child rows whose parent row is missing, per foreign key"""
+    orphans = {}
+    for table, column, parent, parent_column in FOREIGN_KEYS:
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM {table} c
+            LEFT JOIN {parent} p ON p.{parent_column} = c.{column}
+            WHERE c.{column} IS NOT NULL AND p.{parent_column} IS NULL
+        """)
+        orphans[f"{table}.{column}"] = cursor.fetchone()[0]
+    return orphans
+
+
+def existing_foreign_keys(cursor):
+    cursor.execute("""
+        SELECT TABLE_NAME, COLUMN_NAME
+        FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL
+    """)
+    return {(table, column) for table, column in cursor.fetchall()}
+
+
+def unfinished_loaded_heights(cursor, start_height, end_height):
+    """Heights in [start, end] with block rows but no 'done' ledger entry: an interrupted load
+
+    Chunks are committed one by one and bitcoin_block is loaded first, so a batch that
+    failed part way always left its block rows behind.
+    """
+    cursor.execute("""
+        SELECT b.height FROM bitcoin_block b
+        LEFT JOIN ingestion_ledger l ON l.height = b.height AND l.status = 'done'
+        WHERE b.height BETWEEN %s AND %s AND l.height IS NULL
+        ORDER BY b.height
+    """, (start_height, end_height))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def purge_loaded_rows(cursor, start_height, end_height):
+    """Delete the rows a bulk load wrote for heights [start, end], children first"""
+    from address_index import ADDRESS_INDEX
+
+    cursor.execute("""
+        DELETE w FROM vin_witness w JOIN vin i ON i.id = w.vin_id WHERE i.height BETWEEN %s AND %s
+    """, (start_height, end_height))
+    cursor.execute("""
+        DELETE s FROM script_pubkey s JOIN vout o ON o.id = s.vout_id WHERE o.height BETWEEN %s AND %s
+    """, (start_height, end_height))
+    for table in ("vin", "vout", "transaction", "bitcoin_block"):
+        cursor.execute(f"DELETE FROM {table} WHERE height BETWEEN %s AND %s", (start_height, end_height))
+    if ADDRESS_INDEX == "on":
+        cursor.execute("""
+            UPDATE address_history SET spent_txid = NULL, spent_height = NULL
+            WHERE spent_height BETWEEN %s AND %s
+        """, (start_height, end_height))
+        cursor.execute("DELETE FROM address_history WHERE height BETWEEN %s AND %s", (start_height, end_height))
+
+
+def mark_loaded_heights(conn, blocks, worker_id):
+    """Record bulk-loaded heights as done in the ingestion ledger"""
+    from ingestion_ledger import ensure_ledger_table
+    with conn.cursor() as cursor:
+        ensure_ledger_table(cursor)
+        cursor.executemany("""
+            INSERT INTO ingestion_ledger (height, block_hash, status, worker_id)
+            VALUES (%s, %s, 'done', %s)
+            ON DUPLICATE KEY UPDATE block_hash = VALUES(block_hash), status = 'done', worker_id = VALUES(worker_id)
+        """, [(block["height"], block["hash"], worker_id) for block in blocks])
+    conn.commit()
+
+
+def finalize_bulk_load(conn):
+    """Validate referential integrity, then rebuild indexes and foreign keys"""
+    with conn.cursor() as cursor:
+        orphans = find_orphans(cursor)
+        broken = {key: count for key, count in orphans.items() if count}
+        if broken:
+            raise ValueError(f"Referential integrity check failed: {broken}")
+
+        present = existing_foreign_keys(cursor)
+        for table, index_name, columns in SECONDARY_INDEXES:
+            if not _index_exists(cursor, table, index_name):
+                print(f"🔧 Building index {index_name} on {table} ({columns})")
+                cursor.execute(f"CREATE INDEX {index_name} ON {table} ({columns})")
+        for table, column, parent, parent_column in FOREIGN_KEYS:
+            if (table, column) in present:
+                continue
+            print(f"🔗 Adding foreign key {table}.{column} -> {parent}.{parent_column}")
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                ADD CONSTRAINT fk_{table}_{column}
+                FOREIGN KEY ({column}) REFERENCES {parent}({parent_column})
+            """)
+    conn.commit()
+    return orphans
+
+
+def _index_exists(cursor, table, index_name):
+    cursor.execute("""
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index_name))
+    return cursor.fetchone()[0] > 0
+
+
+def row_by_row_load(conn, blocks):
+    """The normal path: one INSERT per row with constraint checks on (for comparison)"""
+    with tempfile.TemporaryDirectory() as directory:
+        with conn.cursor() as cursor:
+            ids = next_ids(cursor)
+            writer = TsvChunkWriter(directory, chunk_rows=10 ** 9)
+            for block in blocks:
+                write_block_rows(writer, block, ids)
+            writer.close()
+            for table, columns in TABLE_COLUMNS.items():
+                sql = f"INSERT INTO {table} ({', '.join(f'`{col}`' for col in columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+                for path in writer.chunks[table]:
+                    with open(path, encoding="utf-8") as f:
+                        for line in f:
+                            cursor.execute(sql, [_tsv_decode(value) for value in line.rstrip("\n").split("\t")])
+        conn.commit()
+
+
+# LOAD DATA escape sequences; a backslash before any other character stands for that character
+TSV_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0", "b": "\b", "Z": "\x1a"}
+TSV_ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+
+
+def _tsv_decode(value):
+    """Decode a tsv_value field the way LOAD DATA does, one escape sequence at a time"""
+    if value == "\\N":
+        return None
+    return TSV_ESCAPE.sub(lambda match: TSV_ESCAPES.get(match.group(1), match.group(1)), value)
+
+
+def compare_load_paths(bulk_conn, normal_conn, blocks):
+    """Time the bulk path against row-by-row inserts on two empty databases"""
+    started = time.perf_counter()
+    row_by_row_load(normal_conn, blocks)
+    normal_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    loaded = bulk_load_blocks(bulk_conn, blocks)
+    load_seconds = time.perf_counter() - started
+    finalize_bulk_load(bulk_conn)
+    bulk_seconds = time.perf_counter() - started
+
+    report = {
+        "blocks": len(blocks),
+        "rows": sum(loaded.values()),
+        "normal_seconds": round(normal_seconds, 2),
+        "bulk_load_seconds": round(load_seconds, 2),
+        "bulk_total_seconds": round(bulk_seconds, 2),
+        "speedup": round(normal_seconds / bulk_seconds, 2) if bulk_seconds else None,
+    }
+    print(f"⏱️ Normal path: {report['normal_seconds']}s, bulk path: {report['bulk_total_seconds']}s "
+          f"(load {report['bulk_load_seconds']}s), speedup x{report['speedup']}")
+    return report
@@ -1,5 +1,3 @@
-import requests
-import json
 import os
 import modal
 from collections import defaultdict
@@ -11,17 +9,35 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "db-bitcoin-info")
 DB_NAME = "db-bitcoin-info"
 DB_PORT = os.getenv("DB_PORT", "3306")
 
-image = (
+# Sibling modules the functions import inside their bodies. Modal only mounts the entrypoint
+# and local modules already imported at deploy time, so these are copied into every image.
+LOCAL_MODULES = [
+    "address_index", "async_rpc", "block_export", "block_stats", "block_stream", "bulk_load", "cold_storage",
+    "db_router", "executor", "header_store", "ingestion_ledger", "integrity", "mempool_tracker", "outbox",
+    "partitioning", "rpc_router", "rpc_stub", "script_store", "spool", "tunnel_cache", "tx_graph",
+]
+
+base_image = (
     modal.Image.debian_slim(python_version="3.10")
-    .pip_install(["pymysql", "requests"])
     .env({
         "DB_HOST": "db-bitcoin-info.ctoim6igklzt.us-east-2.rds.amazonaws.com",
         "DB_USER": "admin",
         "DB_PASSWORD": "db-bitcoin-info",
         "DB_PORT": "3306"
     })
+    .copy_mount(modal.Mount.from_local_python_packages(*LOCAL_MODULES), remote_path="/")
 )
 
+# Per-role images: the hot path (rpc, db writer, cron sync) only installs what it imports,
+# so containers start from small images. `image` carries everything for tools and backfills.
+rpc_image = base_image.pip_install(["requests"])
+db_image = base_image.pip_install(["pymysql"])
+sync_image = base_image.pip_install(["pymysql", "requests"])
+image = base_image.pip_install(["pymysql", "requests", "zstandard", "aiohttp", "numpy"])
+
+# Export API / CLI (see block_export.py)
+export_image = image.pip_install(["fastapi[standard]", "pyarrow"])
+
 # Load environment variables
 # load_dotenv()
 
@@ -32,6 +48,29 @@ RPC_USER = "eager-borg"
 RPC_PASSWORD = "churn-romp-puma-crown-claw-finer"
 RPC_URL = "https://bitcoin-mainnet.core.chainstack.com"
 
+# Self-hosted node (see bitcoin_node.py), reached through the tunnel url stored in its volume
+NODE_RPC_USER = "bitcoinrpc"
+NODE_RPC_PASSWORD = "supersecurepassword"
+bitcoin_data_vol = modal.Volume.from_name("bitcoin-fy-data")
+
+# Cold tier: history moved out of MySQL as compressed segments (see cold_storage.py)
+cold_vol = modal.Volume.from_name("fy-bitcoin-cold", create_if_missing=True)
+
+# Memory-mapped header chain (see header_store.py)
+header_vol = modal.Volume.from_name("fy-bitcoin-headers", create_if_missing=True)
+# Seconds a container serves headers before reloading the volume for new ones
+HEADER_REFRESH_SECONDS = 60
+
+# Durable spool of fetched blocks between the sync fetcher and the database writer (see spool.py)
+spool_vol = modal.Volume.from_name("fy-bitcoin-spool", create_if_missing=True)
+# Most blocks one sync run fetches; a sync that fell further behind resumes from the tip minus this
+SPOOL_FETCH_AHEAD = 100
+
+# Transaction/address graph in memory-mapped arrays (see tx_graph.py)
+graph_vol = modal.Volume.from_name("fy-bitcoin-graph", create_if_missing=True)
+# Seconds a container serves graph queries before reloading the volume for new blocks
+GRAPH_REFRESH_SECONDS = 300
+
 # Database connection configuration
 DB_HOST = os.getenv("DB_HOST")
 DB_USER = os.getenv("DB_USER")
@@ -39,14 +78,166 @@ DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = "bitcoin"
 DB_PORT = int(os.getenv("DB_PORT", 3306))
 
-@app.function(image=image)
-def rpc_call(method, params=[]):
-    """Send RPC request to Bitcoin node"""
-    payload = json.dumps({"jsonrpc": "1.0", "id": "rpc", "method": method, "params": params})
-    response = requests.post(RPC_URL, auth=(RPC_USER, RPC_PASSWORD), data=payload, headers={"content-type": "text/plain"})
-    return response.json()["result"]
+# Bearer token for the HTTP APIs (export_api, outbox_api), kept apart from the database credentials:
+# modal secret create fy-api-token API_TOKEN=<token>
+api_token_secret = modal.Secret.from_name("fy-api-token")
 
-@app.function(image=image)
+node_endpoint_dict = modal.Dict.from_name("fy-bitcoin-node-endpoints", create_if_missing=True)
+
+_router = None
+_db_router = None
+_write_tables_ready = False
+_header_store = None
+_header_store_loaded_at = 0
+_tx_graph = None
+_tx_graph_loaded_at = 0
+
+def read_node_tunnel_url():
+    """Read the self-hosted node's tunnel url, published by run_bitcoind or stored in the bitcoin volume"""
+    rpc_url = node_endpoint_dict.get("tunnel_url")
+    if rpc_url:
+        return rpc_url
+    bitcoin_data_vol.reload()
+    with open("/root/.bitcoin/tunnel_url.txt", "r") as f:
+        return f.read().strip()
+
+def get_router():
+    """Build the RPC router over our own node and Chainstack once per container"""
+    global _router
+    if _router is None:
+        from rpc_router import RpcEndpoint, RpcRouter
+        from tunnel_cache import TunnelUrlCache
+        tunnel_url = TunnelUrlCache(read_node_tunnel_url)
+        _router = RpcRouter([
+            RpcEndpoint("self-hosted", tunnel_url, auth=(NODE_RPC_USER, NODE_RPC_PASSWORD), self_hosted=True,
+                        on_failure=tunnel_url.invalidate),
+            RpcEndpoint("chainstack", RPC_URL, auth=(RPC_USER, RPC_PASSWORD)),
+        ])
+    return _router
+
+def get_db_router():
+    """Primary for writes, read replicas (DB_READER_HOSTS) for queries, once per container"""
+    global _db_router
+    if _db_router is None:
+        from db_router import DbRouter
+        _db_router = DbRouter.from_config(dict(host=DB_HOST, user=DB_USER, password=DB_PASSWORD,
+                                               database=DB_NAME, port=DB_PORT))
+    return _db_router
+
+def get_header_store():
+    """Open the header store once per container, picking up new headers every HEADER_REFRESH_SECONDS"""
+    global _header_store, _header_store_loaded_at
+    from header_store import HeaderStore
+    if _header_store is None:
+        header_vol.reload()
+        _header_store = HeaderStore("/headers")
+        _header_store_loaded_at = time.time()
+    elif time.time() - _header_store_loaded_at > HEADER_REFRESH_SECONDS:
+        # The volume can't reload under an open memory map
+        _header_store.close()
+        header_vol.reload()
+        _header_store.refresh()
+        _header_store_loaded_at = time.time()
+    return _header_store
+
+def get_tx_graph():
+    """Open the transaction graph once per container, reopening it every GRAPH_REFRESH_SECONDS"""
+    global _tx_graph, _tx_graph_loaded_at
+    from tx_graph import TxGraph
+    if _tx_graph is None or time.time() - _tx_graph_loaded_at > GRAPH_REFRESH_SECONDS:
+        # The volume can't reload under open memory maps
+        _tx_graph = None
+        graph_vol.reload()
+        _tx_graph = TxGraph("/graph")
+        _tx_graph_loaded_at = time.time()
+    return _tx_graph
+
+def fetch_block_with_stats(block_hash, purpose="default", min_height=None):
+    """getblock (verbosity 2) and getblockstats in one batch; stats are attached as block["stats"]
+
+    Falls back to the block alone if the endpoint can't serve getblockstats (e.g. pruned undo data).
+    """
+    from rpc_router import RpcError
+    router = get_router()
+    try:
+        block, stats = router.batch([("getblock", [block_hash, 2]), ("getblockstats", [block_hash])],
+                                    purpose=purpose, min_height=min_height)
+        block["stats"] = stats
+    except RpcError as e:
+        print(f"⚠️ Fetching block without stats: {e}")
+        block = router.call("getblock", [block_hash, 2], purpose=purpose, min_height=min_height)
+    return block
+
+@app.function(image=rpc_image, volumes={"/root/.bitcoin": bitcoin_data_vol})
+def rpc_call(method, params=[], purpose="default"):
+    """Send RPC request to the fastest up-to-date Bitcoin node"""
+    return get_router().call(method, params, purpose=purpose)
+
+@app.function(image=rpc_image, volumes={"/root/.bitcoin": bitcoin_data_vol})
+def rpc_endpoint_status():
+    """Health-check all RPC endpoints and report latency and sync height"""
+    status = get_router().check_health()
+    for endpoint in status:
+        print(f"{'✅' if endpoint['healthy'] else '❌'} {endpoint['name']}: {endpoint}")
+    return status
+
+def read_db_schema(conn):
+    """Read table columns, foreign keys and primary keys over an open connection"""
+    schema = {}
+    foreign_keys = defaultdict(list)
+    primary_keys = {}
+    
+    with conn.cursor() as cursor:
+        # Get all table information
+        cursor.execute("""
+            SELECT TABLE_NAME 
+            FROM INFORMATION_SCHEMA.TABLES 
+            WHERE TABLE_SCHEMA = %s
+        """, (DB_NAME,))
+        tables = cursor.fetchall()
+        
+        # Get column information for each table
+        for table in tables:
+            table_name = table[0]
+            schema[table_name] = {}
+            
+            # Get column information
+            cursor.execute("""
+                SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_KEY
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+                ORDER BY ORDINAL_POSITION
+            """, (DB_NAME, table_name))
+            
+            for column in cursor.fetchall():
+                column_name, data_type, is_nullable, column_key = column
+                schema[table_name][column_name] = {
+                    'data_type': data_type,
+                    'nullable': is_nullable == 'YES',
+                    'is_primary': column_key == 'PRI'
+                }
+                
+                # Record primary key
+                if column_key == 'PRI':
+                    primary_keys[table_name] = column_name
+        
+        # Get foreign key relationships
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+            FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_SCHEMA = %s
+        """, (DB_NAME, DB_NAME))
+        
+        for fk in cursor.fetchall():
+            table_name, column_name, ref_table, ref_column = fk
+            foreign_keys[table_name].append({
+                'column': column_name,
+                'references': {'table': ref_table, 'column': ref_column}
+            })
+
+    return schema, foreign_keys, primary_keys
+
+@app.function(image=db_image)
 def get_db_schema():
     """Get database table structure information"""
     import pymysql
@@ -57,65 +248,12 @@ def get_db_schema():
         database=DB_NAME,
         port=DB_PORT
     )
-    
-    schema = {}
-    foreign_keys = defaultdict(list)
-    primary_keys = {}
-    
     try:
-        with conn.cursor() as cursor:
-            # Get all table information
-            cursor.execute("""
-                SELECT TABLE_NAME 
-                FROM INFORMATION_SCHEMA.TABLES 
-                WHERE TABLE_SCHEMA = %s
-            """, (DB_NAME,))
-            tables = cursor.fetchall()
-            
-            # Get column information for each table
-            for table in tables:
-                table_name = table[0]
-                schema[table_name] = {}
-                
-                # Get column information
-                cursor.execute("""
-                    SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_KEY
-                    FROM INFORMATION_SCHEMA.COLUMNS
-                    WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
-                    ORDER BY ORDINAL_POSITION
-                """, (DB_NAME, table_name))
-                
-                for column in cursor.fetchall():
-                    column_name, data_type, is_nullable, column_key = column
-                    schema[table_name][column_name] = {
-                        'data_type': data_type,
-                        'nullable': is_nullable == 'YES',
-                        'is_primary': column_key == 'PRI'
-                    }
-                    
-                    # Record primary key
-                    if column_key == 'PRI':
-                        primary_keys[table_name] = column_name
-            
-            # Get foreign key relationships
-            cursor.execute("""
-                SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
-                FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
-                WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_SCHEMA = %s
-            """, (DB_NAME, DB_NAME))
-            
-            for fk in cursor.fetchall():
-                table_name, column_name, ref_table, ref_column = fk
-                foreign_keys[table_name].append({
-                    'column': column_name,
-                    'references': {'table': ref_table, 'column': ref_column}
-                })
+        return read_db_schema(conn)
     finally:
         conn.close()
-    
-    return schema, foreign_keys, primary_keys
 
-@app.function(image=image)
+@app.function(image=db_image)
 def map_json_to_tables(json_data, schema, foreign_keys, primary_keys):
     """Map JSON data to corresponding table structure"""
     mapped_data = {}
@@ -132,12 +270,18 @@ def map_json_to_tables(json_data, schema, foreign_keys, primary_keys):
     tx_table = "transaction"
     if tx_table in schema and "tx" in json_data:
         mapped_data[tx_table] = []
-        for tx in json_data["tx"]:
+        for tx_index, tx in enumerate(json_data["tx"]):
             tx_data = {col: tx.get(col, None) 
                       for col in schema[tx_table] 
                       if col in tx}
             # Add association with block
             tx_data["block_hash"] = json_data.get("hash", None)
+            # Keep block order so the merkle root can be rebuilt from stored txids
+            if "tx_index" in schema[tx_table]:
+                tx_data["tx_index"] = tx_index
+            # Carry height onto child rows so height-partitioned tables can prune
+            if "height" in schema[tx_table]:
+                tx_data["height"] = json_data.get("height")
             mapped_data[tx_table].append(tx_data)
             
             # Process transaction inputs
@@ -151,6 +295,8 @@ def map_json_to_tables(json_data, schema, foreign_keys, primary_keys):
                                for col in schema[vin_table] 
                                if col in vin_item}
                     vin_data["txid"] = tx.get("txid", None)
+                    if "height" in schema[vin_table]:
+                        vin_data["height"] = json_data.get("height")
                     mapped_data[vin_table].append((vin_data, vin_item))
                     
             # Process transaction outputs
@@ -164,26 +310,83 @@ def map_json_to_tables(json_data, schema, foreign_keys, primary_keys):
                                 for col in schema[vout_table] 
                                 if col in vout_item}
                     vout_data["txid"] = tx.get("txid", None)
+                    if "height" in schema[vout_table]:
+                        vout_data["height"] = json_data.get("height")
                     mapped_data[vout_table].append((vout_data, vout_item))
+
+    # Process block statistics (getblockstats result attached by the fetcher)
+    if json_data.get("stats"):
+        from block_stats import stats_row
+        mapped_data["block_stats"] = [stats_row(json_data["stats"])]
     
     return mapped_data
 
-@app.function(image=image)
-def insert_mapped_data(mapped_data, schema, foreign_keys, primary_keys):
-    """Insert the mapped data into the database"""
-    import pymysql
-    conn = pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT
-    )
-    
+def ensure_write_tables(conn):
+    """Create the tables write_mapped_data writes besides the block schema
+
+    Each CREATE TABLE commits implicitly and takes a metadata lock, so this runs once
+    per container (writer enter hook, backfill entrypoints), not per block.
+    """
+    from ingestion_ledger import ensure_ledger_table
+    from script_store import SCRIPT_STORAGE, create_dedup_tables
+    from address_index import ADDRESS_INDEX, create_address_index
+    from block_stats import ensure_block_stats_table
+    from outbox import ensure_outbox_tables
+
+    with conn.cursor() as cursor:
+        ensure_ledger_table(cursor)
+        if SCRIPT_STORAGE == "dedup":
+            create_dedup_tables(cursor)
+        if ADDRESS_INDEX == "on":
+            create_address_index(cursor)
+        ensure_block_stats_table(cursor)
+        ensure_outbox_tables(cursor)
+    conn.commit()
+
+def write_mapped_data(conn, mapped_data):
+    """Insert one mapped block over an open connection, in a single transaction; returns False on failure
+
+    The ledger, dedup, address, stats and outbox tables must exist (see ensure_write_tables).
+    """
+    from ingestion_ledger import content_hash, lock_entry, mark_done, purge_block
+    from script_store import SCRIPT_STORAGE, store_mapped_scripts, unstore_height, commit_cached_ids, discard_cached_ids
+    from address_index import ADDRESS_INDEX, unindex_height, index_mapped_block
+    from block_stats import write_block_stats, delete_block_stats
+    from outbox import CONNECT, DISCONNECT, append_event
+
     inserted_ids = {}
+    worker_id = os.getenv("MODAL_TASK_ID", "local")
     
     try:
         with conn.cursor() as cursor:
+            block_row = mapped_data.get("bitcoin_block", [{}])[0]
+            height, block_hash = block_row.get("height"), block_row.get("hash")
+            digest = content_hash(mapped_data)
+
+            # Lock this height's ledger row for the whole transaction, so retries
+            # and overlapping runs are serialized and exactly-once
+            entry = lock_entry(cursor, height)
+            if entry and entry[1] == "done" and entry[0] == block_hash and entry[2] == digest:
+                conn.commit()
+                print(f"⏭️ Block #{height} already ingested, skipping")
+                return True
+            replaced = None
+            if entry and entry[0] and entry[0] != block_hash:
+                # Reorg: a different block was ingested at this height
+                replaced = entry[0]
+                print(f"🔀 Replacing block {replaced} at height {height}")
+                purge_block(cursor, replaced, height)
+                delete_block_stats(cursor, replaced)
+            # Drop rows from any earlier attempt so AUTO_INCREMENT children are not duplicated.
+            # A height already done with this block (e.g. bulk-loaded, with no content hash) keeps
+            # its transaction rows: this writer only re-stores the block row and derived tables
+            if not (entry and entry[1] == "done" and entry[0] == block_hash):
+                purge_block(cursor, block_hash, height, keep_block_row=True)
+            if SCRIPT_STORAGE == "dedup":
+                unstore_height(cursor, height)
+            if ADDRESS_INDEX == "on":
+                unindex_height(cursor, height)
+
             # Insert data in dependency order
             # 1. First insert block data
             if "bitcoin_block" in mapped_data:
@@ -283,53 +486,752 @@ def insert_mapped_data(mapped_data, schema, foreign_keys, primary_keys):
                 #             script.get("type", "")
                 #         ))
                 # print(f"✅ Transaction output data inserted successfully")
-                
+
+            # Output scripts and witnesses as content-addressed binary (asm/desc derived on read)
+            if SCRIPT_STORAGE == "dedup":
+                outputs, unique_scripts, witness_items = store_mapped_scripts(cursor, mapped_data, height)
+                print(f"✅ Stored {outputs} output scripts ({unique_scripts} distinct) and {witness_items} witness items")
+
+            if ADDRESS_INDEX == "on":
+                indexed, spent = index_mapped_block(cursor, mapped_data, height)
+                print(f"✅ Indexed {indexed} outputs by address, marked {spent} spent")
+
+            # 5. Per-block statistics
+            if "block_stats" in mapped_data:
+                write_block_stats(cursor, mapped_data["block_stats"])
+                print("✅ Block stats inserted successfully")
+
+            # Record the height as done and publish the change in the same transaction as the data
+            mark_done(cursor, height, block_hash, digest, worker_id)
+            if replaced:
+                append_event(cursor, DISCONNECT, height, replaced)
+            append_event(cursor, CONNECT, height, block_hash, block_row.get("previousblockhash"))
             conn.commit()
+            commit_cached_ids()
             print("✅ All data inserted successfully")
+            return True
             
     except Exception as e:
         conn.rollback()
+        # Script/witness ids read in the rolled-back transaction may not exist
+        discard_cached_ids()
         print(f"❌ Error: {e}")
-    finally:
-        conn.close()
+        return False
 
-@app.function(image=image)
+def write_routed(mapped_data):
+    """write_mapped_data on a pooled primary connection; the height becomes this container's read floor"""
+    global _write_tables_ready
+    router = get_db_router()
+    with router.writer() as conn:
+        if not _write_tables_ready:
+            ensure_write_tables(conn)
+            _write_tables_ready = True
+        saved = write_mapped_data(conn, mapped_data)
+    if saved:
+        router.note_write(mapped_data.get("bitcoin_block", [{}])[0].get("height"))
+    return saved
+
+@app.function(image=db_image)
+def insert_mapped_data(mapped_data, schema, foreign_keys, primary_keys):
+    """Insert the mapped data into the database"""
+    return write_routed(mapped_data)
+
+# Seconds a warm writer trusts its cached schema before re-reading it
+SCHEMA_REFRESH_SECONDS = 60 * 60
+
+@app.cls(image=db_image, container_idle_timeout=20 * 60)
+class BlockWriter:
+    """Block writer that stays warm between syncs
+
+    The schema is read once per container in the enter hook and writes reuse the
+    router's pooled primary connections, and mapping + insert run in the same container
+    instead of three chained calls.
+    """
+
+    @modal.enter()
+    def connect(self):
+        global _write_tables_ready
+        with get_db_router().writer() as conn:
+            ensure_write_tables(conn)
+        _write_tables_ready = True
+        self.load_schema()
+
+    def load_schema(self):
+        with get_db_router().writer() as conn:
+            self.schema, self.foreign_keys, self.primary_keys = read_db_schema(conn)
+        self.schema_loaded_at = time.time()
+
+    @modal.method()
+    def save_block(self, block_data):
+        """Map and insert one verbosity-2 block"""
+        if time.time() - self.schema_loaded_at > SCHEMA_REFRESH_SECONDS:
+            self.load_schema()
+        mapped_data = map_json_to_tables.local(block_data, self.schema, self.foreign_keys, self.primary_keys)
+        return write_routed(mapped_data)
+
+    @modal.exit()
+    def close(self):
+        get_db_router().close()
+
+@app.function(image=db_image)
 def save_block_to_db(block_data):
     """Save block data to the database"""
-    print("🔍 Getting database structure...")
-    schema, foreign_keys, primary_keys = get_db_schema.remote()
-    print(f"✅ Got structure of {len(schema)} tables")
-    
-    print("🔄 Mapping JSON data to table structure...")
-    mapped_data = map_json_to_tables.remote(block_data, schema, foreign_keys, primary_keys)
-    
-    print("📥 Inserting data into database...")
-    insert_mapped_data.remote(mapped_data, schema, foreign_keys, primary_keys)
+    BlockWriter().save_block.remote(block_data)
 
-@app.function(schedule=modal.Cron("*/10 * * * *"), image=image)
+@app.function(schedule=modal.Cron("*/10 * * * *"), image=sync_image,
+              volumes={"/root/.bitcoin": bitcoin_data_vol, "/spool": spool_vol})
 def scheduled_sync():
-    """Periodic task to sync the latest Bitcoin block to database"""
+    """Periodic task: spool every new block up to the tip, then hand the spool to the writer"""
+    from spool import BlockSpool
     print(f"⏰ Scheduled sync started at: {time.strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
-        # get latest block hash
-        print("🔍 Getting latest block hash...")
-        latest_block_hash = rpc_call.remote("getbestblockhash")
-        print(f"✅ Latest block hash: {latest_block_hash}")
-        
-        # get latest block details
-        print("📦 Getting block details...")
-        latest_block = rpc_call.remote("getblock", [latest_block_hash, 2])
-        print(f"✅ Got data for block #{latest_block['height']}")
-        
+        router = get_router()
+        spool_vol.reload()
+        spool = BlockSpool("/spool")
+
+        # get latest block height
+        print("🔍 Getting latest block height...")
+        tip = router.call("getblockcount")
+        print(f"✅ Latest block height: {tip}")
+
+        # Walk back over spooled blocks that are no longer on the best chain
+        height = spool.last_height
+        if height is not None:
+            spooled = spool.recent_hashes(height - SPOOL_FETCH_AHEAD + 1)
+            height = min(height, tip)
+            while height in spooled and router.call("getblockhash", [height]) != spooled[height]:
+                height -= 1
+            if height < spool.last_height:
+                print(f"🔀 Spooled blocks #{height + 1}..#{spool.last_height} were reorged out, refetching")
+            if height not in spooled:
+                print(f"⚠️ Reorg reaches below the spooled blocks, resuming at #{height + 1}")
+            resume_height = height + 1
+        else:
+            # Empty spool: resume after the newest block in the database
+            db_tip = get_db_router().tip(get_db_router().writer_pool)
+            if db_tip is None or db_tip < 0:
+                print("⚠️ Empty spool and no blocks in the database, starting at the tip")
+                db_tip = tip - 1
+            resume_height = db_tip + 1
+        start_height = max(resume_height, tip - SPOOL_FETCH_AHEAD + 1)
+
+        # Heights too far behind the tip for one run go to the ingestion ledger for backfill_worker
+        if resume_height < start_height:
+            from ingestion_ledger import queue_heights
+            print(f"⚠️ Sync is {start_height - resume_height} blocks behind, "
+                  f"queueing #{resume_height}..#{start_height - 1} for backfill_worker")
+            with get_db_router().writer() as conn:
+                queue_heights(conn, range(resume_height, start_height))
+
+        # Fetch at RPC speed; each block is durable in the spool before the next fetch
+        print(f"📦 Fetching blocks #{start_height}..#{tip}...")
+        for height in range(start_height, tip + 1):
+            block_hash = router.call("getblockhash", [height])
+            spool.append([fetch_block_with_stats(block_hash, min_height=height)])
+        spool_vol.commit()
+        print(f"📥 Spool depth: {spool.depth('writer')}")
+
         # save to database
-        print("💾 Starting to save data to database...")
-        save_block_to_db.remote(latest_block)
+        print("💾 Handing the spool to the writer...")
+        drain_spool.spawn()
         
         print(f"✅ Sync completed successfully at: {time.strftime('%Y-%m-%d %H:%M:%S')}")
     except Exception as e:
         print(f"❌ Error during sync: {e}")
 
+@app.function(image=sync_image, volumes={"/spool": spool_vol}, concurrency_limit=1, timeout=60 * 60)
+def drain_spool(limit=None):
+    """Write spooled blocks to the database in order; a failed write stays spooled for the next run"""
+    from spool import BlockSpool, drain
+
+    spool_vol.reload()
+    spool = BlockSpool("/spool")
+    try:
+        written = drain(spool, BlockWriter().save_block.remote, limit=limit)
+    finally:
+        spool_vol.commit()
+    depth = spool.depth("writer")
+    print(f"✅ Wrote {written} spooled blocks, spool depth {depth}")
+    return depth
+
+@app.function(image=base_image, volumes={"/spool": spool_vol})
+def spool_status():
+    """Spool depth metric: blocks and bytes fetched but not yet written"""
+    from spool import BlockSpool
+
+    spool_vol.reload()
+    return BlockSpool("/spool").depth("writer")
+
+@app.function(image=image, volumes={"/root/.bitcoin": bitcoin_data_vol}, timeout=60 * 60)
+def backfill_worker(start_height, end_height, batch_size=10):
+    """Claim unfinished heights from the ingestion ledger and ingest them; safe to run many in parallel"""
+    import pymysql
+    from ingestion_ledger import seed_heights, claim_heights, release_claim
+
+    worker_id = os.getenv("MODAL_TASK_ID", "local")
+    conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, port=DB_PORT)
+    ingested = 0
+    try:
+        ensure_write_tables(conn)
+        seeded = seed_heights(conn, start_height, end_height)
+        if seeded:
+            print(f"📋 Queued {seeded} new heights in {start_height}..{end_height}")
+        while True:
+            heights = claim_heights(conn, worker_id, start_height, end_height, limit=batch_size)
+            if not heights:
+                break
+            print(f"📋 Claimed heights {heights[0]}..{heights[-1]} ({len(heights)})")
+            for height in heights:
+                try:
+                    block_hash = get_router().call("getblockhash", [height], purpose="bulk")
+                    block = fetch_block_with_stats(block_hash, purpose="bulk", min_height=height)
+                    # The writer rolls back and returns False on any database error
+                    saved = BlockWriter().save_block.remote(block)
+                except Exception as e:
+                    print(f"❌ Failed to ingest block #{height}: {e}")
+                    saved = False
+                if saved:
+                    ingested += 1
+                else:
+                    release_claim(conn, height, worker_id)
+    finally:
+        conn.close()
+    print(f"✅ Worker {worker_id} ingested {ingested} blocks")
+    return ingested
+
+@app.function(image=image, volumes={"/root/.bitcoin": bitcoin_data_vol}, timeout=60 * 60 * 24)
+def bulk_backfill(start_height, end_height, blocks_per_load=500, finalize=True):
+    """Initial bulk load: LOAD DATA from TSV chunks with constraint checks off, rebuild FKs at the end"""
+    import pymysql
+    from block_stream import BlockStream
+    from bulk_load import (create_bulk_tables, bulk_load_blocks, mark_loaded_heights, finalize_bulk_load,
+                           unfinished_loaded_heights, purge_loaded_rows)
+    from ingestion_ledger import ensure_ledger_table
+    from integrity import contiguous_ranges
+
+    conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, port=DB_PORT,
+                           local_infile=True)
+    started = time.time()
+    try:
+        with conn.cursor() as cursor:
+            create_bulk_tables(cursor)
+            ensure_ledger_table(cursor)
+            # A rerun skips heights the ledger has as done, and first removes what an
+            # interrupted batch committed before its heights were marked
+            for low, high in contiguous_ranges(unfinished_loaded_heights(cursor, start_height, end_height)):
+                print(f"🧹 Purging partially loaded heights {low}..{high}")
+                purge_loaded_rows(cursor, low, high)
+            conn.commit()
+            cursor.execute("""
+                SELECT height FROM ingestion_ledger WHERE height BETWEEN %s AND %s AND status = 'done'
+            """, (start_height, end_height))
+            done = {row[0] for row in cursor.fetchall()}
+        for batch_start in range(start_height, end_height + 1, blocks_per_load):
+            batch_end = min(batch_start + blocks_per_load - 1, end_height)
+            heights = [height for height in range(batch_start, batch_end + 1) if height not in done]
+            if not heights:
+                print(f"⏭️ Blocks {batch_start}..{batch_end} already loaded, skipping")
+                continue
+            headers = []
+
+            def stream_blocks():
+                # Each block is parsed one transaction at a time straight into the TSV chunks,
+                # so memory stays flat however large the blocks or the batch
+                for height in heights:
+                    block_hash = get_router().call("getblockhash", [height], purpose="bulk")
+                    stream = BlockStream(get_router().stream("getblock", [block_hash, 2], purpose="bulk",
+                                                             min_height=height))
+                    headers.append(stream.header)
+                    yield stream
+
+            loaded = bulk_load_blocks(conn, stream_blocks())
+            mark_loaded_heights(conn, headers, os.getenv("MODAL_TASK_ID", "local"))
+            print(f"📥 Loaded blocks {batch_start}..{batch_end}: {loaded}")
+        if finalize:
+            print("🔍 Validating referential integrity and rebuilding constraints...")
+            finalize_bulk_load(conn)
+    finally:
+        conn.close()
+    elapsed = time.time() - started
+    print(f"✅ Bulk load of {end_height - start_height + 1} blocks finished in {elapsed:.1f}s")
+    return elapsed
+
+@app.function(image=image, timeout=60 * 60 * 6)
+def benchmark_bulk_load(bulk_db, normal_db, start_height=0, blocks=1000):
+    """Compare the bulk path with row-by-row inserts (normal_db created empty from block_info_schema.sql)"""
+    import pymysql
+    from bulk_load import create_bulk_tables, compare_load_paths
+
+    print(f"📥 Fetching blocks {start_height}..{start_height + blocks - 1}...")
+    block_data = []
+    for height in range(start_height, start_height + blocks):
+        block_hash = get_router().call("getblockhash", [height], purpose="bulk")
+        block_data.append(get_router().call("getblock", [block_hash, 2], purpose="bulk", min_height=height))
+
+    bulk_conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=bulk_db, port=DB_PORT,
+                                local_infile=True)
+    normal_conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=normal_db, port=DB_PORT)
+    try:
+        with bulk_conn.cursor() as cursor:
+            create_bulk_tables(cursor)
+        return compare_load_paths(bulk_conn, normal_conn, block_data)
+    finally:
+        bulk_conn.close()
+        normal_conn.close()
+
+@app.function(schedule=modal.Cron("0 3 * * *"), image=image)
+def maintain_partitions(retain_heights=None, archive_dir=None):
+    """Add height partitions ahead of the tip and optionally drop ones older than `retain_heights`"""
+    import pymysql
+    from partitioning import ensure_partitions_ahead, drop_partitions_below, migrate_add_height_columns
+
+    tip = rpc_call.remote("getblockcount")
+    conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, port=DB_PORT)
+    try:
+        with conn.cursor() as cursor:
+            migrate_add_height_columns(cursor)
+        conn.commit()
+        added = ensure_partitions_ahead(conn, tip)
+        dropped = drop_partitions_below(conn, tip - retain_heights, archive_dir) if retain_heights else []
+    finally:
+        conn.close()
+    print(f"✅ Partition maintenance at tip {tip}: {len(added)} added, {len(dropped)} dropped")
+    return {"added": added, "dropped": dropped}
+
+@app.function(image=image, timeout=60 * 60 * 6)
+def benchmark_partitioning(partitioned_db, flat_db, blocks=200_000, txs_per_block=50, n=100):
+    """Compare "last N blocks" on a partitioned and a monolithic database (both created empty from the schema files)"""
+    import pymysql
+    from partitioning import generate_synthetic_chain, ensure_partitions_ahead, benchmark_recent_blocks
+
+    report = {}
+    for database in (partitioned_db, flat_db):
+        conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=database, port=DB_PORT)
+        try:
+            ensure_partitions_ahead(conn, blocks)
+            print(f"🧪 Generating {blocks} synthetic blocks in {database}...")
+            generate_synthetic_chain(conn, blocks, txs_per_block)
+            report[database] = benchmark_recent_blocks(conn, n)
+        finally:
+            conn.close()
+    return report
+
+@app.function(schedule=modal.Cron("30 3 * * *"), image=image, volumes={"/cold": cold_vol}, timeout=60 * 60 * 6)
+def tier_cold_blocks(depth=None):
+    """Move transactions/inputs/outputs of blocks older than `depth` into the cold tier"""
+    import pymysql
+    from cold_storage import ColdStore, TIER_DEPTH, tier_cold_blocks as tier
+
+    conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, port=DB_PORT)
+    try:
+        index = tier(conn, ColdStore("/cold"), depth or TIER_DEPTH, commit_volume=cold_vol.commit)
+    finally:
+        conn.close()
+    cold_vol.commit()
+    print(f"✅ Cold tier horizon: {index['horizon']} ({len(index['segments'])} segments)")
+    return index["horizon"]
+
+@app.function(image=image, volumes={"/cold": cold_vol})
+def lookup_block(height=None, block_hash=None):
+    """Look up a block with its transactions, reading cold data transparently"""
+    from cold_storage import ColdStore, lookup_block as lookup
+
+    cold_vol.reload()
+    with get_db_router().reader(min_height=height) as conn:
+        return lookup(conn, ColdStore("/cold"), height=height, block_hash=block_hash)
+
+@app.function(image=image, volumes={"/cold": cold_vol})
+def cold_execute_sql(sql):
+    """Run a read-only query whose height range lies entirely in the cold tier"""
+    from cold_storage import ColdStore, execute_cold_sql
+
+    cold_vol.reload()
+    with get_db_router().reader() as conn:
+        return execute_cold_sql(sql, conn, ColdStore("/cold"))
+
+@app.function(image=image, volumes={"/root/.bitcoin": bitcoin_data_vol})
+def fetch_block_shard(heights):
+    """Fetch a shard of verbosity-2 blocks for parallel backfill"""
+    router = get_router()
+    blocks = []
+    for height in heights:
+        block_hash = router.call("getblockhash", [height], purpose="bulk", min_height=height)
+        blocks.append(fetch_block_with_stats(block_hash, purpose="bulk", min_height=height))
+    return blocks
+
+@app.function(image=image, timeout=60 * 60 * 24)
+def parallel_backfill(start_height, end_height, parallelism=8, shard_size=10):
+    """Fan block fetching out across containers, writing shards in height order"""
+    import pymysql
+    from executor import ModalExecutor, ingest_range
+    from ingestion_ledger import reset_heights
+
+    def write_blocks(blocks):
+        return [block["height"] for block in blocks if not BlockWriter().save_block.remote(block)]
+
+    report = ingest_range(start_height, end_height, fetch_block_shard, write_blocks,
+                          ModalExecutor(parallelism), shard_size=shard_size)
+    print(f"✅ Backfilled {report['blocks']} blocks in {report['seconds']}s ({report['blocks_per_second']} blocks/s)")
+    if report["failed"]:
+        # Leave failed heights pending in the ledger for backfill_worker to retry
+        conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, port=DB_PORT)
+        try:
+            reset_heights(conn, report["failed"])
+        finally:
+            conn.close()
+        print(f"❌ {len(report['failed'])} blocks failed to write, queued for backfill_worker")
+    return report
+
+@app.function(image=image, volumes={"/root/.bitcoin": bitcoin_data_vol}, timeout=60 * 60 * 24)
+async def async_backfill(start_height, end_height, concurrency=1000, use_provider=False, buffer_blocks=100):
+    """Fetch a height range with the asyncio RPC client and stream blocks to the writer
+
+    `concurrency` bounds requests in flight; `buffer_blocks` bounds decoded blocks waiting
+    for the sequential writer, which is what the container's memory has to hold.
+    """
+    from async_rpc import fetch_range
+
+    if use_provider:
+        rpc_url, auth = RPC_URL, (RPC_USER, RPC_PASSWORD)
+    else:
+        rpc_url, auth = read_node_tunnel_url(), (NODE_RPC_USER, NODE_RPC_PASSWORD)
+
+    async def write(block):
+        # Later blocks spend this one's outputs, so stop at the first failed write
+        if not await BlockWriter().save_block.remote.aio(block):
+            raise RuntimeError(f"Failed to write block #{block['height']}")
+
+    started = time.time()
+    written = await fetch_range(rpc_url, auth, range(start_height, end_height + 1), write, concurrency,
+                                buffer_blocks=buffer_blocks)
+    print(f"✅ Async backfill wrote {written} blocks in {time.time() - started:.1f}s")
+    return written
+
+@app.function(image=image, volumes={"/root/.bitcoin": bitcoin_data_vol}, timeout=60 * 60 * 24)
+def track_mempool(interval=10, iterations=None):
+    """Keep mempool_tx and mempool_fee_histogram current from our own node's mempool"""
+    import pymysql
+    from mempool_tracker import MempoolTracker
+
+    # Mempools differ between nodes, so diff against a single endpoint to avoid churn
+    node = get_router().endpoints[0]
+    conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, port=DB_PORT)
+    try:
+        tracker = MempoolTracker(node.call, conn)
+        tracker.create_tables()
+        tracker.load_state()
+        tracker.run(interval, iterations)
+    finally:
+        conn.close()
+
+@app.function(image=image)
+def address_history(address=None, script_hex=None, limit=100, after=None, unspent_only=False):
+    """Page through an address's outputs in height order; pass the returned `next` as `after`"""
+    from address_index import scripthash, lookup_history
+
+    with get_db_router().reader() as conn:
+        with conn.cursor() as cursor:
+            return lookup_history(cursor, scripthash(address, script_hex), limit, after, unspent_only)
+
+@app.function(image=image, timeout=60 * 60 * 6)
+def benchmark_address_history(database, blocks=2000, txs_per_block=200):
+    """Compare address-history lookups via address_history vs scanning script_pubkey (database created empty from the schema file)"""
+    import pymysql
+    from address_index import benchmark_address_history as benchmark
+
+    conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=database, port=DB_PORT)
+    try:
+        return benchmark(conn, blocks, txs_per_block)
+    finally:
+        conn.close()
+
+@app.function(image=image, volumes={"/root/.bitcoin": bitcoin_data_vol}, timeout=60 * 60 * 6)
+def benchmark_script_storage(text_db, dedup_db, heights=(481824, 774628, 800000)):
+    """Stored bytes and insert throughput of TEXT script rows vs the dedup layout (databases created empty from the schema file)"""
+    import pymysql
+    from script_store import layout_bytes, benchmark_script_storage as benchmark
+
+    blocks = [fetch_block_with_stats(get_router().call("getblockhash", [height], purpose="bulk"), purpose="bulk",
+                                     min_height=height) for height in heights]
+    text_conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=text_db, port=DB_PORT)
+    dedup_conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=dedup_db, port=DB_PORT)
+    try:
+        schema = read_db_schema(text_conn)
+        mapped = [map_json_to_tables.local(block, *schema) for block in blocks]
+        return {"layout": layout_bytes(blocks), "insert": benchmark(text_conn, dedup_conn, mapped)}
+    finally:
+        text_conn.close()
+        dedup_conn.close()
+
+@app.function(schedule=modal.Cron("*/5 * * * *"), image=image,
+              volumes={"/root/.bitcoin": bitcoin_data_vol, "/headers": header_vol}, timeout=60 * 60)
+def sync_headers():
+    """Append new headers from our own node to the header store, unwinding reorgs"""
+    from functools import partial
+    from executor import rpc_batch
+    from header_store import HeaderStore
+
+    # Headers must come from one node's view of the chain
+    node = get_router().endpoints[0]
+    header_vol.reload()
+    store = HeaderStore("/headers")
+    started = time.time()
+    appended = store.sync(node.call, partial(rpc_batch, node.resolve_url(), node.auth))
+    header_vol.commit()
+    print(f"✅ Header store at #{store.tip_height} (+{appended} in {time.time() - started:.1f}s)")
+    return store.tip_height
+
+@app.function(image=image, volumes={"/headers": header_vol})
+def header_lookup(height=None, block_hash=None):
+    """getblockheader-style lookup by height or hash, served from the memory-mapped header store"""
+    return get_header_store().get_header(height=height, block_hash=block_hash)
+
+@app.function(image=image, volumes={"/headers": header_vol})
+def benchmark_header_lookups(n=100_000):
+    """Microseconds per header lookup by height and by hash"""
+    from header_store import benchmark_lookups
+    return benchmark_lookups(get_header_store(), n)
+
+def stream_export(table, start_height, end_height, fmt, after):
+    """Yield (bytes, resume token) for an export on a replica that has the whole range
+
+    Cold-tiered heights are read from the cold volume, so callers must mount it at /cold.
+    """
+    from block_export import export_stream
+    from cold_storage import ColdStore, read_horizon
+
+    with get_db_router().reader(min_height=end_height) as conn:
+        with conn.cursor() as cursor:
+            horizon = read_horizon(cursor)
+        store = None
+        if start_height <= horizon:
+            cold_vol.reload()
+            store = ColdStore("/cold")
+        yield from export_stream(conn, table, start_height, end_height, fmt, after, cold_store=store, horizon=horizon)
+
+def valid_api_token(token):
+    """Check a bearer token against API_TOKEN from the fy-api-token secret"""
+    import secrets
+
+    expected = os.getenv("API_TOKEN")
+    return bool(expected) and secrets.compare_digest(token, expected)
+
+@app.function(image=export_image, volumes={"/cold": cold_vol}, timeout=60 * 60 * 24)
+def export_range(table, start_height, end_height, fmt="ndjson", after=None):
+    """Stream a height range of one table as NDJSON or Arrow IPC chunks with resume tokens"""
+    yield from stream_export(table, start_height, end_height, fmt, after)
+
+@app.function(image=image, timeout=60 * 60 * 6)
+def add_export_indexes():
+    """Add the height indexes exports page on to an existing database"""
+    import pymysql
+    from block_export import ensure_export_indexes
+
+    conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, port=DB_PORT)
+    try:
+        with conn.cursor() as cursor:
+            ensure_export_indexes(cursor)
+    finally:
+        conn.close()
+
+@app.function(image=export_image, volumes={"/cold": cold_vol}, secrets=[api_token_secret],
+              timeout=60 * 60 * 24, allow_concurrent_inputs=10)
+@modal.asgi_app()
+def export_api():
+    """HTTP export: GET /export/{table}?start=&end=&format=ndjson|arrow&after=<resume token>"""
+    from fastapi import Depends, FastAPI, HTTPException
+    from fastapi.responses import StreamingResponse
+    from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+    from block_export import EXPORT_TABLES, MEDIA_TYPES
+
+    security = HTTPBearer()
+    web_app = FastAPI()
+
+    def check_auth(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        if not valid_api_token(credentials.credentials):
+            raise HTTPException(status_code=401, detail="Invalid API token")
+
+    @web_app.get("/export/{table}", dependencies=[Depends(check_auth)])
+    def export(table: str, start: int, end: int, format: str = "ndjson", after: str = None):
+        if table not in EXPORT_TABLES or format not in MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"table must be one of {list(EXPORT_TABLES)}, "
+                                                        f"format one of {list(MEDIA_TYPES)}")
+        # Each row carries height and its key column, so a client that loses the connection
+        # resumes with after=<table>:<height of last row>:<key of last row>
+        chunks = (data for data, _ in stream_export(table, start, end, format, after))
+        return StreamingResponse(chunks, media_type=MEDIA_TYPES[format])
+
+    return web_app
+
+@app.function(image=image, volumes={"/root/.bitcoin": bitcoin_data_vol}, timeout=60 * 60 * 24)
+def backfill_block_stats(start_height, end_height, batch_size=100):
+    """Fill block_stats for already-ingested heights with batched getblockstats"""
+    import pymysql
+    from functools import partial
+    from block_stats import backfill_block_stats as backfill
+
+    conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, port=DB_PORT)
+    try:
+        return backfill(conn, partial(get_router().batch, purpose="bulk", min_height=end_height),
+                        start_height, end_height, batch_size)
+    finally:
+        conn.close()
+
+@app.function(schedule=modal.Cron("0 4 * * *"), image=image, volumes={"/cold": cold_vol},
+              cpu=8, timeout=60 * 60 * 6)
+def verify_integrity(start_height=0, end_height=None, parallelism=8, repair=False):
+    """Nightly sweep: recompute merkle roots, check nTx counts and hash links, optionally repair"""
+    import pymysql
+    from executor import LocalExecutor
+    from ingestion_ledger import reset_heights
+    from integrity import (verify_heights, repairable_heights, bulk_reload_heights, contiguous_ranges,
+                           purge_duplicate_heights, migrate_add_tx_index)
+
+    db_config = dict(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, port=DB_PORT)
+    conn = pymysql.connect(**db_config)
+    try:
+        with conn.cursor() as cursor:
+            migrate_add_tx_index(cursor)
+            if end_height is None:
+                cursor.execute("SELECT MAX(height) FROM bitcoin_block")
+                end_height = cursor.fetchone()[0] or 0
+        cold_vol.reload()
+        # The sweep reads from a replica that has the whole range; repairs go to the primary
+        router = get_db_router()
+        read_config = router.configs[router.choose_reader(min_height=end_height).name]
+        issues, summary = verify_heights(read_config, start_height, end_height, LocalExecutor(parallelism),
+                                         cold_dir="/cold")
+        for height, kind, detail in issues[:20]:
+            print(f"❌ #{height} {kind}: {detail}")
+
+        heights = repairable_heights(issues)
+        if repair and heights:
+            with conn.cursor() as cursor:
+                purged = purge_duplicate_heights(cursor, issues)
+            conn.commit()
+            reset_heights(conn, heights)
+            ranges = contiguous_ranges(heights)
+            for low, high in ranges:
+                backfill_worker.spawn(low, high)
+            print(f"🔧 Re-ingesting {len(heights)} heights in {len(ranges)} ranges ({purged} stale blocks purged)")
+        summary["repairable"] = len(heights)
+        # The live writer can't restore transaction rows; these need bulk_backfill over the range
+        reload_ranges = contiguous_ranges(bulk_reload_heights(issues))
+        for low, high in reload_ranges[:20]:
+            print(f"⚠️ #{low}-#{high} needs a bulk reload (transactions don't match the block header)")
+        summary["needs_bulk_reload"] = reload_ranges
+        return summary
+    finally:
+        conn.close()
+
+@app.function(image=export_image, secrets=[api_token_secret], keep_warm=1, allow_concurrent_inputs=500)
+@modal.asgi_app()
+def outbox_api():
+    """Long-poll block events: GET /events?after=<offset>&timeout=<seconds>&limit=
+
+    One hub per container polls the outbox head; every waiting client is served from memory.
+    """
+    import asyncio
+    import pymysql
+    from fastapi import Depends, FastAPI, HTTPException
+    from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+    from outbox import OutboxHub, BATCH_EVENTS
+
+    hub = OutboxHub(lambda: pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD,
+                                            database=DB_NAME, port=DB_PORT)).start()
+    security = HTTPBearer()
+    web_app = FastAPI()
+
+    def check_auth(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        if not valid_api_token(credentials.credentials):
+            raise HTTPException(status_code=401, detail="Invalid API token")
+
+    @web_app.get("/events", dependencies=[Depends(check_auth)])
+    async def events(after: int = 0, timeout: float = 30, limit: int = BATCH_EVENTS):
+        deadline = time.monotonic() + min(timeout, 60)
+        # Waiting is an in-memory head check, so open long-polls hold no thread or connection
+        while (hub.head is None or hub.head <= after) and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        batch = await asyncio.to_thread(hub.events_after, after, min(limit, BATCH_EVENTS))
+        return {"events": batch, "head": hub.head}
+
+    return web_app
+
+@app.function(schedule=modal.Cron("30 4 * * *"), image=db_image)
+def prune_block_outbox(retain_days=30):
+    """Drop outbox events older than `retain_days`"""
+    import pymysql
+    from outbox import prune_outbox
+
+    conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, port=DB_PORT)
+    try:
+        with conn.cursor() as cursor:
+            pruned = prune_outbox(cursor, retain_days)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"✅ Pruned {pruned} outbox events older than {retain_days} days")
+    return pruned
+
+@app.function(image=image, volumes={"/root/.bitcoin": bitcoin_data_vol}, timeout=60 * 60)
+def benchmark_block_parse(heights=(481824, 774628, 800000), chunk_bytes=64 * 1024):
+    """Record large mainnet blocks and compare peak memory of whole vs streamed parsing"""
+    from block_stream import record_response, benchmark_parse
+
+    results = {}
+    for height in heights:
+        block_hash = get_router().call("getblockhash", [height], purpose="bulk")
+        path = record_response(get_router().stream("getblock", [block_hash, 2], purpose="bulk", min_height=height),
+                               f"/tmp/block-{height}.json")
+        print(f"📥 Recorded block #{height}")
+        results[height] = benchmark_parse(path, chunk_bytes)
+    return results
+
+@app.function(image=db_image)
+def db_router_status():
+    """Tip height seen on the primary and on each read replica"""
+    return get_db_router().status()
+
+@app.function(schedule=modal.Cron("*/30 * * * *"), image=image, volumes={"/graph": graph_vol},
+              concurrency_limit=1, timeout=60 * 60 * 6)
+def sync_tx_graph(batch_heights=1000):
+    """Append new address_history edges to the transaction graph and rebuild its indexes"""
+    from tx_graph import TxGraph
+
+    graph_vol.reload()
+    graph = TxGraph("/graph")
+    started = time.time()
+    with get_db_router().reader() as conn:
+        with conn.cursor() as cursor:
+            height = graph.sync(cursor, batch_heights)
+    graph_vol.commit()
+    print(f"✅ Graph at #{height} ({graph.stats()}) in {time.time() - started:.1f}s")
+    return graph.stats()
+
+@app.function(image=image, volumes={"/graph": graph_vol}, timeout=60 * 10)
+def trace_coins(txids, max_hops=5, direction="forward"):
+    """Transactions reached from `txids` (hex) within `max_hops` spends, forward or backward"""
+    return get_tx_graph().trace([bytes.fromhex(txid) for txid in txids], max_hops, direction)
+
+@app.function(image=image, volumes={"/graph": graph_vol}, timeout=60 * 10)
+def address_cluster(address=None, script_hex=None, limit=1000):
+    """Addresses linked to one address by common-input ownership"""
+    from address_index import scripthash
+    return get_tx_graph().cluster(scripthash(address, script_hex), limit)
+
+@app.function(image=image, volumes={"/graph": graph_vol}, timeout=60 * 10)
+def address_neighbors(address=None, script_hex=None, k=2, direction="forward", limit=1000):
+    """Addresses within `k` payment hops of an address"""
+    from address_index import scripthash
+    return get_tx_graph().k_hop(scripthash(address, script_hex), k, direction, limit)
+
+@app.function(image=image, timeout=60 * 60)
+def benchmark_tx_graph(n_tx=1_000_000, n_addresses=300_000):
+    """Build a synthetic graph and time taint traces, k-hop queries and clustering"""
+    from tx_graph import synthetic_graph, benchmark_graph
+    return benchmark_graph(synthetic_graph("/tmp/tx-graph", n_tx=n_tx, n_addresses=n_addresses))
+
 # Test database connection
 @app.function(image=image)
 def test_db_connection():
@@ -369,4 +1271,42 @@ def main():
 - To deploy permanently, run: modal deploy chainstackRPCcall.py
         """)
     except Exception as e:
-        print(f"❌ Setup failed: {e}")
\ No newline at end of file
+        print(f"❌ Setup failed: {e}")
+
+@app.local_entrypoint()
+def export(table="transaction", start: int = 0, end: int = 0, format="ndjson", out=None):
+    """modal run chainstackRPCcall.py::export --table vout --start 800000 --end 800100 --format arrow
+
+    Progress is saved to <out>.resume after every chunk; rerunning the same command resumes.
+    NDJSON resumes in place; Arrow writes the remainder as a new <out>.partN stream.
+    """
+    out = out or f"{table}_{start}_{end}.{'ndjson' if format == 'ndjson' else 'arrow'}"
+    resume_path = f"{out}.resume"
+    after, offset = None, 0
+    if os.path.exists(resume_path):
+        after, offset = open(resume_path).read().split()
+        offset = int(offset)
+    path = out
+    if after:
+        print(f"⏩ Resuming {table} export after {after}")
+        if format != "ndjson":
+            part = 1
+            while os.path.exists(f"{out}.part{part}"):
+                part += 1
+            path, offset = f"{out}.part{part}", 0
+
+    written = 0
+    with open(path, "r+b" if offset else "wb") as f:
+        # Drop anything written after the last saved token
+        f.truncate(offset)
+        f.seek(offset)
+        for data, token in export_range.remote_gen(table, start, end, format, after):
+            f.write(data)
+            f.flush()
+            written += len(data)
+            if token:
+                with open(resume_path, "w") as resume:
+                    resume.write(f"{token} {f.tell() if format == 'ndjson' else 0}")
+    if os.path.exists(resume_path):
+        os.remove(resume_path)
+    print(f"✅ Exported {table} #{start}-#{end} to {path} ({written / 1e6:.1f} MB)")
@@ -0,0 +1,484 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+from functools import lru_cache
+
+# Cold tier root (the fy-bitcoin-cold volume mount)
+COLD_STORE_DIR = os.getenv("COLD_STORE_DIR", "/cold")
+# Blocks deeper than this below the tip are moved out of MySQL
+TIER_DEPTH = int(os.getenv("TIER_DEPTH", 10_000))
+# Heights per compressed segment file
+SEGMENT_SIZE = 1000
+ZSTD_LEVEL = 10
+
+# Tables whose rows move to the cold tier. bitcoin_block rows stay hot: they are
+# small and keep height/hash lookups and MAX(height) answerable from MySQL.
+COLD_TABLES = ["transaction", "vin", "vin_witness", "vout", "script_pubkey"]
+
+# Horizon as seen by MySQL readers, updated in the same transaction as the deletes, so
+# clients without the cold volume know which heights are no longer in MySQL
+COLD_HORIZON_DDL = """
+CREATE TABLE IF NOT EXISTS cold_tier (
+    id TINYINT PRIMARY KEY,
+    horizon INTEGER NOT NULL
+)
+"""
+
+
+def segment_name(start, end):
+    return f"blocks/{start:09d}-{end:09d}.jsonl.zst"
+
+
+class ColdStore:
+    """Height-partitioned zstd-JSONL segments plus a small JSON index
+
+    Each line of a segment is one block: {"height", "hash", "transaction": [...],
+    "vin": [...], "vin_witness": [...], "vout": [...], "script_pubkey": [...]}.
+    """
+
+    def __init__(self, root=COLD_STORE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return {"horizon": -1, "segments": []}
+        with open(self.index_path, "r") as f:
+            return json.load(f)
+
+    def save_index(self, index):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    def horizon(self):
+        """Highest height whose rows live in the cold tier (-1 if none)"""
+        return self.load_index()["horizon"]
+
+    def write_segment(self, start, end, records):
+        """Compress and fsync a segment, returning its index entry"""
+        import zstandard
+
+        relative = segment_name(start, end)
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        blocks = 0
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as raw:
+            with compressor.stream_writer(raw, closefd=False) as writer:
+                for record in records:
+                    writer.write((json.dumps(record, default=str) + "\n").encode())
+                    blocks += 1
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+        return {"start": start, "end": end, "path": relative, "blocks": blocks, "bytes": os.path.getsize(path)}
+
+    def segments_for(self, low, high):
+        return [s for s in self.load_index()["segments"] if s["end"] >= low and s["start"] <= high]
+
+    def read_segment(self, relative):
+        return _read_segment(os.path.join(self.root, relative))
+
+    def get_block(self, height):
+        """Cold rows of one block, or None"""
+        for segment in self.segments_for(height, height):
+            for record in self.read_segment(segment["path"]):
+                if record["height"] == height:
+                    return record
+        return None
+
+    def iter_blocks(self, low, high):
+        for segment in self.segments_for(low, high):
+            for record in self.read_segment(segment["path"]):
+                if low <= record["height"] <= high:
+                    yield record
+
+
+@lru_cache(maxsize=8)
+def _read_segment(path):
+    import zstandard
+
+    with open(path, "rb") as f:
+        data = zstandard.ZstdDecompressor().stream_reader(f).read()
+    return [json.loads(line) for line in data.decode().splitlines() if line]
+
+
+def fetch_block_rows(cursor, start, end):
+    """Read the cold-table rows of a height range from MySQL, grouped per block"""
+    records = {}
+    cursor.execute("SELECT hash, height FROM bitcoin_block WHERE height BETWEEN %s AND %s", (start, end))
+    for block_hash, height in cursor.fetchall():
+        records[height] = {"height": height, "hash": block_hash, **{table: [] for table in COLD_TABLES}}
+
+    queries = {
+        "transaction": "SELECT * FROM transaction WHERE height BETWEEN %s AND %s",
+        "vin": "SELECT * FROM vin WHERE height BETWEEN %s AND %s",
+        "vout": "SELECT * FROM vout WHERE height BETWEEN %s AND %s",
+        "vin_witness": """
+            SELECT w.*, i.height FROM vin_witness w JOIN vin i ON i.id = w.vin_id
+            WHERE i.height BETWEEN %s AND %s
+        """,
+        "script_pubkey": """
+            SELECT s.*, o.height FROM script_pubkey s JOIN vout o ON o.id = s.vout_id
+            WHERE o.height BETWEEN %s AND %s
+        """,
+    }
+    for table, sql in queries.items():
+        cursor.execute(sql, (start, end))
+        columns = [column[0] for column in cursor.description]
+        for row in cursor.fetchall():
+            row = dict(zip(columns, row))
+            record = records.get(row["height"])
+            if record is not None:
+                if table in ("vin_witness", "script_pubkey"):
+                    row.pop("height")
+                record[table].append(row)
+    return [records[height] for height in sorted(records)]
+
+
+def delete_block_rows(cursor, start, end):
+    """Remove cold-tiered rows from MySQL, children first"""
+    cursor.execute("""
+        DELETE w FROM vin_witness w JOIN vin i ON i.id = w.vin_id WHERE i.height BETWEEN %s AND %s
+    """, (start, end))
+    cursor.execute("""
+        DELETE s FROM script_pubkey s JOIN vout o ON o.id = s.vout_id WHERE o.height BETWEEN %s AND %s
+    """, (start, end))
+    cursor.execute("DELETE FROM vin WHERE height BETWEEN %s AND %s", (start, end))
+    cursor.execute("DELETE FROM vout WHERE height BETWEEN %s AND %s", (start, end))
+    cursor.execute("DELETE FROM transaction WHERE height BETWEEN %s AND %s", (start, end))
+
+
+def ensure_cold_tier_table(cursor):
+    """Create cold_tier (DDL commits implicitly, so call before any DML)"""
+    cursor.execute(COLD_HORIZON_DDL)
+
+
+def record_horizon(cursor, horizon):
+    cursor.execute("""
+        INSERT INTO cold_tier (id, horizon) VALUES (1, %s)
+        ON DUPLICATE KEY UPDATE horizon = VALUES(horizon)
+    """, (horizon,))
+
+
+def read_horizon(cursor):
+    """Cold horizon recorded in MySQL (-1 if nothing was tiered)"""
+    try:
+        cursor.execute("SELECT horizon FROM cold_tier WHERE id = 1")
+    except Exception as e:
+        # No table yet: nothing was ever tiered from this database
+        if getattr(e, "args", (None,))[0] == 1146:
+            return -1
+        raise
+    row = cursor.fetchone()
+    return row[0] if row else -1
+
+
+def tier_cold_blocks(conn, store, depth=TIER_DEPTH, commit_volume=None):
+    """Move whole segments older than `depth` below the tip from MySQL to the cold store
+
+    The index is updated (and the volume committed) before rows are deleted, so an
+    interrupted run only leaves rows that the next run deletes again.
+    """
+    index = store.load_index()
+    with conn.cursor() as cursor:
+        ensure_cold_tier_table(cursor)
+        cursor.execute("SELECT MAX(height) FROM bitcoin_block")
+        tip = cursor.fetchone()[0]
+        if tip is None:
+            return index
+        target = tip - depth
+        moved = 0
+        start = index["horizon"] + 1
+        while start + SEGMENT_SIZE - 1 <= target:
+            end = start + SEGMENT_SIZE - 1
+            records = fetch_block_rows(cursor, start, end)
+            entry = store.write_segment(start, end, records)
+            index["segments"].append(entry)
+            index["horizon"] = end
+            store.save_index(index)
+            if commit_volume:
+                commit_volume()
+
+            delete_block_rows(cursor, start, end)
+            record_horizon(cursor, end)
+            conn.commit()
+            print(f"🧊 Tiered heights {start}..{end}: {entry['blocks']} blocks, {entry['bytes']} bytes")
+            moved += 1
+            start = end + 1
+
+        # Finish deletes of segments that were written by an interrupted run
+        for segment in index["segments"][:len(index["segments"]) - moved]:
+            cursor.execute("SELECT COUNT(*) FROM transaction WHERE height BETWEEN %s AND %s",
+                           (segment["start"], segment["end"]))
+            if cursor.fetchone()[0]:
+                delete_block_rows(cursor, segment["start"], segment["end"])
+                conn.commit()
+        if read_horizon(cursor) != index["horizon"]:
+            record_horizon(cursor, index["horizon"])
+            conn.commit()
+    return index
+
+
+def lookup_block(conn, store, height=None, block_hash=None):
+    """Block row plus its transactions/inputs/outputs, from MySQL or the cold tier"""
+    with conn.cursor() as cursor:
+        if block_hash is not None:
+            cursor.execute("SELECT * FROM bitcoin_block WHERE hash = %s", (block_hash,))
+        else:
+            cursor.execute("SELECT * FROM bitcoin_block WHERE height = %s", (height,))
+        columns = [column[0] for column in cursor.description]
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        block = dict(zip(columns, row))
+
+        if block["height"] <= store.horizon():
+            cold = store.get_block(block["height"]) or {}
+            for table in COLD_TABLES:
+                block[table] = cold.get(table, [])
+            block["tier"] = "cold"
+            return block
+
+        for table, sql in (
+            ("transaction", "SELECT * FROM transaction WHERE block_hash = %s"),
+            ("vin", "SELECT i.* FROM vin i JOIN transaction t ON t.txid = i.txid WHERE t.block_hash = %s"),
+            ("vout", "SELECT o.* FROM vout o JOIN transaction t ON t.txid = o.txid WHERE t.block_hash = %s"),
+        ):
+            cursor.execute(sql, (block["hash"],))
+            columns = [column[0] for column in cursor.description]
+            block[table] = [dict(zip(columns, r)) for r in cursor.fetchall()]
+
+        from script_store import SCRIPT_STORAGE, load_output_scripts
+        if SCRIPT_STORAGE == "dedup":
+            # Scripts are stored once as bytes; asm/desc are rebuilt only for the block asked for
+            scripts = load_output_scripts(cursor, block["height"])
+            for vout in block["vout"]:
+                vout["scriptPubKey"] = scripts.get(vout["txid"], {}).get(vout["n"])
+            block["output_scripts"] = [{"txid": txid, "n": n, **script}
+                                       for txid, outputs in sorted(scripts.items())
+                                       for n, script in sorted(outputs.items())]
+        block["tier"] = "hot"
+        return block
+
+
+HEIGHT_PREDICATE = re.compile(
+    r"\bheight\s*(?:(BETWEEN)\s*(\d+)\s*AND\s*(\d+)|(<=|>=|<|>|=)\s*(\d+))",
+    re.IGNORECASE,
+)
+
+
+# Clauses that can widen a predicate (disjunction, negation, subqueries); literals are dropped first
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+UNBOUNDED_CLAUSE = re.compile(r"\b(?:OR|XOR|NOT)\b|\|\||!|\(\s*SELECT\b", re.IGNORECASE)
+
+
+def height_range(sql):
+    """(low, high) height bounds implied by literal predicates in `sql`; high is None if unbounded
+
+    Bounds are intersected, which only holds for predicates joined by AND. A query with
+    OR, NOT or a subquery is treated as unbounded (0, None) rather than guessed at.
+    """
+    low, high = 0, None
+    if UNBOUNDED_CLAUSE.search(STRING_LITERAL.sub("''", sql)):
+        return low, high
+    for between, b_low, b_high, op, value in HEIGHT_PREDICATE.findall(sql):
+        if between:
+            low, high = max(low, int(b_low)), min(high, int(b_high)) if high is not None else int(b_high)
+            continue
+        value = int(value)
+        if op in ("<", "<="):
+            bound = value - 1 if op == "<" else value
+            high = bound if high is None else min(high, bound)
+        elif op in (">", ">="):
+            low = max(low, value + 1 if op == ">" else value)
+        else:
+            low, high = max(low, value), value if high is None else min(high, value)
+    return low, high
+
+
+def is_cold_query(sql, horizon):
+    """True if the query only touches heights that live in the cold tier"""
+    if horizon < 0:
+        return False
+    low, high = height_range(sql)
+    return high is not None and high <= horizon and low <= high
+
+
+COLD_TABLE_REFERENCE = re.compile(r"\b(?:" + "|".join(COLD_TABLES) + r")\b", re.IGNORECASE)
+
+
+def spans_cold_horizon(sql, horizon):
+    """True if the query reads cold tables at heights both sides of the horizon (or unbounded)
+
+    MySQL alone would silently answer such a query from the warm heights only.
+    """
+    if horizon < 0 or not COLD_TABLE_REFERENCE.search(sql):
+        return False
+    low, _ = height_range(sql)
+    return low <= horizon and not is_cold_query(sql, horizon)
+
+
+# Tables an in-memory cold query can read
+COLD_QUERY_TABLES = ["bitcoin_block"] + COLD_TABLES
+COLD_QUERY_TABLE_NAME = re.compile(r"(?<![\w\".`])(" + "|".join(COLD_QUERY_TABLES) + r")(?![\w\"`])", re.IGNORECASE)
+
+
+def read_cold_schema(cursor):
+    """{table: [columns]} of the tables a cold query can read, from the MySQL schema"""
+    cursor.execute(f"""
+        SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({", ".join(["%s"] * len(COLD_QUERY_TABLES))})
+        ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """, COLD_QUERY_TABLES)
+    schema = {table: [] for table in COLD_QUERY_TABLES}
+    for table, column in cursor.fetchall():
+        schema[table].append(column)
+    return schema
+
+
+def to_sqlite(sql):
+    """MySQL query text as SQLite accepts it: backticks become double quotes and table names are quoted
+
+    `transaction` is a keyword in SQLite, so an unquoted FROM transaction is a syntax error there.
+    """
+    parts = re.split(r"('(?:[^'\\]|\\.|'')*')", sql)
+    for i in range(0, len(parts), 2):
+        parts[i] = COLD_QUERY_TABLE_NAME.sub(r'"\1"', parts[i].replace("`", '"'))
+    return "".join(parts)
+
+
+def query_cold_rows(sql, schema, block_rows, records):
+    """Run `sql` in an in-memory SQLite database over bitcoin_block rows and cold segment records
+
+    Every table in `schema` is created even when no rows fall in the range, so a query
+    over an empty table returns nothing instead of failing.
+    """
+    lite = sqlite3.connect(":memory:")
+    lite.create_function("UNIX_TIMESTAMP", 0, lambda: int(time.time()))
+    try:
+        rows = {table: [] for table in COLD_QUERY_TABLES}
+        rows["bitcoin_block"] = block_rows
+        for record in records:
+            for table in COLD_TABLES:
+                rows[table].extend(record.get(table, []))
+        for table, table_rows in rows.items():
+            columns = list(schema.get(table, []))
+            for row in table_rows[:1]:
+                columns += [column for column in row if column not in columns]
+            if not columns:
+                continue
+            _load_rows(lite, table, columns, [[row.get(column) for column in columns] for row in table_rows])
+
+        cursor = lite.execute(to_sqlite(sql))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        lite.close()
+
+
+def execute_cold_sql(sql, conn, store):
+    """Run a read-only query over the cold tier in an in-memory SQLite database
+
+    bitcoin_block rows for the range come from MySQL, the other tables from segments.
+    """
+    low, high = height_range(sql)
+    with conn.cursor() as cursor:
+        schema = read_cold_schema(cursor)
+        cursor.execute("SELECT * FROM bitcoin_block WHERE height BETWEEN %s AND %s", (low, high))
+        columns = [column[0] for column in cursor.description]
+        block_rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    return query_cold_rows(sql, schema, block_rows, store.iter_blocks(low, high))
+
+
+def _load_rows(lite, table, columns, rows):
+    quoted = ", ".join(f'"{c}"' for c in columns)
+    lite.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({quoted})')
+    if rows:
+        lite.executemany(f'INSERT INTO "{table}" ({quoted}) VALUES ({", ".join("?" * len(columns))})', rows)
+
+
+# Schema the cold query check reads its table columns from
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "block_info_schema.sql")
+
+# (query as the text-to-SQL pipeline writes it, expected rows) over the synthetic blocks 0..9,
+# two transactions per block, witnesses only at even heights
+CHECK_QUERIES = [
+    ("SELECT COUNT(*) AS txs FROM transaction WHERE height BETWEEN 0 AND 9", [{"txs": 20}]),
+    ("SELECT t.height, SUM(o.value) AS total FROM `transaction` t JOIN vout o ON o.txid = t.txid "
+     "WHERE t.height = 3 GROUP BY t.height", [{"height": 3, "total": 2.0}]),
+    ("SELECT COUNT(*) AS witnesses FROM vin_witness w JOIN vin i ON i.id = w.vin_id WHERE i.height = 3",
+     [{"witnesses": 0}]),
+    ("SELECT COUNT(*) AS scripts FROM script_pubkey s JOIN vout o ON o.id = s.vout_id WHERE o.height <= 9",
+     [{"scripts": 0}]),
+    ("SELECT b.hash FROM bitcoin_block b WHERE b.height = 5 AND b.nTx = 2", [{"hash": "block-5"}]),
+]
+
+
+def schema_file_columns(path=SCHEMA_PATH):
+    """{table: [columns]} of the cold query tables, parsed from a CREATE TABLE schema file"""
+    with open(path) as f:
+        text = f.read()
+    schema = {}
+    for table, body in re.findall(r"CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\n\);", text, re.DOTALL):
+        if table in COLD_QUERY_TABLES:
+            schema[table] = [line.split()[0] for line in (l.strip() for l in body.splitlines())
+                             if line and not line.startswith("--")
+                             and line.split()[0].upper() not in ("INDEX", "KEY", "PRIMARY", "UNIQUE", "FOREIGN")]
+    return schema
+
+
+def check_cold_queries(root=None):
+    """Write synthetic blocks to a cold store and run CHECK_QUERIES over it; returns failed queries
+
+    script_pubkey has no rows in the segments, so it is only queryable when the tables
+    are created from the schema.
+    """
+    root = root or tempfile.mkdtemp()
+    store = ColdStore(root)
+    schema = schema_file_columns()
+    records, block_rows = [], []
+    for height in range(10):
+        record = {"height": height, "hash": f"block-{height}", **{table: [] for table in COLD_TABLES}}
+        for index in range(2):
+            txid = f"tx-{height}-{index}"
+            row_id = height * 2 + index
+            record["transaction"].append({"txid": txid, "block_hash": f"block-{height}", "height": height,
+                                          "tx_index": index})
+            record["vin"].append({"id": row_id, "txid": txid, "height": height, "sequence": 0})
+            record["vout"].append({"id": row_id, "txid": txid, "height": height, "value": 1.0, "n": 0})
+            if height % 2 == 0:
+                record["vin_witness"].append({"id": row_id, "vin_id": row_id, "witness": "00"})
+        records.append(record)
+        block_rows.append({"hash": f"block-{height}", "height": height, "nTx": 2})
+    index = store.load_index()
+    index["segments"].append(store.write_segment(0, 9, records))
+    index["horizon"] = 9
+    store.save_index(index)
+
+    failed = []
+    for sql, expected in CHECK_QUERIES:
+        low, high = height_range(sql)
+        try:
+            result = query_cold_rows(sql, schema, [row for row in block_rows if low <= row["height"] <= high],
+                                     store.iter_blocks(low, high))
+        except sqlite3.Error as e:
+            result = f"error: {e}"
+        ok = result == expected
+        print(f"{'✅' if ok else '❌'} {sql} -> {result}")
+        if not ok:
+            failed.append(sql)
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check_cold_queries() else 0)
@@ -0,0 +1,224 @@
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+# Read replicas as comma-separated host[:port]; same credentials and database as the primary
+DB_READER_HOSTS = os.getenv("DB_READER_HOSTS", "")
+# A replica more than this many blocks behind the primary's tip is not used
+MAX_REPLICA_LAG_BLOCKS = int(os.getenv("MAX_REPLICA_LAG_BLOCKS", 6))
+# Seconds a cached tip height is trusted before it is read again
+TIP_REFRESH_SECONDS = 5
+# Idle connections kept per pool
+POOL_SIZE = 4
+
+TIP_SQL = "SELECT height FROM bitcoin_block ORDER BY height DESC LIMIT 1"
+
+
+def reader_configs(db_config, hosts=DB_READER_HOSTS):
+    """pymysql.connect kwargs for each replica in `hosts`, based on the primary's config"""
+    configs = []
+    for entry in filter(None, (host.strip() for host in hosts.split(","))):
+        host, _, port = entry.partition(":")
+        configs.append(dict(db_config, host=host, port=int(port) if port else db_config.get("port", 3306)))
+    return configs
+
+
+def pymysql_connector(config):
+    def connect():
+        import pymysql
+        return pymysql.connect(**config)
+    return connect
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Reuse connections from `connect`; a connection that raised is closed, not returned"""
+
+    def __init__(self, name, connect, size=POOL_SIZE):
+        self.name = name
+        self.connect = connect
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self.connect()
+        else:
+            if hasattr(conn, "ping"):
+                import pymysql
+                try:
+                    conn.ping(reconnect=True)
+                except pymysql.err.OperationalError:
+                    # Server gone and reconnect failed: replace it rather than fail the caller
+                    _close_quietly(conn)
+                    conn = self.connect()
+        try:
+            yield conn
+        except Exception:
+            conn.close()
+            raise
+        # End any read snapshot so the next user sees current data
+        conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class DbRouter:
+    """Writer pool plus replica reader pools, routed by replica tip height
+
+    reader(min_height) hands out a replica that has ingested at least `min_height` and is
+    within `max_lag_blocks` of the primary, falling back to the primary when none is.
+    Heights this router wrote (note_write) become the default `min_height`, so a process
+    reads its own writes.
+    """
+
+    def __init__(self, writer_connect, reader_connects=(), max_lag_blocks=MAX_REPLICA_LAG_BLOCKS,
+                 tip_refresh_seconds=TIP_REFRESH_SECONDS, pool_size=POOL_SIZE):
+        self.writer_pool = ConnectionPool("primary", writer_connect, pool_size)
+        self.reader_pools = [ConnectionPool(f"replica-{i}", connect, pool_size)
+                             for i, connect in enumerate(reader_connects)]
+        self.max_lag_blocks = max_lag_blocks
+        self.tip_refresh_seconds = tip_refresh_seconds
+        self.written_height = None
+        # Connection kwargs per pool name, for work that opens its own connections (from_config only)
+        self.configs = {}
+        self._tips = {}
+        self._lock = threading.Lock()
+        self._next = 0
+
+    @classmethod
+    def from_config(cls, db_config, hosts=DB_READER_HOSTS, **kwargs):
+        replicas = reader_configs(db_config, hosts)
+        router = cls(pymysql_connector(db_config), [pymysql_connector(config) for config in replicas], **kwargs)
+        router.configs = {"primary": db_config, **{f"replica-{i}": config for i, config in enumerate(replicas)}}
+        return router
+
+    def tip(self, pool, max_age=None):
+        """Highest block height stored behind `pool` (cached for `tip_refresh_seconds`)"""
+        max_age = self.tip_refresh_seconds if max_age is None else max_age
+        cached = self._tips.get(pool.name)
+        if cached and time.monotonic() - cached[1] <= max_age:
+            return cached[0]
+        try:
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(TIP_SQL)
+                    row = cursor.fetchone()
+                finally:
+                    cursor.close()
+            height = row[0] if row else -1
+        except Exception as e:
+            print(f"❌ Tip check failed for {pool.name}: {e}")
+            height = None
+        self._tips[pool.name] = (height, time.monotonic())
+        return height
+
+    def note_write(self, height):
+        """Record a committed write so later reads in this process see it"""
+        with self._lock:
+            if self.written_height is None or height > self.written_height:
+                self.written_height = height
+
+    def choose_reader(self, min_height=None):
+        """The pool a read should use: an up-to-date replica, else the primary"""
+        if not self.reader_pools:
+            return self.writer_pool
+        required = max(h for h in (min_height, self.written_height, -1) if h is not None)
+        primary_tip = self.tip(self.writer_pool)
+        if primary_tip is not None:
+            required = max(required, primary_tip - self.max_lag_blocks)
+
+        with self._lock:
+            start = self._next
+            self._next += 1
+        start %= len(self.reader_pools)
+        ordered = self.reader_pools[start:] + self.reader_pools[:start]
+        for pool in ordered:
+            tip = self.tip(pool)
+            if tip is not None and tip < required:
+                # It may have caught up since the cached read
+                tip = self.tip(pool, max_age=1)
+            if tip is not None and tip >= required:
+                return pool
+        return self.writer_pool
+
+    @contextmanager
+    def reader(self, min_height=None):
+        pool = self.choose_reader(min_height)
+        with pool.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def writer(self):
+        with self.writer_pool.connection() as conn:
+            yield conn
+
+    def status(self):
+        return {pool.name: self.tip(pool) for pool in [self.writer_pool] + self.reader_pools}
+
+    def close(self):
+        for pool in [self.writer_pool] + self.reader_pools:
+            pool.close()
+
+
+def simulate_replica_routing(directory, blocks=20, lag=4, max_lag_blocks=MAX_REPLICA_LAG_BLOCKS):
+    """Route reads between two SQLite files standing in for a primary and a lagging replica
+
+    The replica trails the primary by `lag` blocks for the first half of the run and is
+    caught up for the second. Returns [(height, pool of a lag-tolerant read, pool of a read
+    that must see `height`)].
+    """
+    import sqlite3
+
+    primary_path, replica_path = (os.path.join(directory, name) for name in ("primary.db", "replica.db"))
+    for path in (primary_path, replica_path):
+        if os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE bitcoin_block (height INTEGER PRIMARY KEY, hash TEXT)")
+        conn.commit()
+        conn.close()
+
+    def replicate(up_to):
+        replica = sqlite3.connect(replica_path)
+        replica.execute("ATTACH DATABASE ? AS source", (primary_path,))
+        replica.execute("INSERT OR IGNORE INTO bitcoin_block SELECT * FROM source.bitcoin_block WHERE height <= ?",
+                        (up_to,))
+        replica.commit()
+        replica.close()
+
+    router = DbRouter(lambda: sqlite3.connect(primary_path, check_same_thread=False),
+                      [lambda: sqlite3.connect(replica_path, check_same_thread=False)],
+                      max_lag_blocks=max_lag_blocks, tip_refresh_seconds=0)
+    routes = []
+    try:
+        for height in range(blocks):
+            with router.writer() as conn:
+                conn.execute("INSERT INTO bitcoin_block VALUES (?, ?)", (height, f"{height:064x}"))
+                conn.commit()
+            replicate(height - lag if height < blocks // 2 else height)
+            default = router.choose_reader(min_height=None)
+            routes.append((height, default.name, router.choose_reader(min_height=height).name))
+    finally:
+        router.close()
+    return routes
@@ -0,0 +1,182 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+# Heights fetched per task
+SHARD_SIZE = 10
+# Tasks allowed to run ahead of the writer (back-pressure)
+MAX_IN_FLIGHT = 32
+# Seconds between completion checks of spawned Modal calls when results are unordered
+POLL_INTERVAL = 0.05
+
+
+def shard_heights(start_height, end_height, shard_size=SHARD_SIZE):
+    """Split [start, end] into contiguous height shards"""
+    return [
+        list(range(shard_start, min(shard_start + shard_size, end_height + 1)))
+        for shard_start in range(start_height, end_height + 1, shard_size)
+    ]
+
+
+class LocalExecutor:
+    """Process-pool backend; runs anywhere, no cloud needed"""
+
+    def __init__(self, parallelism, max_in_flight=MAX_IN_FLIGHT):
+        self.parallelism = parallelism
+        self.max_in_flight = max_in_flight
+
+    def starmap(self, fn, items, ordered=True):
+        """Yield fn(*item) for every item, at most `max_in_flight` submitted ahead of the consumer"""
+        from collections import deque
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        items = list(items)
+        with ProcessPoolExecutor(max_workers=self.parallelism) as pool:
+            pending = deque()
+            next_item = 0
+            while next_item < len(items) or pending:
+                while next_item < len(items) and len(pending) < self.max_in_flight:
+                    pending.append(pool.submit(fn, *items[next_item]))
+                    next_item += 1
+                if ordered:
+                    yield pending.popleft().result()
+                else:
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        yield future.result()
+
+    def map(self, fn, items, ordered=True):
+        return self.starmap(fn, [(item,) for item in items], ordered)
+
+
+class ModalExecutor:
+    """Modal backend: fans tasks out across containers with Function.spawn
+
+    `fn` passed to map/starmap must be a Modal Function. Up to `max_in_flight` inputs
+    (default `parallelism`) are kept outstanding at all times and a new one is spawned
+    as soon as the consumer takes a result, so at most that many containers are busy
+    and the caller's writer bounds how far fetchers run ahead.
+    """
+
+    def __init__(self, parallelism, max_in_flight=None):
+        self.parallelism = parallelism
+        self.max_in_flight = max_in_flight or parallelism
+
+    def _done(self, call):
+        """(True, result) if a spawned call has finished, else (False, None)"""
+        import modal
+
+        try:
+            return True, call.get(timeout=0)
+        except (TimeoutError, modal.exception.TimeoutError):
+            return False, None
+
+    def starmap(self, fn, items, ordered=True):
+        """Yield fn(*item) for every item, keeping `max_in_flight` calls outstanding"""
+        from collections import deque
+
+        items = list(items)
+        pending = deque()
+        next_item = 0
+        while next_item < len(items) or pending:
+            while next_item < len(items) and len(pending) < self.max_in_flight:
+                pending.append(fn.spawn(*items[next_item]))
+                next_item += 1
+            if ordered:
+                yield pending.popleft().get()
+                continue
+            finished = []
+            while not finished:
+                for call in list(pending):
+                    done, result = self._done(call)
+                    if done:
+                        pending.remove(call)
+                        finished.append(result)
+                if not finished:
+                    time.sleep(POLL_INTERVAL)
+            yield from finished
+
+    def map(self, fn, items, ordered=True):
+        return self.starmap(fn, [(item,) for item in items], ordered)
+
+
+def rpc_batch(rpc_url, auth, calls, timeout=120):
+    """Send [(method, params)] as one JSON-RPC batch and return results in order"""
+    payload = [{"jsonrpc": "1.0", "id": i, "method": method, "params": params} for i, (method, params) in enumerate(calls)]
+    response = requests.post(rpc_url, auth=auth, data=json.dumps(payload),
+                             headers={"content-type": "text/plain"}, timeout=timeout)
+    replies = sorted(response.json(), key=lambda reply: reply["id"])
+    for reply in replies:
+        if reply.get("error"):
+            raise RuntimeError(f"RPC error: {reply['error']}")
+    return [reply["result"] for reply in replies]
+
+
+def fetch_blocks_shard(rpc_url, auth, heights):
+    """Fetch verbosity-2 blocks for a shard of heights with two batched round trips"""
+    hashes = rpc_batch(rpc_url, auth, [("getblockhash", [height]) for height in heights])
+    return rpc_batch(rpc_url, auth, [("getblock", [block_hash, 2]) for block_hash in hashes])
+
+
+def ingest_range(start_height, end_height, fetch_shard, write_blocks, executor,
+                 shard_size=SHARD_SIZE, ordered=True):
+    """Fetch shards in parallel and hand them to the writer
+
+    `fetch_shard(heights)` returns blocks, `write_blocks(blocks)` persists them and returns
+    the heights it failed to write (which are reported, not counted).
+    With `ordered=True` the writer sees shards in height order.
+    """
+    started = time.perf_counter()
+    blocks_written = 0
+    failed = []
+    for blocks in executor.map(fetch_shard, shard_heights(start_height, end_height, shard_size), ordered):
+        shard_failed = write_blocks(blocks) or []
+        failed.extend(shard_failed)
+        blocks_written += len(blocks) - len(shard_failed)
+    elapsed = time.perf_counter() - started
+    return {"blocks": blocks_written, "failed": sorted(failed), "seconds": round(elapsed, 3),
+            "blocks_per_second": round(blocks_written / elapsed, 1) if elapsed else None}
+
+
+def _stub_fetch_and_map(rpc_url, heights):
+    """Benchmark task: fetch a shard from the stub server and map it into table rows"""
+    from bulk_load import TABLE_COLUMNS
+
+    rows = []
+    for block in fetch_blocks_shard(rpc_url, None, heights):
+        rows.append([block.get(col) for col in TABLE_COLUMNS["bitcoin_block"]])
+        for tx in block["tx"]:
+            rows.append([tx.get(col) for col in TABLE_COLUMNS["transaction"]])
+            rows.extend([tx["txid"], vin.get("coinbase"), vin.get("sequence")] for vin in tx["vin"])
+            rows.extend([tx["txid"], vout.get("value"), vout.get("n")] for vout in tx["vout"])
+    return len(heights), len(rows)
+
+
+def benchmark_scaling(workers=(1, 2, 4, 8), blocks=400, shard_size=SHARD_SIZE, latency=0.02, write_delay=0.0005):
+    """Blocks/s at each worker count against the local RPC stub and a stand-in writer"""
+    from rpc_stub import StubChain, start_stub_server
+
+    server, url, _ = start_stub_server(StubChain(latency=latency))
+    report = {}
+    try:
+        for parallelism in workers:
+            executor = LocalExecutor(parallelism)
+            shards = [(url, heights) for heights in shard_heights(0, blocks - 1, shard_size)]
+            started = time.perf_counter()
+            rows = 0
+            for _, shard_rows in executor.starmap(_stub_fetch_and_map, shards):
+                rows += shard_rows
+                time.sleep(write_delay * shard_size)  # stand-in for the DB writer
+            elapsed = time.perf_counter() - started
+            report[parallelism] = round(blocks / elapsed, 1)
+            print(f"⏱️ {parallelism} workers: {report[parallelism]} blocks/s ({rows} rows)")
+    finally:
+        server.shutdown()
+    return report
+
+
+if __name__ == "__main__":
+    benchmark_scaling()
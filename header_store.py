@@ -0,0 +1,239 @@
+import os
+import time
+import struct
+import hashlib
+
+import numpy as np
+
+HEADER_STORE_DIR = "/headers"
+HEADER_FILE = "headers.dat"
+# Headers requested per JSON-RPC batch while syncing
+SYNC_BATCH_SIZE = 2000
+
+# One fixed-width record per height: the 80-byte header exactly as serialized on the wire
+# (so a raw header is its own record prefix), followed by derived fields.
+# Hashes are in internal byte order; reverse for the hex bitcoind displays.
+HEADER_DTYPE = np.dtype([
+    ("version", "<i4"),
+    ("prev_hash", "u1", (32,)),
+    ("merkle_root", "u1", (32,)),
+    ("time", "<u4"),
+    ("bits", "<u4"),
+    ("nonce", "<u4"),
+    ("hash", "u1", (32,)),
+    ("chainwork", "u1", (32,)),  # big-endian cumulative work
+    ("mediantime", "<u4"),
+])
+RAW_HEADER_SIZE = 80
+
+
+def sha256d(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def bits_to_target(bits):
+    exponent, mantissa = bits >> 24, bits & 0x007fffff
+    return mantissa >> (8 * (3 - exponent)) if exponent <= 3 else mantissa << (8 * (exponent - 3))
+
+
+def header_work(bits):
+    return (1 << 256) // (bits_to_target(bits) + 1)
+
+
+def bits_to_difficulty(bits):
+    return 0xffff * 256.0 ** (0x1d - (bits >> 24)) / (bits & 0x007fffff)
+
+
+def header_from_json(block):
+    """Serialize the 80-byte header from getblock/getblockheader JSON"""
+    return struct.pack(
+        "<i32s32sIII",
+        block["version"],
+        bytes.fromhex(block.get("previousblockhash") or "00" * 32)[::-1],
+        bytes.fromhex(block["merkleroot"])[::-1],
+        block["time"],
+        int(block["bits"], 16),
+        block["nonce"],
+    )
+
+
+class HeaderStore:
+    """Append-only, memory-mapped header chain with height and hash indexes
+
+    Height lookups index the mapped array directly; hash lookups binary-search a sorted
+    array of 8-byte hash prefixes. Readers call refresh() to pick up headers appended
+    by the writer (e.g. after reloading the Modal volume).
+    """
+
+    def __init__(self, directory=HEADER_STORE_DIR):
+        self.path = os.path.join(directory, HEADER_FILE)
+        os.makedirs(directory, exist_ok=True)
+        self.refresh()
+
+    def refresh(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        count = size // HEADER_DTYPE.itemsize
+        if count:
+            self.records = np.memmap(self.path, dtype=HEADER_DTYPE, mode="r", shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=HEADER_DTYPE)
+        self._build_hash_index()
+
+    def close(self):
+        """Release the memory map (e.g. before reloading the volume underneath it)"""
+        self.records = np.empty(0, dtype=HEADER_DTYPE)
+        self._build_hash_index()
+
+    def _build_hash_index(self):
+        prefixes = np.ascontiguousarray(self.records["hash"][:, :8]).view("<u8").ravel()
+        self._hash_order = np.argsort(prefixes, kind="stable")
+        self._sorted_prefixes = prefixes[self._hash_order]
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def tip_height(self):
+        return len(self.records) - 1
+
+    def block_hash(self, height):
+        return bytes(self.records["hash"][height])[::-1].hex()
+
+    def height_of(self, block_hash):
+        """Height of a block hash (display hex), or None"""
+        internal = bytes.fromhex(block_hash)[::-1]
+        prefix = np.frombuffer(internal[:8], dtype="<u8")[0]
+        position = np.searchsorted(self._sorted_prefixes, prefix)
+        while position < len(self._sorted_prefixes) and self._sorted_prefixes[position] == prefix:
+            height = int(self._hash_order[position])
+            if bytes(self.records["hash"][height]) == internal:
+                return height
+            position += 1
+        return None
+
+    def raw_header(self, height):
+        return self.records[height:height + 1].tobytes()[:RAW_HEADER_SIZE]
+
+    def chainwork(self, height):
+        return int.from_bytes(bytes(self.records["chainwork"][height]), "big")
+
+    def get_header(self, height=None, block_hash=None):
+        """getblockheader-style dict for a height or hash, or None"""
+        if height is None:
+            height = self.height_of(block_hash)
+        if height is None or not 0 <= height < len(self.records):
+            return None
+        record = self.records[height]
+        return {
+            "hash": self.block_hash(height),
+            "height": height,
+            "confirmations": self.tip_height - height + 1,
+            "version": int(record["version"]),
+            "merkleroot": bytes(record["merkle_root"])[::-1].hex(),
+            "time": int(record["time"]),
+            "mediantime": int(record["mediantime"]),
+            "nonce": int(record["nonce"]),
+            "bits": f"{int(record['bits']):08x}",
+            "difficulty": bits_to_difficulty(int(record["bits"])),
+            "chainwork": f"{self.chainwork(height):064x}",
+            "previousblockhash": bytes(record["prev_hash"])[::-1].hex() if height else None,
+            "nextblockhash": self.block_hash(height + 1) if height < self.tip_height else None,
+        }
+
+    # Vectorized views for analytics
+
+    def times(self):
+        return self.records["time"]
+
+    def difficulty(self):
+        """Difficulty per height as float64, computed from compact bits"""
+        bits = self.records["bits"].astype(np.int64)
+        exponent = (bits >> 24).astype(np.float64)
+        mantissa = (bits & 0x007fffff).astype(np.float64)
+        return (0xffff / mantissa) * np.power(256.0, 0x1d - exponent)
+
+    def block_intervals(self):
+        return np.diff(self.times().astype(np.int64))
+
+    # Writer side
+
+    def append_raw_headers(self, raw_headers):
+        """Append consecutive 80-byte headers, checking each links to the previous one"""
+        if not raw_headers:
+            return 0
+        count = len(self.records)
+        previous_hash = bytes(self.records["hash"][-1]) if count else b"\x00" * 32
+        previous_work = self.chainwork(count - 1) if count else 0
+        recent_times = [int(t) for t in self.records["time"][max(count - 10, 0):]]
+
+        new = np.zeros(len(raw_headers), dtype=HEADER_DTYPE)
+        raw_view = new.view(np.uint8).reshape(len(raw_headers), HEADER_DTYPE.itemsize)
+        for i, raw in enumerate(raw_headers):
+            if len(raw) != RAW_HEADER_SIZE:
+                raise ValueError(f"Header at height {count + i} is {len(raw)} bytes")
+            if raw[4:36] != previous_hash:
+                raise ValueError(f"Header at height {count + i} does not extend the stored chain")
+            raw_view[i, :RAW_HEADER_SIZE] = np.frombuffer(raw, dtype=np.uint8)
+            previous_hash = sha256d(raw)
+            previous_work += header_work(int(new["bits"][i]))
+            recent_times = (recent_times + [int(new["time"][i])])[-11:]
+            new["hash"][i] = np.frombuffer(previous_hash, dtype=np.uint8)
+            new["chainwork"][i] = np.frombuffer(previous_work.to_bytes(32, "big"), dtype=np.uint8)
+            new["mediantime"][i] = sorted(recent_times)[len(recent_times) // 2]
+
+        with open(self.path, "ab") as f:
+            f.write(new.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.refresh()
+        return len(raw_headers)
+
+    def truncate(self, height):
+        """Drop headers from `height` upwards (reorg)"""
+        with open(self.path, "r+b") as f:
+            f.truncate(height * HEADER_DTYPE.itemsize)
+        self.refresh()
+
+    def sync(self, rpc_call, rpc_batch=None, batch_size=SYNC_BATCH_SIZE):
+        """Catch up with the node's tip via getblockheader, unwinding any reorged headers first
+
+        `rpc_batch(calls)` sends [(method, params)] in one round trip; without it calls go one by one.
+        """
+        if rpc_batch is None:
+            rpc_batch = lambda calls: [rpc_call(method, params) for method, params in calls]
+        fork_height = self.tip_height
+        while fork_height >= 0 and self.block_hash(fork_height) != rpc_call("getblockhash", [fork_height]):
+            fork_height -= 1
+        if fork_height < self.tip_height:
+            print(f"🔀 Unwinding headers above #{fork_height}")
+            self.truncate(fork_height + 1)
+
+        tip = rpc_call("getblockcount", [])
+        appended = 0
+        for start in range(fork_height + 1, tip + 1, batch_size):
+            heights = range(start, min(start + batch_size, tip + 1))
+            hashes = rpc_batch([("getblockhash", [height]) for height in heights])
+            raw_headers = rpc_batch([("getblockheader", [block_hash, False]) for block_hash in hashes])
+            appended += self.append_raw_headers([bytes.fromhex(raw) for raw in raw_headers])
+        return appended
+
+
+def benchmark_lookups(store, n=100_000, seed=0):
+    """Microseconds per height and per hash lookup"""
+    rng = np.random.default_rng(seed)
+    heights = rng.integers(0, len(store), n)
+    hashes = [store.block_hash(int(height)) for height in heights]
+
+    started = time.perf_counter()
+    for height in heights:
+        store.get_header(height=int(height))
+    height_us = (time.perf_counter() - started) * 1e6 / n
+
+    started = time.perf_counter()
+    for block_hash in hashes:
+        store.height_of(block_hash)
+    hash_us = (time.perf_counter() - started) * 1e6 / n
+
+    report = {"headers": len(store), "height_lookup_us": round(height_us, 2), "hash_lookup_us": round(hash_us, 2)}
+    print(f"⏱️ {len(store)} headers: get_header {report['height_lookup_us']} µs, height_of {report['hash_lookup_us']} µs")
+    return report
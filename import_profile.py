@@ -0,0 +1,273 @@
+import os
+import re
+import sys
+import ast
+import json
+import subprocess
+
+# Modules each container role imports on startup
+ROLE_IMPORTS = {
+    "rpc": ["chainstackRPCcall", "requests", "rpc_router", "tunnel_cache"],
+    "writer": ["chainstackRPCcall", "pymysql", "db_router", "ingestion_ledger", "script_store", "address_index",
+               "block_stats", "outbox"],
+    "sync": ["chainstackRPCcall", "pymysql", "requests", "rpc_router", "tunnel_cache", "spool", "db_router",
+             "ingestion_ledger"],
+}
+# Image each role's functions run on (variables in chainstackRPCcall.py)
+ROLE_IMAGES = {"rpc": "rpc_image", "writer": "db_image", "sync": "sync_image"}
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chainstackRPCcall.py")
+# Installed in every Modal container, so never missing from an image
+MODAL_RUNTIME = {"modal"}
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_baseline.json")
+# A role regresses when its import time grows by more than this fraction over the baseline
+REGRESSION_THRESHOLD = 0.25
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$")
+
+
+def parse_importtime(stderr):
+    """Parse `python -X importtime` output into [(module, self_us, cumulative_us, depth)]"""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module.strip(), int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def profile_imports(modules, python=sys.executable):
+    """Import `modules` in a fresh interpreter and return the parsed importtime entries"""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([python, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return parse_importtime(result.stderr)
+
+
+def summarize(entries, top=15):
+    """Total import time and the slowest top-level packages by cumulative time"""
+    total_us = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+    by_package = {}
+    for module, _, cumulative, depth in entries:
+        if depth == 0:
+            package = module.split(".")[0]
+            by_package[package] = by_package.get(package, 0) + cumulative
+    slowest = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"total_ms": round(total_us / 1000, 1), "slowest": [(name, round(us / 1000, 1)) for name, us in slowest]}
+
+
+def _imported_modules(node):
+    modules = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in child.names)
+        elif isinstance(child, ast.ImportFrom) and child.module and not child.level:
+            modules.add(child.module.split(".")[0])
+    return modules
+
+
+def _image_contents(tree):
+    """{image variable: (pip packages, mounted local modules)}, following `name = base.method(...)` chains
+
+    Packages come from pip_install and local modules from copy_mount of
+    Mount.from_local_python_packages or add_local_python_source, with module lists
+    given inline or as a top-level list constant.
+    """
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            try:
+                constants[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                pass
+
+    def names(args):
+        values = []
+        for arg in args:
+            if isinstance(arg, ast.Starred) and isinstance(arg.value, ast.Name):
+                values.extend(constants.get(arg.value.id, []))
+            elif isinstance(arg, ast.Name):
+                values.extend(constants.get(arg.id, []))
+            elif isinstance(arg, (ast.Constant, ast.List, ast.Tuple)):
+                value = ast.literal_eval(arg)
+                values.extend([value] if isinstance(value, str) else value)
+        return values
+
+    direct, bases = {}, {}
+    for node in tree.body:
+        if not (isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name)):
+            continue
+        packages, mounted, call = set(), set(), node.value
+        is_image = False
+        while isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute):
+            method = call.func.attr
+            if method == "pip_install":
+                packages |= {re.split(r"[\[<>=]", package)[0] for package in names(call.args)}
+            elif method == "add_local_python_source":
+                mounted |= set(names(call.args))
+            elif method == "copy_mount":
+                for arg in call.args:
+                    if isinstance(arg, ast.Call) and getattr(arg.func, "attr", None) == "from_local_python_packages":
+                        mounted |= set(names(arg.args))
+            is_image = is_image or method in ("pip_install", "add_local_python_source", "copy_mount", "env",
+                                              "debian_slim", "from_registry", "run_commands", "apt_install")
+            call = call.func.value
+        if not is_image:
+            continue
+        direct[node.targets[0].id] = (packages, mounted)
+        if isinstance(call, ast.Name):
+            bases[node.targets[0].id] = call.id
+
+    def resolve(name):
+        packages, mounted = direct.get(name, (set(), set()))
+        if name in bases:
+            base_packages, base_mounted = resolve(bases[name])
+            return packages | base_packages, mounted | base_mounted
+        return packages, mounted
+    return {name: resolve(name) for name in direct}
+
+
+def function_imports(app_path=APP_PATH):
+    """{image variable: (modules its functions import, packages it installs, local modules it mounts)}
+
+    Follows calls to other top-level functions of the app, and the module-level imports of
+    local modules (imports inside their functions only run when that code path does).
+    """
+    with open(app_path) as f:
+        tree = ast.parse(f.read())
+    directory = os.path.dirname(app_path)
+    functions = {node.name: node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.ClassDef))}
+
+    def called(node):
+        """[(name, runs here)] for calls in `node`; Modal calls other than .local() run in their own container"""
+        names = []
+        for child in ast.walk(node):
+            if isinstance(child, ast.Call):
+                target, attributes = child.func, set()
+                while isinstance(target, (ast.Attribute, ast.Call)):
+                    if isinstance(target, ast.Attribute):
+                        attributes.add(target.attr)
+                        target = target.value
+                    else:
+                        target = target.func
+                if isinstance(target, ast.Name):
+                    names.append((target.id, "local" in attributes))
+        return names
+
+    def local_imports(module, seen):
+        path = os.path.join(directory, f"{module}.py")
+        if module in seen or not os.path.exists(path):
+            return set()
+        seen.add(module)
+        with open(path) as f:
+            top_level = [node for node in ast.parse(f.read()).body if isinstance(node, (ast.Import, ast.ImportFrom))]
+        modules = set().union(*(_imported_modules(node) for node in top_level)) if top_level else set()
+        for name in list(modules):
+            modules |= local_imports(name, seen)
+        return modules
+
+    def image_of(node):
+        for decorator in node.decorator_list:
+            if isinstance(decorator, ast.Call) and getattr(decorator.func, "attr", None) in ("function", "cls"):
+                for keyword in decorator.keywords:
+                    if keyword.arg == "image" and isinstance(keyword.value, ast.Name):
+                        return keyword.value.id
+        return None
+
+    contents = _image_contents(tree)
+    imports = {}
+    for name, node in functions.items():
+        image = image_of(node)
+        if image is None:
+            continue
+        reached, queue = set(), [name]
+        while queue:
+            current = queue.pop()
+            if current in reached or current not in functions:
+                continue
+            reached.add(current)
+            queue.extend(callee for callee, runs_here in called(functions[current])
+                         if callee in functions and (runs_here or image_of(functions[callee]) is None))
+        modules = set().union(*(_imported_modules(functions[current]) for current in reached))
+        seen = set()
+        for module in list(modules):
+            modules |= local_imports(module, seen)
+        imports.setdefault(image, (set(), *contents.get(image, (set(), set()))))[0].update(modules)
+    return imports
+
+
+def check_roles(app_path=APP_PATH):
+    """Compare each role's functions with ROLE_IMPORTS and its image; returns a list of problems
+
+    Local modules must be mounted into the image of every function that imports them,
+    since Modal only ships the entrypoint file itself.
+    """
+    directory = os.path.dirname(app_path)
+    app_module = os.path.splitext(os.path.basename(app_path))[0]
+    imports = function_imports(app_path)
+    problems = []
+    for role, image in ROLE_IMAGES.items():
+        modules, installed, _ = imports.get(image, (set(), set(), set()))
+        third_party = {module for module in modules if module not in sys.stdlib_module_names
+                       and not os.path.exists(os.path.join(directory, f"{module}.py"))}
+        unprofiled = sorted(modules - set(ROLE_IMPORTS[role]) - set(sys.stdlib_module_names) - MODAL_RUNTIME)
+        if unprofiled:
+            problems.append(f"{role}: functions on {image} import {unprofiled}, missing from ROLE_IMPORTS")
+        uninstalled = sorted(third_party - installed - MODAL_RUNTIME)
+        if uninstalled:
+            problems.append(f"{role}: functions on {image} import {uninstalled}, not installed in the image")
+    for image, (modules, _, mounted) in sorted(imports.items()):
+        local = {module for module in modules if module != app_module
+                 and os.path.exists(os.path.join(directory, f"{module}.py"))}
+        unmounted = sorted(local - mounted)
+        if unmounted:
+            problems.append(f"{image}: functions import local modules {unmounted}, not mounted into the image")
+    return problems
+
+
+def report(roles=None, baseline_path=BASELINE_PATH, update_baseline=False):
+    """Profile each role's imports, print a report and flag regressions against the baseline
+
+    Without a baseline file the first run records one, so later runs have something to compare to.
+    """
+    for problem in check_roles():
+        print(f"⚠️ {problem}")
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+    elif not update_baseline:
+        print(f"⚠️ No baseline at {baseline_path}; recording this run as the baseline (commit it)")
+        update_baseline = True
+
+    results, regressions = {}, []
+    for role in roles or ROLE_IMPORTS:
+        try:
+            summary = summarize(profile_imports(ROLE_IMPORTS[role]))
+        except RuntimeError as e:
+            print(f"❌ {role}: {e}")
+            continue
+        results[role] = summary
+        previous = baseline.get(role)
+        marker = ""
+        if previous and summary["total_ms"] > previous * (1 + REGRESSION_THRESHOLD):
+            regressions.append(role)
+            marker = f" ❌ regressed from {previous} ms"
+        print(f"⏱️ {role}: {summary['total_ms']} ms{marker}")
+        for name, ms in summary["slowest"]:
+            print(f"    {ms:>8} ms  {name}")
+
+    if update_baseline and results:
+        baseline.update({role: summary["total_ms"] for role, summary in results.items()})
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"✅ Baseline written to {baseline_path}")
+    return results, regressions
+
+
+if __name__ == "__main__":
+    _, regressed = report(update_baseline="--update-baseline" in sys.argv)
+    sys.exit(1 if regressed or check_roles() else 0)
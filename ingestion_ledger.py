@@ -0,0 +1,190 @@
+import json
+import hashlib
+
+# Per-height ingestion status, written in the same transaction as the block data
+LEDGER_DDL = """
+CREATE TABLE IF NOT EXISTS ingestion_ledger (
+    height INTEGER PRIMARY KEY,
+    block_hash VARCHAR(64),
+    status ENUM('pending', 'claimed', 'done') NOT NULL DEFAULT 'pending',
+    content_hash CHAR(64),
+    worker_id VARCHAR(128),
+    claimed_at TIMESTAMP NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_ingestion_ledger_status (status, height)
+)
+"""
+
+# A claim older than this is considered abandoned and can be taken over
+CLAIM_LEASE_SECONDS = 15 * 60
+
+# Block fields that change after ingestion and must not affect the content hash
+VOLATILE_BLOCK_FIELDS = ("confirmations", "nextblockhash")
+
+
+def ensure_ledger_table(cursor):
+    """Create the ledger table (DDL commits implicitly, so call before any DML)"""
+    cursor.execute(LEDGER_DDL)
+
+
+def content_hash(mapped_data):
+    """Stable hash of the mapped rows for one block"""
+    stable = dict(mapped_data)
+    if "bitcoin_block" in stable:
+        stable["bitcoin_block"] = [
+            {col: value for col, value in block.items() if col not in VOLATILE_BLOCK_FIELDS}
+            for block in stable["bitcoin_block"]
+        ]
+    encoded = json.dumps(stable, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def lock_entry(cursor, height):
+    """Lock and return the ledger row for a height as (block_hash, status, content_hash), or None"""
+    cursor.execute("""
+        SELECT block_hash, status, content_hash
+        FROM ingestion_ledger
+        WHERE height = %s
+        FOR UPDATE
+    """, (height,))
+    return cursor.fetchone()
+
+
+def mark_done(cursor, height, block_hash, digest, worker_id):
+    cursor.execute("""
+        INSERT INTO ingestion_ledger (height, block_hash, status, content_hash, worker_id)
+        VALUES (%s, %s, 'done', %s, %s)
+        ON DUPLICATE KEY UPDATE
+        block_hash = VALUES(block_hash),
+        status = 'done',
+        content_hash = VALUES(content_hash),
+        worker_id = VALUES(worker_id)
+    """, (height, block_hash, digest, worker_id))
+
+
+def purge_block(cursor, block_hash, height=None, keep_block_row=False):
+    """Delete everything previously written for a block, children first
+
+    Pass the block's height when known: the partitioned layout only indexes transaction,
+    vin and vout by (height, ...), so the height predicates give partition pruning and an
+    index range scan instead of a scan of every partition.
+    """
+    from script_store import SCRIPT_STORAGE, HEIGHT_TABLES
+
+    def at_height(alias):
+        return f" AND {alias}.height = %s" if height is not None else ""
+
+    def params(*aliases):
+        return (block_hash,) + (height,) * len(aliases) if height is not None else (block_hash,)
+
+    cursor.execute(f"""
+        DELETE sp FROM script_pubkey sp
+        JOIN vout o ON o.id = sp.vout_id
+        JOIN transaction t ON t.txid = o.txid
+        WHERE t.block_hash = %s{at_height("t")}{at_height("o")}
+    """, params("t", "o"))
+    cursor.execute(f"""
+        DELETE w FROM vin_witness w
+        JOIN vin i ON i.id = w.vin_id
+        JOIN transaction t ON t.txid = i.txid
+        WHERE t.block_hash = %s{at_height("t")}{at_height("i")}
+    """, params("t", "i"))
+    cursor.execute(f"""
+        DELETE i FROM vin i JOIN transaction t ON t.txid = i.txid
+        WHERE t.block_hash = %s{at_height("t")}{at_height("i")}
+    """, params("t", "i"))
+    cursor.execute(f"""
+        DELETE o FROM vout o JOIN transaction t ON t.txid = o.txid
+        WHERE t.block_hash = %s{at_height("t")}{at_height("o")}
+    """, params("t", "o"))
+    cursor.execute(f"DELETE t FROM transaction t WHERE t.block_hash = %s{at_height('t')}", params("t"))
+    if SCRIPT_STORAGE == "dedup":
+        # Dedup rows are keyed by txid, which competing blocks share, so they go by height;
+        # the caller re-ingests the height afterwards
+        for table in HEIGHT_TABLES:
+            if height is not None:
+                cursor.execute(f"DELETE FROM {table} WHERE height = %s", (height,))
+            else:
+                cursor.execute(f"""
+                    DELETE d FROM {table} d JOIN bitcoin_block b ON b.height = d.height WHERE b.hash = %s
+                """, (block_hash,))
+    if not keep_block_row:
+        cursor.execute("DELETE FROM bitcoin_block WHERE hash = %s", (block_hash,))
+
+
+def claim_heights(conn, worker_id, start_height, end_height, limit=100, lease_seconds=CLAIM_LEASE_SECONDS):
+    """Claim up to `limit` unfinished heights in [start, end] for this worker
+
+    Only heights already in the ledger are claimed (see seed_heights). Rows locked by
+    another worker's claim transaction are skipped, so parallel workers never receive
+    the same height.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT height FROM ingestion_ledger
+            WHERE height BETWEEN %s AND %s
+            AND (status = 'pending'
+                 OR (status = 'claimed' AND claimed_at < NOW() - INTERVAL %s SECOND))
+            ORDER BY height
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (start_height, end_height, lease_seconds, limit))
+        heights = [row[0] for row in cursor.fetchall()]
+        if heights:
+            cursor.executemany("""
+                UPDATE ingestion_ledger
+                SET status = 'claimed', worker_id = %s, claimed_at = NOW()
+                WHERE height = %s
+            """, [(worker_id, height) for height in heights])
+    conn.commit()
+    return heights
+
+
+def release_claim(conn, height, worker_id):
+    """Hand a claimed height back after a failed attempt"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            UPDATE ingestion_ledger
+            SET status = 'pending', worker_id = NULL, claimed_at = NULL
+            WHERE height = %s AND status = 'claimed' AND worker_id = %s
+        """, (height, worker_id))
+    conn.commit()
+
+
+def queue_heights(conn, heights):
+    """Add heights to the ledger as pending for backfill workers, leaving existing entries alone"""
+    with conn.cursor() as cursor:
+        ensure_ledger_table(cursor)
+        cursor.executemany(
+            "INSERT IGNORE INTO ingestion_ledger (height, status) VALUES (%s, 'pending')",
+            [(height,) for height in heights],
+        )
+    conn.commit()
+
+
+def seed_heights(conn, start_height, end_height):
+    """Queue the heights in [start, end] that have no ledger entry yet; returns how many were added
+
+    Run once per backfill, not per claim: the existing heights are read in one pass so
+    only the missing ones are inserted.
+    """
+    with conn.cursor() as cursor:
+        ensure_ledger_table(cursor)
+        cursor.execute("SELECT height FROM ingestion_ledger WHERE height BETWEEN %s AND %s",
+                       (start_height, end_height))
+        known = {row[0] for row in cursor.fetchall()}
+    missing = [height for height in range(start_height, end_height + 1) if height not in known]
+    if missing:
+        queue_heights(conn, missing)
+    return len(missing)
+
+
+def reset_heights(conn, heights):
+    """Mark heights pending again so backfill workers re-ingest them (integrity repair, failed writes)"""
+    with conn.cursor() as cursor:
+        ensure_ledger_table(cursor)
+        cursor.executemany("""
+            INSERT INTO ingestion_ledger (height, status) VALUES (%s, 'pending')
+            ON DUPLICATE KEY UPDATE status = 'pending', content_hash = NULL, worker_id = NULL, claimed_at = NULL
+        """, [(height,) for height in heights])
+    conn.commit()
@@ -0,0 +1,204 @@
+import time
+import hashlib
+from collections import defaultdict
+
+# Heights verified per task
+VERIFY_SHARD_SIZE = 1000
+
+# Issue kinds, roughly from most to least severe
+MISSING_BLOCK = "missing_block"          # no bitcoin_block row at this height
+DUPLICATE_HEIGHT = "duplicate_height"    # more than one block stored at this height (stale reorg rows)
+BROKEN_LINK = "broken_link"              # previousblockhash is not the hash stored at height - 1
+TX_COUNT_MISMATCH = "tx_count_mismatch"  # stored transactions != nTx
+MERKLE_MISMATCH = "merkle_mismatch"      # merkle root rebuilt from stored txids != merkleroot
+UNORDERED = "unordered"                  # transactions stored without tx_index, merkle root not checkable
+NO_TRANSACTIONS = "no_transactions"      # block row only (the live writer stores blocks only)
+
+# Re-ingesting through the live writer fixes these; it stores block rows only, so
+# transaction-level damage needs a bulk reload of the height instead
+REPAIRABLE = (MISSING_BLOCK, DUPLICATE_HEIGHT, BROKEN_LINK)
+NEEDS_BULK_RELOAD = (TX_COUNT_MISMATCH, MERKLE_MISMATCH)
+
+
+def migrate_add_tx_index(cursor):
+    """Add transaction.tx_index to a database created before it existed (existing rows stay unordered)"""
+    cursor.execute("""
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'transaction' AND COLUMN_NAME = 'tx_index'
+    """)
+    if cursor.fetchone()[0] == 0:
+        print("🔧 Adding tx_index column to transaction")
+        cursor.execute("ALTER TABLE transaction ADD COLUMN tx_index INTEGER AFTER height")
+
+
+def merkle_root(txids):
+    """Merkle root (display hex) of txids in block order
+
+    Each level is hashed from one contiguous buffer of 64-byte pairs, which keeps the
+    per-node overhead to a single C-level sha256d call.
+    """
+    if not txids:
+        return None
+    level = b"".join(bytes.fromhex(txid)[::-1] for txid in txids)
+    count = len(txids)
+    sha256 = hashlib.sha256
+    while count > 1:
+        if count % 2:
+            level += level[-32:]
+            count += 1
+        level = b"".join(sha256(sha256(level[i:i + 64]).digest()).digest() for i in range(0, count * 32, 64))
+        count //= 2
+    return level[::-1].hex()
+
+
+def _read_blocks(cursor, low, high):
+    cursor.execute("""
+        SELECT height, hash, merkleroot, nTx, previousblockhash
+        FROM bitcoin_block
+        WHERE height BETWEEN %s AND %s
+        ORDER BY height
+    """, (low, high))
+    blocks = defaultdict(list)
+    for height, block_hash, merkleroot, n_tx, previous in cursor.fetchall():
+        blocks[height].append((block_hash, merkleroot, n_tx, previous))
+    return blocks
+
+
+def _read_txids(cursor, low, high):
+    """{block_hash: [(tx_index, txid)]} for a height range, in one index range scan"""
+    cursor.execute("""
+        SELECT block_hash, tx_index, txid
+        FROM transaction
+        WHERE height BETWEEN %s AND %s
+    """, (low, high))
+    txids = defaultdict(list)
+    for block_hash, tx_index, txid in cursor.fetchall():
+        txids[block_hash].append((tx_index, txid))
+    return txids
+
+
+def _read_cold_txids(cold_dir, low, high):
+    from cold_storage import ColdStore
+
+    txids = defaultdict(list)
+    for record in ColdStore(cold_dir).iter_blocks(low, high):
+        for tx in record.get("transaction", []):
+            txids[record["hash"]].append((tx.get("tx_index"), tx["txid"]))
+    return txids
+
+
+def verify_range(db_config, start_height, end_height, cold_dir=None):
+    """Check one height range; returns [(height, issue, detail)]
+
+    `db_config` holds pymysql.connect keyword arguments (each worker opens its own connection).
+    Transactions of heights at or below the cold horizon are read from the cold tier in `cold_dir`.
+    """
+    import pymysql
+
+    conn = pymysql.connect(**db_config)
+    try:
+        with conn.cursor() as cursor:
+            # One extra height below the range to check the first block's link
+            blocks = _read_blocks(cursor, max(start_height - 1, 0), end_height)
+            txids = _read_txids(cursor, start_height, end_height)
+    finally:
+        conn.close()
+
+    if cold_dir:
+        from cold_storage import ColdStore
+        horizon = ColdStore(cold_dir).horizon()
+        if horizon >= start_height:
+            txids.update(_read_cold_txids(cold_dir, start_height, min(horizon, end_height)))
+
+    issues = []
+    for height in range(start_height, end_height + 1):
+        stored = blocks.get(height)
+        if not stored:
+            issues.append((height, MISSING_BLOCK, None))
+            continue
+        if len(stored) > 1:
+            issues.append((height, DUPLICATE_HEIGHT, [block[0] for block in stored]))
+            continue
+        block_hash, merkleroot, n_tx, previous = stored[0]
+
+        if height > 0 and blocks.get(height - 1):
+            previous_hashes = [block[0] for block in blocks[height - 1]]
+            if previous not in previous_hashes:
+                issues.append((height, BROKEN_LINK, {"previousblockhash": previous, "stored": previous_hashes}))
+
+        rows = txids.get(block_hash)
+        if not rows:
+            issues.append((height, NO_TRANSACTIONS, None))
+            continue
+        if len(rows) != n_tx:
+            issues.append((height, TX_COUNT_MISMATCH, {"nTx": n_tx, "stored": len(rows)}))
+            continue
+        if any(tx_index is None for tx_index, _ in rows):
+            issues.append((height, UNORDERED, None))
+            continue
+        rows.sort()
+        computed = merkle_root([txid for _, txid in rows])
+        if computed != merkleroot:
+            issues.append((height, MERKLE_MISMATCH, {"merkleroot": merkleroot, "computed": computed}))
+    return issues
+
+
+def verify_heights(db_config, start_height, end_height, executor, shard_size=VERIFY_SHARD_SIZE, cold_dir=None):
+    """Verify [start, end] in parallel shards; returns (issues, summary)"""
+    from executor import shard_heights
+
+    started = time.perf_counter()
+    shards = [(db_config, heights[0], heights[-1], cold_dir)
+              for heights in shard_heights(start_height, end_height, shard_size)]
+    issues = []
+    for shard_issues in executor.starmap(verify_range, shards, ordered=False):
+        issues.extend(shard_issues)
+    issues.sort(key=lambda issue: issue[0])
+
+    elapsed = time.perf_counter() - started
+    counts = defaultdict(int)
+    for _, kind, _ in issues:
+        counts[kind] += 1
+    blocks = end_height - start_height + 1
+    summary = {"blocks": blocks, "seconds": round(elapsed, 1),
+               "blocks_per_second": round(blocks / elapsed, 1) if elapsed else None, "issues": dict(counts)}
+    print(f"🔍 Verified #{start_height}-#{end_height} in {summary['seconds']}s: "
+          + (", ".join(f"{kind}={count}" for kind, count in counts.items()) or "no issues ✅"))
+    return issues, summary
+
+
+def repairable_heights(issues):
+    return sorted({height for height, kind, _ in issues if kind in REPAIRABLE})
+
+
+def bulk_reload_heights(issues):
+    return sorted({height for height, kind, _ in issues if kind in NEEDS_BULK_RELOAD})
+
+
+def contiguous_ranges(heights):
+    """[(start, end)] runs of consecutive heights"""
+    ranges = []
+    for height in heights:
+        if ranges and height == ranges[-1][1] + 1:
+            ranges[-1][1] = height
+        else:
+            ranges.append([height, height])
+    return [tuple(r) for r in ranges]
+
+
+def purge_duplicate_heights(cursor, issues):
+    """Delete stale blocks at heights with more than one stored block, keeping the one the ledger recorded"""
+    from ingestion_ledger import purge_block
+
+    purged = 0
+    for height, kind, hashes in issues:
+        if kind != DUPLICATE_HEIGHT:
+            continue
+        cursor.execute("SELECT block_hash FROM ingestion_ledger WHERE height = %s", (height,))
+        row = cursor.fetchone()
+        keep = row[0] if row else None
+        for block_hash in hashes:
+            if block_hash != keep:
+                purge_block(cursor, block_hash, height)
+                purged += 1
+    return purged
@@ -0,0 +1,320 @@
+import sys
+import json
+import time
+import bisect
+import argparse
+
+POLL_INTERVAL = 10
+# Lower bounds of the fee-rate histogram buckets (sat/vB)
+FEE_BUCKETS = [0, 1, 2, 3, 4, 5, 6, 8, 10, 12, 15, 20, 25, 30, 40, 50, 60, 80, 100, 125, 150, 200, 300, 500, 1000]
+WRITE_BATCH = 1000
+# Blocks walked back from a new tip when expiring confirmed transactions
+MAX_EXPIRE_BLOCKS = 100
+# Hashes of recently processed tips, where the walk back stops
+RECENT_BLOCKS = 1000
+
+MEMPOOL_DDL = [
+    """CREATE TABLE IF NOT EXISTS mempool_tx (
+        txid CHAR(64) PRIMARY KEY,
+        vsize INTEGER,
+        weight INTEGER,
+        fee BIGINT,              -- satoshis
+        fee_rate DOUBLE,         -- sat/vB
+        time INTEGER,            -- first seen by the node (unix timestamp)
+        height INTEGER,          -- tip height when it entered the mempool
+        ancestor_count INTEGER,
+        INDEX idx_mempool_tx_fee_rate (fee_rate)
+    )""",
+    """CREATE TABLE IF NOT EXISTS mempool_fee_histogram (
+        bucket_min DOUBLE PRIMARY KEY,   -- sat/vB, bucket covers [bucket_min, next bucket_min)
+        tx_count INTEGER,
+        total_vsize BIGINT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )""",
+]
+
+
+def fee_bucket(fee_rate):
+    return FEE_BUCKETS[max(bisect.bisect_right(FEE_BUCKETS, fee_rate) - 1, 0)]
+
+
+def mempool_row(txid, entry):
+    """Map a `getrawmempool true` entry to a mempool_tx row"""
+    fee_btc = entry["fees"]["base"] if "fees" in entry else entry["fee"]
+    fee = int(round(fee_btc * 100_000_000))
+    vsize = entry.get("vsize") or entry.get("size")
+    return (txid, vsize, entry.get("weight"), fee, fee / vsize if vsize else 0.0,
+            entry.get("time"), entry.get("height"), entry.get("ancestorcount"))
+
+
+def blocks_since(rpc_call, best, known, limit=MAX_EXPIRE_BLOCKS):
+    """Verbosity-1 blocks from `best` back to (not including) the first hash in `known`, oldest first
+
+    Stops after `limit` blocks, so after a long gap the snapshot diff removes the rest.
+    """
+    blocks = []
+    block_hash = best
+    while block_hash and block_hash not in known and len(blocks) < limit:
+        block = rpc_call("getblock", [block_hash, 1])
+        blocks.append(block)
+        block_hash = block.get("previousblockhash")
+    return blocks[::-1]
+
+
+class MempoolTracker:
+    """Keep mempool_tx and the fee histogram current by diffing `getrawmempool true` snapshots
+
+    Only added and removed transactions are written, and only histogram buckets that
+    changed are updated. `rpc_call(method, params)` must return the result.
+    Without a connection the state is kept in memory only.
+    """
+
+    def __init__(self, rpc_call, conn=None):
+        from collections import deque
+
+        self.rpc_call = rpc_call
+        self.conn = conn
+        self.entries = {}          # txid -> (fee_rate, vsize)
+        self.histogram = {bucket: [0, 0] for bucket in FEE_BUCKETS}
+        self.best_block_hash = None
+        self.recent_blocks = deque(maxlen=RECENT_BLOCKS)
+
+    def create_tables(self):
+        if self.conn is None:
+            return
+        with self.conn.cursor() as cursor:
+            for ddl in MEMPOOL_DDL:
+                cursor.execute(ddl)
+        self.conn.commit()
+
+    def load_state(self):
+        """Warm restart: rebuild in-memory state from the table instead of rewriting it"""
+        if self.conn is None:
+            return
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT txid, fee_rate, vsize FROM mempool_tx")
+            for txid, fee_rate, vsize in cursor.fetchall():
+                self._add(txid, fee_rate, vsize)
+
+    def _add(self, txid, fee_rate, vsize, changed=None):
+        self.entries[txid] = (fee_rate, vsize)
+        bucket = fee_bucket(fee_rate)
+        self.histogram[bucket][0] += 1
+        self.histogram[bucket][1] += vsize or 0
+        if changed is not None:
+            changed.add(bucket)
+
+    def _remove(self, txid, changed=None):
+        fee_rate, vsize = self.entries.pop(txid)
+        bucket = fee_bucket(fee_rate)
+        self.histogram[bucket][0] -= 1
+        self.histogram[bucket][1] -= vsize or 0
+        if changed is not None:
+            changed.add(bucket)
+
+    def _write(self, added_rows, removed, changed):
+        if self.conn is None:
+            return
+        with self.conn.cursor() as cursor:
+            for offset in range(0, len(removed), WRITE_BATCH):
+                batch = removed[offset:offset + WRITE_BATCH]
+                cursor.execute(f"DELETE FROM mempool_tx WHERE txid IN ({', '.join(['%s'] * len(batch))})", batch)
+            for offset in range(0, len(added_rows), WRITE_BATCH):
+                cursor.executemany("""
+                    INSERT IGNORE INTO mempool_tx
+                    (txid, vsize, weight, fee, fee_rate, time, height, ancestor_count)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, added_rows[offset:offset + WRITE_BATCH])
+            if changed:
+                cursor.executemany("""
+                    INSERT INTO mempool_fee_histogram (bucket_min, tx_count, total_vsize)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE tx_count = VALUES(tx_count), total_vsize = VALUES(total_vsize)
+                """, [(bucket, *self.histogram[bucket]) for bucket in sorted(changed)])
+        self.conn.commit()
+
+    def expire_blocks(self, best):
+        """Drop transactions confirmed in every block connected since the last processed tip"""
+        confirmed = []
+        for block in blocks_since(self.rpc_call, best, self.recent_blocks):
+            confirmed.extend(txid for txid in block["tx"] if txid in self.entries)
+            self.recent_blocks.append(block["hash"])
+        confirmed = list(dict.fromkeys(confirmed))
+        changed = set()
+        for txid in confirmed:
+            self._remove(txid, changed)
+        self._write([], confirmed, changed)
+        return len(confirmed)
+
+    def poll(self):
+        """Apply one snapshot diff; returns counts of added/removed/expired transactions"""
+        expired = 0
+        best = self.rpc_call("getbestblockhash", [])
+        if self.best_block_hash is None:
+            self.recent_blocks.append(best)
+        elif best != self.best_block_hash:
+            expired = self.expire_blocks(best)
+        self.best_block_hash = best
+
+        snapshot = self.rpc_call("getrawmempool", [True])
+        added = [txid for txid in snapshot if txid not in self.entries]
+        removed = [txid for txid in self.entries if txid not in snapshot]
+
+        changed = set()
+        for txid in removed:
+            self._remove(txid, changed)
+        added_rows = []
+        for txid in added:
+            row = mempool_row(txid, snapshot[txid])
+            added_rows.append(row)
+            self._add(txid, row[4], row[1], changed)
+        self._write(added_rows, removed, changed)
+        return {"added": len(added), "removed": len(removed), "expired": expired,
+                "size": len(self.entries), "buckets_written": len(changed)}
+
+    def fee_histogram(self):
+        """[(bucket_min, tx_count, total_vsize)] for non-empty buckets"""
+        return [(bucket, count, vsize) for bucket, (count, vsize) in sorted(self.histogram.items()) if count]
+
+    def run(self, interval=POLL_INTERVAL, iterations=None):
+        polls = 0
+        while iterations is None or polls < iterations:
+            started = time.time()
+            stats = self.poll()
+            print(f"🧮 Mempool: +{stats['added']} -{stats['removed']} (expired {stats['expired']}), "
+                  f"{stats['size']} txs, {stats['buckets_written']} buckets updated")
+            polls += 1
+            time.sleep(max(0.0, interval - (time.time() - started)))
+
+
+def record_mempool_snapshots(rpc_call, path, count=10, interval=POLL_INTERVAL):
+    """Record `getrawmempool true` snapshots as JSON lines for replay
+
+    When the tip moves, every block connected since the previous snapshot is recorded
+    too (hash, parent and txids) so replay can expire them.
+    """
+    best = None
+    with open(path, "w") as f:
+        for _ in range(count):
+            snapshot = {"best_block_hash": rpc_call("getbestblockhash", [])}
+            if best is not None and snapshot["best_block_hash"] != best:
+                snapshot["blocks"] = [
+                    {"hash": block["hash"], "previousblockhash": block.get("previousblockhash"), "tx": block["tx"]}
+                    for block in blocks_since(rpc_call, snapshot["best_block_hash"], {best})
+                ]
+            best = snapshot["best_block_hash"]
+            snapshot["mempool"] = rpc_call("getrawmempool", [True])
+            f.write(json.dumps(snapshot) + "\n")
+            time.sleep(interval)
+
+
+def synthetic_mempool_snapshots(path, count=20, size=5000, arrivals=300, blocks_every=5, block_size=2000,
+                                blocks_per_step=2, seed=0):
+    """Write snapshots for a synthetic mempool: steady arrivals, periodic blocks mining the best fee rates
+
+    Every `blocks_every` snapshots `blocks_per_step` blocks are connected at once, as
+    when a poll misses a block.
+    """
+    import random
+    import hashlib
+
+    rng = random.Random(seed)
+    mempool = {}
+    tx_counter = 0
+
+    def new_tx():
+        nonlocal tx_counter
+        tx_counter += 1
+        vsize = rng.randint(110, 1500)
+        fee_rate = round(rng.lognormvariate(1.5, 1.0), 2)
+        return hashlib.sha256(f"mempool:{tx_counter}".encode()).hexdigest(), {
+            "vsize": vsize, "weight": vsize * 4, "time": 1700000000 + tx_counter, "height": 800000,
+            "ancestorcount": 1, "fees": {"base": round(fee_rate * vsize / 100_000_000, 8)},
+        }
+
+    for _ in range(size):
+        txid, entry = new_tx()
+        mempool[txid] = entry
+    tip = 0
+    with open(path, "w") as f:
+        for i in range(count):
+            snapshot = {}
+            if i and i % blocks_every == 0:
+                snapshot["blocks"] = []
+                for _ in range(blocks_per_step):
+                    by_fee_rate = sorted(mempool, key=lambda t: mempool[t]["fees"]["base"] / mempool[t]["vsize"],
+                                         reverse=True)
+                    tip += 1
+                    snapshot["blocks"].append({"hash": f"{tip:064x}", "previousblockhash": f"{tip - 1:064x}",
+                                               "tx": by_fee_rate[:block_size]})
+                    for txid in by_fee_rate[:block_size]:
+                        del mempool[txid]
+            snapshot["best_block_hash"] = f"{tip:064x}"
+            for _ in range(arrivals):
+                txid, entry = new_tx()
+                mempool[txid] = entry
+            snapshot["mempool"] = dict(mempool)
+            f.write(json.dumps(snapshot) + "\n")
+
+
+def replay_mempool_snapshots(path, conn=None):
+    """Replay recorded snapshots through the local RPC stub into a tracker; returns per-poll stats
+
+    After every poll the incremental histogram is checked against a full recompute, and
+    no transaction of a connected block may be left in it. Without `conn` nothing is written.
+    """
+    from rpc_stub import StubChain
+
+    chain = StubChain()
+    tracker = MempoolTracker(chain.handle, conn)
+    tracker.create_tables()
+    results = []
+    previous = {}
+    with open(path) as f:
+        for line in f:
+            snapshot = json.loads(line)
+            chain.best_block_hash = snapshot["best_block_hash"]
+            for block in snapshot.get("blocks", []):
+                chain.blocks[block["hash"]] = block
+            chain.mempool = snapshot["mempool"]
+            stats = tracker.poll()
+            stats["expected_expired"] = len({txid for block in snapshot.get("blocks", []) for txid in block["tx"]
+                                             if txid in previous})
+            previous = snapshot["mempool"]
+
+            expected = {}
+            for entry in snapshot["mempool"].values():
+                _, vsize, _, _, fee_rate, _, _, _ = mempool_row(None, entry)
+                count, total = expected.get(fee_bucket(fee_rate), (0, 0))
+                expected[fee_bucket(fee_rate)] = (count + 1, total + vsize)
+            stats["histogram_ok"] = tracker.fee_histogram() == sorted((b, c, v) for b, (c, v) in expected.items())
+            results.append(stats)
+            print(f"🧮 +{stats['added']} -{stats['removed']} (expired {stats['expired']}/{stats['expected_expired']}), "
+                  f"{stats['size']} txs, histogram {'✅' if stats['histogram_ok'] else '❌'}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record, synthesize or replay mempool snapshots")
+    parser.add_argument("mode", choices=["record", "synthetic", "replay"])
+    parser.add_argument("path", help="snapshot file (JSON lines)")
+    parser.add_argument("--rpc-url", help="node to record from")
+    parser.add_argument("--rpc-user")
+    parser.add_argument("--rpc-password")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL)
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        from rpc_router import RpcEndpoint
+
+        if not args.rpc_url:
+            parser.error("record needs --rpc-url")
+        auth = (args.rpc_user, args.rpc_password) if args.rpc_user else None
+        record_mempool_snapshots(RpcEndpoint("node", args.rpc_url, auth).call, args.path, args.count, args.interval)
+    elif args.mode == "synthetic":
+        synthetic_mempool_snapshots(args.path, args.count)
+    else:
+        results = replay_mempool_snapshots(args.path)
+        sys.exit(0 if all(stats["histogram_ok"] and stats["expired"] == stats["expected_expired"]
+                          for stats in results) else 1)
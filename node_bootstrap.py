@@ -0,0 +1,84 @@
+import os
+import glob
+import time
+
+# Node data directory (the bitcoin volume mount)
+DATA_DIR = "/root/.bitcoin"
+CONF_PATH = f"{DATA_DIR}/bitcoin.conf"
+# assumeutxo snapshots (utxo-*.dat from `dumptxoutset`) and bootstrap block files
+SNAPSHOT_DIR = f"{DATA_DIR}/snapshots"
+BOOTSTRAP_DIR = f"{DATA_DIR}/bootstrap"
+
+# Fast-start tuning: big UTXO cache, shallow startup verification
+FAST_START_DBCACHE = 4096
+FAST_START_CHECKBLOCKS = 1
+FAST_START_CHECKLEVEL = 0
+
+READY_TIMEOUT = 60 * 30
+READY_POLL_INTERVAL = 2
+
+
+def bootstrap_files(bootstrap_dir=BOOTSTRAP_DIR):
+    """Block files to import with -loadblock, oldest first"""
+    return sorted(glob.glob(os.path.join(bootstrap_dir, "*.dat")))
+
+
+def build_bitcoind_args(fast_start=True):
+    """Command line for bitcoind, optionally tuned for a quick cold start"""
+    args = ["bitcoind", "-server=1", "-printtoconsole", f"-conf={CONF_PATH}"]
+    if fast_start:
+        args += [
+            f"-dbcache={FAST_START_DBCACHE}",
+            f"-checkblocks={FAST_START_CHECKBLOCKS}",
+            f"-checklevel={FAST_START_CHECKLEVEL}",
+        ]
+        for path in bootstrap_files():
+            # already-known blocks are skipped on re-import; remove files once the node is synced
+            args.append(f"-loadblock={path}")
+    return args
+
+
+def find_utxo_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """Newest assumeutxo snapshot on the volume that has not been loaded yet"""
+    snapshots = [
+        path for path in glob.glob(os.path.join(snapshot_dir, "*.dat"))
+        if not os.path.exists(f"{path}.loaded")
+    ]
+    return max(snapshots, key=os.path.getmtime) if snapshots else None
+
+
+def load_utxo_snapshot(rpc_call, path):
+    """Activate an assumeutxo snapshot with `loadtxoutset` and mark it as loaded
+
+    Requires a bitcoind release with assumeutxo params for the chain (Core 28+ on mainnet).
+    """
+    print(f"📦 Loading UTXO snapshot {path}...")
+    started = time.time()
+    result = rpc_call("loadtxoutset", [path])
+    with open(f"{path}.loaded", "w") as f:
+        f.write(str(result.get("base_height", "")))
+    print(f"✅ Snapshot loaded at height {result.get('base_height')} in {time.time() - started:.1f}s")
+    return result
+
+
+def wait_for_rpc_ready(rpc_call, timeout=READY_TIMEOUT, interval=READY_POLL_INTERVAL, abort=None):
+    """Poll getblockchaininfo until bitcoind answers; return seconds waited
+
+    `rpc_call(method, params)` must return the result or raise on errors.
+    `abort()` is checked before every poll; a non-empty reason it returns ends the wait early.
+    """
+    started = time.time()
+    last_error = None
+    while time.time() - started < timeout:
+        reason = abort() if abort else None
+        if reason:
+            raise RuntimeError(f"Stopped waiting for bitcoind RPC: {reason}")
+        try:
+            info = rpc_call("getblockchaininfo", [])
+            elapsed = time.time() - started
+            print(f"✅ RPC ready after {elapsed:.1f}s (blocks={info['blocks']}, headers={info['headers']})")
+            return elapsed
+        except Exception as e:
+            last_error = e
+        time.sleep(interval)
+    raise TimeoutError(f"bitcoind RPC not ready after {timeout}s: {last_error}")
@@ -0,0 +1,173 @@
+import time
+import threading
+import subprocess
+
+from node_bootstrap import wait_for_rpc_ready
+
+# Supervision tuning
+CHECK_INTERVAL = 30            # seconds between liveness checks
+LIVENESS_TIMEOUT = 20          # RPC timeout for a liveness probe
+MAX_LIVENESS_FAILURES = 4      # consecutive failed probes before the node counts as stalled
+PROGRESS_INTERVAL = 300        # seconds between sync-progress reports
+RESTART_BACKOFF_INITIAL = 5
+RESTART_BACKOFF_MAX = 600
+STABLE_UPTIME = 600            # uptime after which the restart backoff resets
+STOP_TIMEOUT = 300             # seconds to wait for a clean shutdown before killing
+
+
+class BitcoindSupervisor:
+    """Run bitcoind as a child process, restart it on crash or stall, stop it cleanly
+
+    `rpc_call(method, params, timeout)` talks to the local node and raises on errors.
+    `on_ready(seconds)` runs whenever RPC comes up, `on_stop()` whenever bitcoind went down.
+    """
+
+    def __init__(self, args, rpc_call, on_ready=None, on_stop=None):
+        self.args = args
+        self.rpc_call = rpc_call
+        self.on_ready = on_ready
+        self.on_stop = on_stop
+        self.proc = None
+        self.started_at = None
+        self.restarts = 0
+        self.backoff = RESTART_BACKOFF_INITIAL
+        self.liveness_failures = 0
+        self._stopping = threading.Event()
+        self._last_progress = None
+
+    def _stream_logs(self, proc):
+        for line in proc.stdout:
+            print(f"[bitcoind] {line}", end="")
+
+    def start(self):
+        """Launch bitcoind and block until RPC answers"""
+        print(f"🚀 Starting bitcoind: {' '.join(self.args)}")
+        self.started_at = time.time()
+        self.liveness_failures = 0
+        self._last_progress = None
+        self.proc = subprocess.Popen(
+            self.args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self._stream_logs, args=(self.proc,), daemon=True).start()
+
+        ready_seconds = wait_for_rpc_ready(lambda method, params: self.rpc_call(method, params, LIVENESS_TIMEOUT),
+                                           abort=self._startup_aborted)
+        if self.on_ready:
+            self.on_ready(time.time() - self.started_at)
+        return ready_seconds
+
+    def _startup_aborted(self):
+        """Why waiting for RPC is pointless (bitcoind exited or stop() was called), or None"""
+        if self._stopping.is_set():
+            return "stop requested"
+        if self.proc is not None and self.proc.poll() is not None:
+            return f"bitcoind exited with code {self.proc.returncode}"
+        return None
+
+    def _launch(self):
+        """start(), reporting instead of raising when RPC never comes up; returns whether it did"""
+        try:
+            self.start()
+            return True
+        except (TimeoutError, RuntimeError) as e:
+            print(f"❌ bitcoind did not become ready: {e}")
+            return False
+
+    def is_alive(self):
+        """Process is running and answers RPC within the liveness timeout"""
+        if self.proc is None or self.proc.poll() is not None:
+            return False
+        try:
+            self.rpc_call("getblockcount", [], LIVENESS_TIMEOUT)
+            self.liveness_failures = 0
+        except Exception as e:
+            self.liveness_failures += 1
+            print(f"⚠️ Liveness probe failed ({self.liveness_failures}/{MAX_LIVENESS_FAILURES}): {e}")
+        return self.liveness_failures < MAX_LIVENESS_FAILURES
+
+    def report_progress(self):
+        """Print verificationprogress, blocks/headers and the IBD rate since the last report"""
+        try:
+            info = self.rpc_call("getblockchaininfo", [], LIVENESS_TIMEOUT)
+        except Exception as e:
+            print(f"⚠️ Could not read sync progress: {e}")
+            return None
+
+        now = time.time()
+        rate = None
+        if self._last_progress:
+            last_time, last_blocks = self._last_progress
+            if now > last_time:
+                rate = (info["blocks"] - last_blocks) / (now - last_time) * 60
+        self._last_progress = (now, info["blocks"])
+
+        progress = {
+            "blocks": info["blocks"],
+            "headers": info["headers"],
+            "verificationprogress": info["verificationprogress"],
+            "initialblockdownload": info.get("initialblockdownload"),
+            "blocks_per_minute": round(rate, 2) if rate is not None else None,
+        }
+        print(
+            f"📈 Sync {progress['verificationprogress'] * 100:.2f}% "
+            f"blocks={progress['blocks']}/{progress['headers']} "
+            f"rate={progress['blocks_per_minute']} blocks/min"
+        )
+        return progress
+
+    def _terminate(self):
+        """Ask bitcoind to stop over RPC, falling back to signals"""
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        try:
+            self.rpc_call("stop", [], LIVENESS_TIMEOUT)
+        except Exception as e:
+            print(f"⚠️ RPC stop failed, sending SIGTERM: {e}")
+            self.proc.terminate()
+        try:
+            self.proc.wait(timeout=STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            print("❌ bitcoind did not stop in time, killing it")
+            self.proc.kill()
+            self.proc.wait()
+        print(f"🛑 bitcoind exited with code {self.proc.returncode}")
+
+    def restart(self):
+        """Stop bitcoind if it is still running and start it again after the backoff; returns whether RPC came up"""
+        if self.started_at and time.time() - self.started_at > STABLE_UPTIME:
+            self.backoff = RESTART_BACKOFF_INITIAL
+        self._terminate()
+        if self.on_stop:
+            self.on_stop()
+        print(f"🔁 Restarting bitcoind in {self.backoff}s (restart #{self.restarts + 1})")
+        if self._stopping.wait(self.backoff):
+            return False
+        self.backoff = min(self.backoff * 2, RESTART_BACKOFF_MAX)
+        self.restarts += 1
+        return self._launch()
+
+    def run(self):
+        """Supervise until stop() is called; a first start that fails is retried like any crash"""
+        last_report = 0
+        healthy = self._launch()
+        while not self._stopping.wait(CHECK_INTERVAL if healthy else 0):
+            if not healthy or not self.is_alive():
+                if healthy:
+                    code = self.proc.poll() if self.proc else None
+                    print(f"❌ bitcoind is {'down (exit code %s)' % code if code is not None else 'stalled'}")
+                healthy = self.restart()
+                continue
+            if time.time() - last_report >= PROGRESS_INTERVAL:
+                self.report_progress()
+                last_report = time.time()
+        self._terminate()
+        if self.on_stop:
+            self.on_stop()
+
+    def stop(self):
+        """Request a clean shutdown; run() stops bitcoind and calls on_stop"""
+        self._stopping.set()
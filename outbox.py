@@ -0,0 +1,242 @@
+import os
+import time
+import threading
+from collections import deque
+
+# Ordered change log of committed blocks, appended by the writer in the same transaction
+# as the block data, so consumers tail one small table instead of polling the block tables
+OUTBOX_DDL = ["""
+CREATE TABLE IF NOT EXISTS block_outbox (
+    event_offset BIGINT PRIMARY KEY,
+    event ENUM('connect', 'disconnect') NOT NULL,
+    height INTEGER NOT NULL,
+    block_hash VARCHAR(64) NOT NULL,
+    previousblockhash VARCHAR(64),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_block_outbox_created_at (created_at)
+)
+""", """
+CREATE TABLE IF NOT EXISTS block_outbox_head (
+    id TINYINT PRIMARY KEY,
+    last_offset BIGINT NOT NULL
+)
+"""]
+
+CONNECT = "connect"
+DISCONNECT = "disconnect"
+
+EVENT_COLUMNS = ["event_offset", "event", "height", "block_hash", "previousblockhash", "created_at"]
+
+# Events per read
+BATCH_EVENTS = 1000
+# Seconds between head checks while a subscriber waits
+POLL_INTERVAL = 1.0
+# Events a hub keeps in memory for the readers it serves
+HUB_BUFFER_EVENTS = 10_000
+
+
+def ensure_outbox_tables(cursor):
+    """Create the outbox tables (DDL commits implicitly, so call before any DML)"""
+    for ddl in OUTBOX_DDL:
+        cursor.execute(ddl)
+
+
+def append_event(cursor, event, height, block_hash, previousblockhash=None):
+    """Append one event in the caller's transaction and return its offset
+
+    Offsets come from the single head row, whose lock is held until commit: events
+    commit in offset order with no gaps, so a reader never skips one that commits late.
+    Call it as the last write before the commit to keep that lock short.
+    """
+    cursor.execute("""
+        INSERT INTO block_outbox_head (id, last_offset) VALUES (1, 1)
+        ON DUPLICATE KEY UPDATE last_offset = last_offset + 1
+    """)
+    cursor.execute("SELECT last_offset FROM block_outbox_head WHERE id = 1")
+    offset = cursor.fetchone()[0]
+    cursor.execute("""
+        INSERT INTO block_outbox (event_offset, event, height, block_hash, previousblockhash)
+        VALUES (%s, %s, %s, %s, %s)
+    """, (offset, event, height, block_hash, previousblockhash))
+    return offset
+
+
+def read_head(cursor):
+    """Offset of the last committed event (a single primary-key read)"""
+    cursor.execute("SELECT last_offset FROM block_outbox_head WHERE id = 1")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def read_events(cursor, after, limit=BATCH_EVENTS):
+    """Events with offset > `after`, oldest first, as dicts"""
+    cursor.execute(f"""
+        SELECT {', '.join(EVENT_COLUMNS)}
+        FROM block_outbox
+        WHERE event_offset > %s
+        ORDER BY event_offset
+        LIMIT %s
+    """, (after, limit))
+    return [dict(zip(EVENT_COLUMNS, row)) for row in cursor.fetchall()]
+
+
+def prune_outbox(cursor, retain_days):
+    """Drop events older than `retain_days`; the head row keeps offsets increasing"""
+    cursor.execute("DELETE FROM block_outbox WHERE created_at < NOW() - INTERVAL %s DAY", (retain_days,))
+    return cursor.rowcount
+
+
+class _Subscriber:
+    """Shared tailing loop; subclasses implement poll(timeout)"""
+
+    def __init__(self, after=0, offset_path=None):
+        self.offset_path = offset_path
+        if offset_path and os.path.exists(offset_path):
+            with open(offset_path) as f:
+                after = int(f.read().strip() or after)
+        self.offset = after
+
+    def _advance(self, events):
+        if not events:
+            return events
+        self.offset = events[-1]["event_offset"]
+        if self.offset_path:
+            tmp = self.offset_path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(str(self.offset))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.offset_path)
+        return events
+
+    def tail(self, timeout=30):
+        """Yield events forever, like tail -f; the offset is checkpointed after each batch"""
+        while True:
+            yield from self.poll(timeout)
+
+
+class OutboxSubscriber(_Subscriber):
+    """Tail the outbox straight from MySQL
+
+    While idle it only reads the head row every `poll_interval` seconds, so each
+    subscriber costs one primary-key lookup per interval.
+    """
+
+    def __init__(self, conn, after=0, offset_path=None, poll_interval=POLL_INTERVAL, batch_size=BATCH_EVENTS):
+        super().__init__(after, offset_path)
+        self.conn = conn
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+
+    def poll(self, timeout=30):
+        """Long-poll: return the next events, or [] if none arrive within `timeout` seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.conn.cursor() as cursor:
+                head = read_head(cursor)
+                events = read_events(cursor, self.offset, self.batch_size) if head > self.offset else []
+            # End the read snapshot so the next check sees new commits
+            self.conn.commit()
+            if events or time.monotonic() >= deadline:
+                return self._advance(events)
+            time.sleep(min(self.poll_interval, max(deadline - time.monotonic(), 0)))
+
+
+class HttpSubscriber(_Subscriber):
+    """Tail the outbox through the outbox_api long-poll endpoint (no database access needed)
+
+    `token` is the API bearer token (the fy-api-token secret's API_TOKEN).
+    """
+
+    def __init__(self, url, token=None, after=0, offset_path=None, batch_size=BATCH_EVENTS):
+        super().__init__(after, offset_path)
+        self.url = url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.batch_size = batch_size
+
+    def poll(self, timeout=30):
+        import requests
+
+        response = requests.get(f"{self.url}/events", headers=self.headers, timeout=timeout + 10,
+                                params={"after": self.offset, "timeout": timeout, "limit": self.batch_size})
+        response.raise_for_status()
+        return self._advance(response.json()["events"])
+
+
+class OutboxHub:
+    """One database poller fanning out to many in-process readers
+
+    A background thread follows the head row and keeps the latest events in memory;
+    readers wait on the hub instead of querying MySQL, so N readers cost the same as one.
+    Readers further behind than the buffer are served from the table.
+    """
+
+    def __init__(self, connect, poll_interval=POLL_INTERVAL, buffer_size=HUB_BUFFER_EVENTS):
+        self.connect = connect
+        self.poll_interval = poll_interval
+        self.events = deque(maxlen=buffer_size)
+        self.head = None
+        self.changed = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        conn = self.connect()
+        try:
+            with conn.cursor() as cursor:
+                head = read_head(cursor)
+            conn.commit()
+            with self.changed:
+                self.head = head
+                self.changed.notify_all()
+            while True:
+                time.sleep(self.poll_interval)
+                try:
+                    conn.ping(reconnect=True)
+                    with conn.cursor() as cursor:
+                        head = read_head(cursor)
+                        new_events, position = [], self.head
+                        while head > position:
+                            batch = read_events(cursor, position, BATCH_EVENTS)
+                            if not batch:
+                                break
+                            new_events.extend(batch)
+                            position = batch[-1]["event_offset"]
+                    conn.commit()
+                except Exception as e:
+                    print(f"❌ Outbox hub poll failed: {e}")
+                    continue
+                if new_events:
+                    with self.changed:
+                        self.events.extend(new_events)
+                        self.head = new_events[-1]["event_offset"]
+                        self.changed.notify_all()
+        finally:
+            conn.close()
+
+    def events_after(self, after, limit=BATCH_EVENTS):
+        """Events with offset > `after` without blocking"""
+        with self.changed:
+            if self.head is None or after >= self.head:
+                return []
+            buffered = list(self.events)
+        if buffered and after >= buffered[0]["event_offset"] - 1:
+            return [event for event in buffered if event["event_offset"] > after][:limit]
+        # Older than the buffer (or the hub just started): read from the table
+        conn = self.connect()
+        try:
+            with conn.cursor() as cursor:
+                return read_events(cursor, after, limit)
+        finally:
+            conn.close()
+
+    def wait(self, after, timeout=30, limit=BATCH_EVENTS):
+        """Block until events past `after` exist or `timeout` passes"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.head is not None and self.head > after, timeout)
+        return self.events_after(after, limit)
@@ -0,0 +1,216 @@
+import os
+import gzip
+import json
+import time
+import random
+import hashlib
+
+# Height-partitioned tables (see block_info_schema_partitioned.sql)
+PARTITIONED_TABLES = ["bitcoin_block", "transaction", "vin", "vout"]
+# Heights per partition
+PARTITION_SIZE = 100_000
+# Keep this many heights of empty partitions ahead of the tip
+PARTITIONS_AHEAD = 2 * PARTITION_SIZE
+# Unpartitioned tables hanging off a partitioned one: child table -> (parent, foreign key column)
+CHILD_TABLES = {"vin_witness": ("vin", "vin_id"), "script_pubkey": ("vout", "vout_id")}
+
+
+def migrate_add_height_columns(cursor):
+    """Add the height column to transaction/vin/vout on a database created before it existed"""
+    for table in ("transaction", "vin", "vout"):
+        cursor.execute("""
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'height'
+        """, (table,))
+        if cursor.fetchone()[0] == 0:
+            print(f"🔧 Adding height column to {table}")
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN height INTEGER")
+    cursor.execute("""
+        UPDATE transaction t JOIN bitcoin_block b ON b.hash = t.block_hash
+        SET t.height = b.height WHERE t.height IS NULL
+    """)
+    for table in ("vin", "vout"):
+        cursor.execute(f"""
+            UPDATE {table} c JOIN transaction t ON t.txid = c.txid
+            SET c.height = t.height WHERE c.height IS NULL
+        """)
+
+
+def list_partitions(cursor, table):
+    """Return [(partition name, upper bound or None for MAXVALUE, rows)] in order"""
+    cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+        FROM INFORMATION_SCHEMA.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (table,))
+    partitions = []
+    for name, description, rows in cursor.fetchall():
+        bound = None if description == "MAXVALUE" else int(description)
+        partitions.append((name, bound, rows))
+    return partitions
+
+
+def ensure_partitions_ahead(conn, tip_height, ahead=PARTITIONS_AHEAD, size=PARTITION_SIZE):
+    """Split pmax so that empty partitions cover at least `ahead` heights past the tip"""
+    added = []
+    with conn.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            partitions = list_partitions(cursor, table)
+            if not partitions:
+                continue
+            bounds = [bound for _, bound, _ in partitions if bound is not None]
+            highest = max(bounds) if bounds else 0
+            new_bounds = []
+            while highest < tip_height + ahead:
+                highest += size
+                new_bounds.append(highest)
+            if not new_bounds:
+                continue
+            definitions = ", ".join(f"PARTITION p{bound} VALUES LESS THAN ({bound})" for bound in new_bounds)
+            print(f"➕ {table}: adding partitions up to height {new_bounds[-1]}")
+            cursor.execute(f"""
+                ALTER TABLE {table} REORGANIZE PARTITION pmax INTO (
+                    {definitions},
+                    PARTITION pmax VALUES LESS THAN MAXVALUE
+                )
+            """)
+            added.extend((table, bound) for bound in new_bounds)
+    conn.commit()
+    return added
+
+
+def _archive_rows(cursor, path, sql, params=()):
+    cursor.execute(sql, params)
+    columns = [column[0] for column in cursor.description]
+    rows = 0
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for row in cursor:
+            f.write(json.dumps(dict(zip(columns, row)), default=str) + "\n")
+            rows += 1
+    return rows
+
+
+def archive_partition(cursor, table, partition, archive_dir):
+    """Dump one partition as gzip JSONL before it is dropped"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{table}.{partition}.jsonl.gz")
+    return path, _archive_rows(cursor, path, f"SELECT * FROM {table} PARTITION ({partition})")
+
+
+def delete_children_below(cursor, height, archive_dir=None):
+    """Delete (and optionally archive) rows of the unpartitioned child tables whose parent row is below `height`
+
+    Must run before the parents' partitions are dropped, while the join still finds them.
+    """
+    from script_store import SCRIPT_STORAGE, HEIGHT_TABLES
+
+    for child, (parent, column) in CHILD_TABLES.items():
+        if archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+            path = os.path.join(archive_dir, f"{child}.below{height}.jsonl.gz")
+            rows = _archive_rows(cursor, path, f"""
+                SELECT c.* FROM {child} c JOIN {parent} p ON p.id = c.{column} WHERE p.height < %s
+            """, (height,))
+            print(f"📦 Archived {rows} rows of {child} to {path}")
+        cursor.execute(f"DELETE c FROM {child} c JOIN {parent} p ON p.id = c.{column} WHERE p.height < %s", (height,))
+        print(f"🗑️ Deleted {cursor.rowcount} rows of {child} (heights < {height})")
+    if SCRIPT_STORAGE == "dedup":
+        for table in HEIGHT_TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE height < %s", (height,))
+            print(f"🗑️ Deleted {cursor.rowcount} rows of {table} (heights < {height})")
+
+
+def drop_partitions_below(conn, height, archive_dir=None):
+    """Drop partitions whose heights are all below `height`, archiving them first if asked
+
+    Children are dropped before parents; the same heights go from every table, including
+    the unpartitioned vin_witness/script_pubkey rows of the dropped inputs and outputs.
+    """
+    dropped = []
+    with conn.cursor() as cursor:
+        bounds = [bound for _, bound, _ in list_partitions(cursor, "vin") if bound is not None and bound <= height]
+        if bounds:
+            delete_children_below(cursor, max(bounds), archive_dir)
+            conn.commit()
+        for table in reversed(PARTITIONED_TABLES):
+            for name, bound, _ in list_partitions(cursor, table):
+                if bound is None or bound > height:
+                    continue
+                if archive_dir:
+                    path, rows = archive_partition(cursor, table, name, archive_dir)
+                    print(f"📦 Archived {rows} rows of {table}.{name} to {path}")
+                cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+                print(f"🗑️ Dropped {table}.{name} (heights < {bound})")
+                dropped.append((table, name))
+    conn.commit()
+    return dropped
+
+
+def _fake_hash(*parts):
+    return hashlib.sha256(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def generate_synthetic_chain(conn, blocks, txs_per_block=50, start_height=0, batch_blocks=500):
+    """Fill an empty database with a synthetic chain (blocks, transactions, vin/vout)"""
+    rng = random.Random(42)
+    with conn.cursor() as cursor:
+        previous = None
+        for batch_start in range(start_height, start_height + blocks, batch_blocks):
+            block_rows, tx_rows, vin_rows, vout_rows = [], [], [], []
+            for height in range(batch_start, min(batch_start + batch_blocks, start_height + blocks)):
+                block_hash = _fake_hash("block", height)
+                block_rows.append((block_hash, height, 1231006505 + height * 600, txs_per_block, previous))
+                previous = block_hash
+                for i in range(txs_per_block):
+                    txid = _fake_hash("tx", height, i)
+                    tx_rows.append((txid, block_hash, height, rng.randint(150, 600)))
+                    vin_rows.append((txid, height, i))
+                    vout_rows.append((txid, height, rng.random() * 10, 0))
+            cursor.executemany(
+                "INSERT INTO bitcoin_block (hash, height, time, nTx, previousblockhash) VALUES (%s, %s, %s, %s, %s)",
+                block_rows)
+            cursor.executemany(
+                "INSERT INTO transaction (txid, block_hash, height, size) VALUES (%s, %s, %s, %s)", tx_rows)
+            cursor.executemany("INSERT INTO vin (txid, height, sequence) VALUES (%s, %s, %s)", vin_rows)
+            cursor.executemany("INSERT INTO vout (txid, height, value, n) VALUES (%s, %s, %s, %s)", vout_rows)
+            conn.commit()
+
+
+RECENT_BLOCKS_SQL = """
+    SELECT b.height, COUNT(t.txid) AS txs, SUM(o.value) AS output_value
+    FROM bitcoin_block b
+    JOIN transaction t ON t.block_hash = b.hash AND t.height = b.height
+    JOIN vout o ON o.txid = t.txid AND o.height = t.height
+    WHERE b.height >= %s AND t.height >= %s AND o.height >= %s
+    GROUP BY b.height
+    ORDER BY b.height DESC
+"""
+
+
+def benchmark_recent_blocks(conn, n=100, repeats=20):
+    """Time the "last N blocks" query; run against a partitioned and a monolithic database"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT MAX(height) FROM bitcoin_block")
+        tip = cursor.fetchone()[0]
+        since = tip - n + 1
+        cursor.execute("EXPLAIN " + RECENT_BLOCKS_SQL, (since, since, since))
+        columns = [column[0] for column in cursor.description]
+        plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            cursor.execute(RECENT_BLOCKS_SQL, (since, since, since))
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    report = {
+        "tip": tip,
+        "n": n,
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+        "partitions": {row["table"]: row.get("partitions") for row in plan},
+    }
+    print(f"⏱️ Last {n} blocks: p50={report['p50_ms']} ms, p95={report['p95_ms']} ms, partitions={report['partitions']}")
+    return report
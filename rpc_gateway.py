@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import modal
+
+from bitcoin_node import app, bitcoind_image, bitcoin_data_vol, rpc_user, rpc_password, read_tunnel_url, send_rpc_request
+
+# ✅ Volume for the on-disk immutable response store
+rpc_cache_vol = modal.Volume.from_name("fy-rpc-cache", create_if_missing=True)
+CACHE_DIR = "/cache/rpc"
+
+# Responses are only immutable once buried under this many blocks
+CONFIRMATION_DEPTH = 6
+# Size bound of the in-memory LRU (bytes of encoded JSON)
+MEMORY_CACHE_BYTES = 256 * 1024 * 1024
+# How often dirty disk-store writes are committed to the volume
+COMMIT_INTERVAL = 60
+
+# Methods whose result never changes once deep-confirmed
+IMMUTABLE_METHODS = {"getblock", "getblockheader", "getblockhash", "getrawtransaction"}
+
+# Fields of an immutable result that move with the tip; stripped before caching, recomputed on serve
+TIP_RELATIVE_FIELDS = ("confirmations", "nextblockhash")
+
+# Tip-dependent methods get a short TTL (seconds)
+TIP_TTL = {
+    "getblockcount": 5,
+    "getbestblockhash": 5,
+    "getblockchaininfo": 5,
+    "getchaintips": 5,
+    "getmempoolinfo": 2,
+    "getrawmempool": 2,
+    "estimatesmartfee": 30,
+}
+
+
+def cache_key(method, params):
+    """Stable key for a method call"""
+    encoded = json.dumps([method, params], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded LRU in memory, backed by a permanent on-disk store for immutable results"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MEMORY_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lru = OrderedDict()
+        self._lru_bytes = 0
+        self._ttl = {}
+        self._lock = threading.Lock()
+        self.dirty = False
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "ttl_hits": 0, "misses": 0, "coalesced": 0, "upstream_errors": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key, encoded):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return
+            self._lru[key] = encoded
+            self._lru_bytes += len(encoded)
+            while self._lru_bytes > self.max_bytes and self._lru:
+                _, evicted = self._lru.popitem(last=False)
+                self._lru_bytes -= len(evicted)
+
+    def get(self, key):
+        """Return the cached encoded result, or None"""
+        now = time.time()
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._lru[key]
+            entry = self._ttl.get(key)
+            if entry and entry[1] > now:
+                self.stats["ttl_hits"] += 1
+                return entry[0]
+
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                encoded = f.read()
+            self._remember(key, encoded)
+            with self._lock:
+                self.stats["disk_hits"] += 1
+            return encoded
+        return None
+
+    def put_immutable(self, key, encoded):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(encoded)
+        os.replace(tmp_path, path)
+        self._remember(key, encoded)
+        self.dirty = True
+
+    def put_ttl(self, key, encoded, ttl):
+        with self._lock:
+            self._ttl[key] = (encoded, time.time() + ttl)
+            if len(self._ttl) > 10000:
+                now = time.time()
+                self._ttl = {k: v for k, v in self._ttl.items() if v[1] > now}
+
+    def record(self, stat):
+        """Count one event in the hit-rate stats"""
+        with self._lock:
+            self.stats[stat] += 1
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._lru)
+            stats["memory_bytes"] = self._lru_bytes
+        hits = stats["memory_hits"] + stats["disk_hits"] + stats["ttl_hits"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / total, 4) if total else 0.0
+        return stats
+
+
+class RpcGateway:
+    """Coalescing, caching proxy in front of bitcoind"""
+
+    def __init__(self, cache, upstream):
+        # upstream(method, params) returns the decoded JSON-RPC response body
+        self.cache = cache
+        self.upstream = upstream
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self, method, params):
+        body = self.upstream(method, params)
+        if body.get("error"):
+            self.cache.record("upstream_errors")
+        return body
+
+    def _confirmations(self, method, params, result):
+        """Confirmations of the object behind an immutable call, or None if unknown"""
+        if isinstance(result, dict) and "confirmations" in result:
+            return result["confirmations"]
+        if method == "getblockhash":
+            tip = self.call("getblockcount", [])["result"]
+            return tip - params[0] + 1
+        if method in ("getblock", "getblockheader") and params:
+            # verbosity 0 / hex results carry no confirmation count
+            header = self.call("getblockheader", [params[0], True])["result"]
+            return header["confirmations"] if header else None
+        return None
+
+    def _store(self, key, method, params, body):
+        if body.get("error") or body.get("result") is None:
+            return
+        if method in IMMUTABLE_METHODS:
+            confirmations = self._confirmations(method, params, body["result"])
+            if confirmations is not None and confirmations >= CONFIRMATION_DEPTH:
+                result = body["result"]
+                if isinstance(result, dict):
+                    result = {field: value for field, value in result.items() if field not in TIP_RELATIVE_FIELDS}
+                self.cache.put_immutable(key, json.dumps(result))
+        elif method in TIP_TTL:
+            self.cache.put_ttl(key, json.dumps(body["result"]), TIP_TTL[method])
+
+    def _refresh(self, method, result):
+        """Recompute the tip-relative fields of a cached immutable result against the current tip"""
+        if method not in IMMUTABLE_METHODS or not isinstance(result, dict):
+            return result
+        if "height" in result:
+            height = result["height"]
+        elif result.get("blockhash"):
+            # verbose getrawtransaction; the block header is cached too
+            header = self.call("getblockheader", [result["blockhash"], True])["result"]
+            height = header["height"] if header else None
+        else:
+            return result
+        tip = self.call("getblockcount", [])["result"]
+        if height is None or tip is None:
+            return result
+        result["confirmations"] = tip - height + 1
+        if method in ("getblock", "getblockheader") and height < tip:
+            result["nextblockhash"] = self.call("getblockhash", [height + 1])["result"]
+        return result
+
+    def call(self, method, params):
+        """Return a JSON-RPC response body for a single call"""
+        key = cache_key(method, params)
+        encoded = self.cache.get(key)
+        if encoded is not None:
+            return {"result": self._refresh(method, json.loads(encoded)), "error": None}
+
+        with self._lock:
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                waiter = {"event": threading.Event(), "body": None}
+                self._inflight[key] = waiter
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            self.cache.record("coalesced")
+            waiter["event"].wait()
+            return waiter["body"]
+
+        self.cache.record("misses")
+        try:
+            body = self._fetch(method, params)
+            waiter["body"] = body
+            self._store(key, method, params, body)
+            return body
+        except Exception as e:
+            waiter["body"] = {"result": None, "error": {"code": -1, "message": f"Gateway upstream error: {e}"}}
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            waiter["event"].set()
+
+
+def upstream_call(method, params):
+    response = send_rpc_request(read_tunnel_url(), method, params)
+    return response.json()
+
+
+@app.function(
+    image=bitcoind_image,
+    volumes={"/root/.bitcoin": bitcoin_data_vol, "/cache": rpc_cache_vol},
+    keep_warm=1,
+    allow_concurrent_inputs=100,
+    timeout=60 * 60 * 24,
+)
+@modal.asgi_app()
+def rpc_gateway():
+    """Long-lived JSON-RPC gateway in front of bitcoind"""
+    import secrets
+    from fastapi import Depends, FastAPI, HTTPException, Request
+    from fastapi.security import HTTPBasic, HTTPBasicCredentials
+
+    cache = ResponseCache()
+    gateway = RpcGateway(cache, upstream_call)
+    security = HTTPBasic()
+    web_app = FastAPI()
+
+    def commit_loop():
+        while True:
+            time.sleep(COMMIT_INTERVAL)
+            if cache.dirty:
+                cache.dirty = False
+                rpc_cache_vol.commit()
+
+    threading.Thread(target=commit_loop, daemon=True).start()
+
+    def check_auth(credentials: HTTPBasicCredentials = Depends(security)):
+        if not (secrets.compare_digest(credentials.username, rpc_user)
+                and secrets.compare_digest(credentials.password, rpc_password)):
+            raise HTTPException(status_code=401, detail="Invalid RPC credentials")
+
+    def handle(request_body):
+        method = request_body.get("method")
+        params = request_body.get("params") or []
+        try:
+            body = gateway.call(method, params)
+        except Exception as e:
+            body = {"result": None, "error": {"code": -1, "message": str(e)}}
+        return {"result": body.get("result"), "error": body.get("error"), "id": request_body.get("id")}
+
+    @web_app.post("/", dependencies=[Depends(check_auth)])
+    async def rpc(request: Request):
+        import asyncio
+        from starlette.concurrency import run_in_threadpool
+        payload = await request.json()
+        if isinstance(payload, list):
+            return await asyncio.gather(*[run_in_threadpool(handle, item) for item in payload])
+        return await run_in_threadpool(handle, payload)
+
+    @web_app.get("/metrics")
+    def metrics():
+        return cache.metrics()
+
+    return web_app
@@ -0,0 +1,323 @@
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+# Router configuration
+HEALTH_CHECK_INTERVAL = 30      # seconds between background health checks
+MAX_HEIGHT_LAG = 2              # blocks an endpoint may trail the best tip and still count as up to date
+LATENCY_ALPHA = 0.3             # EWMA smoothing factor for latency tracking
+HEDGE_DELAY = 0.5               # seconds to wait before sending a hedged request to a second endpoint
+REQUEST_TIMEOUT = 30
+STREAM_CHUNK_BYTES = 64 * 1024  # read size for streamed responses
+
+# Read-only methods that are safe to send to two endpoints at once; anything else
+# (sendrawtransaction, wallet calls, ...) goes to one endpoint at a time
+HEDGE_SAFE_METHODS = {
+    "getbestblockhash", "getblock", "getblockchaininfo", "getblockcount", "getblockhash", "getblockheader",
+    "getblockstats", "getchaintips", "getdifficulty", "getmempoolinfo", "getnetworkinfo", "getrawmempool",
+    "getrawtransaction", "gettxout", "estimatesmartfee",
+}
+# JSON-RPC error codes that say the endpoint itself can't serve the call yet, so another one may
+RPC_IN_WARMUP = -28
+
+# Call purposes
+PURPOSE_DEFAULT = "default"
+PURPOSE_BULK = "bulk"           # backfill traffic, prefer our own node
+
+
+class RpcError(Exception):
+    """Raised when every endpoint failed to answer an RPC call"""
+
+
+class RpcMethodError(RpcError):
+    """The endpoint answered with a JSON-RPC error; the call itself failed, so it is not retried elsewhere"""
+
+    def __init__(self, message, error):
+        super().__init__(message)
+        self.error = error
+
+
+def is_endpoint_error(error):
+    """JSON-RPC errors that are about the endpoint (warming up, pruned) rather than the call"""
+    return error.get("code") == RPC_IN_WARMUP or "pruned" in str(error.get("message", "")).lower()
+
+
+def raise_rpc_error(message, error):
+    if is_endpoint_error(error):
+        raise RpcError(message)
+    raise RpcMethodError(message, error)
+
+
+class RpcEndpoint:
+    """A single JSON-RPC backend (self-hosted node or provider)"""
+
+    def __init__(self, name, url, auth=None, self_hosted=False, on_failure=None):
+        # url may be a string or a zero-argument callable returning the current url
+        self.name = name
+        self.url = url
+        self.auth = auth
+        self.self_hosted = self_hosted
+        self.on_failure = on_failure
+
+        self.healthy = False
+        self.latency = None
+        self.blocks = None
+        self.headers = None
+        self.initial_block_download = True
+        self.last_checked = 0
+        self.failures = 0
+
+    def resolve_url(self):
+        return self.url() if callable(self.url) else self.url
+
+    def post(self, payload, timeout=REQUEST_TIMEOUT):
+        """Send a raw JSON-RPC payload and return the decoded response body"""
+        started = time.perf_counter()
+        try:
+            response = requests.post(
+                self.resolve_url(),
+                auth=self.auth,
+                data=json.dumps(payload),
+                headers={"content-type": "text/plain"},
+                timeout=timeout,
+            )
+            # bitcoind answers JSON-RPC errors with HTTP 404/500 and a JSON body; those are
+            # replies, not endpoint failures
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            if not isinstance(body, (dict, list)):
+                response.raise_for_status()
+                raise ValueError(f"Non JSON-RPC response (HTTP {response.status_code})")
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_latency(time.perf_counter() - started)
+        return body
+
+    def call(self, method, params=None, timeout=REQUEST_TIMEOUT):
+        body = self.post({"jsonrpc": "1.0", "id": method, "method": method, "params": params or []}, timeout)
+        if body.get("error"):
+            raise_rpc_error(f"{self.name}: {body['error']}", body["error"])
+        return body["result"]
+
+    def batch(self, calls, timeout=REQUEST_TIMEOUT):
+        """Send [(method, params)] as one JSON-RPC batch and return the results in order"""
+        payload = [{"jsonrpc": "1.0", "id": i, "method": method, "params": params or []}
+                   for i, (method, params) in enumerate(calls)]
+        body = self.post(payload, timeout)
+        if isinstance(body, dict):
+            # The whole batch was rejected with a single error object
+            raise_rpc_error(f"{self.name}: batch: {body.get('error')}", body.get("error") or {})
+        replies = sorted(body, key=lambda reply: reply["id"])
+        for reply in replies:
+            if reply.get("error"):
+                raise_rpc_error(f"{self.name}: {calls[reply['id']][0]}: {reply['error']}", reply["error"])
+        return [reply["result"] for reply in replies]
+
+    def stream(self, method, params=None, timeout=REQUEST_TIMEOUT, chunk_bytes=STREAM_CHUNK_BYTES):
+        """Send a call and return its raw response body as an iterator of byte chunks
+
+        Used for responses too large to decode in one piece (see block_stream.py); latency
+        is recorded up to the response headers.
+        """
+        started = time.perf_counter()
+        try:
+            response = requests.post(
+                self.resolve_url(),
+                auth=self.auth,
+                data=json.dumps({"jsonrpc": "1.0", "id": method, "method": method, "params": params or []}),
+                headers={"content-type": "text/plain"},
+                timeout=timeout,
+                stream=True,
+            )
+            response.raise_for_status()
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_latency(time.perf_counter() - started)
+        return response.iter_content(chunk_bytes)
+
+    def record_latency(self, seconds):
+        self.failures = 0
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency = LATENCY_ALPHA * seconds + (1 - LATENCY_ALPHA) * self.latency
+
+    def record_failure(self):
+        self.failures += 1
+        self.healthy = False
+        if self.on_failure:
+            self.on_failure()
+
+    def check_health(self):
+        """Refresh sync height and latency from getblockchaininfo"""
+        try:
+            info = self.call("getblockchaininfo", timeout=10)
+            self.blocks = info["blocks"]
+            self.headers = info["headers"]
+            self.initial_block_download = info.get("initialblockdownload", False)
+            self.healthy = True
+        except Exception as e:
+            print(f"❌ Health check failed for {self.name}: {e}")
+            self.healthy = False
+        self.last_checked = time.time()
+        return self.healthy
+
+    def status(self):
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "blocks": self.blocks,
+            "headers": self.headers,
+            "initial_block_download": self.initial_block_download,
+            "self_hosted": self.self_hosted,
+        }
+
+
+class RpcRouter:
+    """Route JSON-RPC calls to the fastest up-to-date endpoint with failover"""
+
+    def __init__(self, endpoints, hedge_delay=HEDGE_DELAY, max_height_lag=MAX_HEIGHT_LAG,
+                 health_check_interval=HEALTH_CHECK_INTERVAL):
+        self.endpoints = list(endpoints)
+        self.hedge_delay = hedge_delay
+        self.max_height_lag = max_height_lag
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(4, 2 * len(self.endpoints)))
+        self._checker = None
+
+    def check_health(self):
+        """Health-check every endpoint in parallel"""
+        list(self._pool.map(lambda endpoint: endpoint.check_health(), self.endpoints))
+        return [endpoint.status() for endpoint in self.endpoints]
+
+    def start_health_checks(self):
+        """Keep endpoint health fresh from a daemon thread"""
+        if self._checker is not None:
+            return
+
+        def loop():
+            while True:
+                self.check_health()
+                time.sleep(self.health_check_interval)
+
+        self._checker = threading.Thread(target=loop, daemon=True)
+        self._checker.start()
+
+    def _maybe_check_health(self):
+        now = time.time()
+        with self._lock:
+            stale = [e for e in self.endpoints if now - e.last_checked > self.health_check_interval]
+        if stale:
+            list(self._pool.map(lambda endpoint: endpoint.check_health(), stale))
+
+    def best_height(self):
+        heights = [e.blocks for e in self.endpoints if e.healthy and e.blocks is not None]
+        return max(heights) if heights else None
+
+    def is_up_to_date(self, endpoint, best_height):
+        if not endpoint.healthy or endpoint.initial_block_download:
+            return False
+        return best_height is None or endpoint.blocks is None or endpoint.blocks >= best_height - self.max_height_lag
+
+    def candidates(self, purpose=PURPOSE_DEFAULT, min_height=None):
+        """Order endpoints by preference for a call"""
+        self._maybe_check_health()
+        best = self.best_height()
+
+        def latency(endpoint):
+            return endpoint.latency if endpoint.latency is not None else float("inf")
+
+        if purpose == PURPOSE_BULK:
+            # Backfill targets historic heights, so our own node is fine as long as it has them
+            def usable(endpoint):
+                if not endpoint.healthy:
+                    return False
+                return min_height is None or (endpoint.blocks is not None and endpoint.blocks >= min_height)
+            ranked = sorted(self.endpoints, key=lambda e: (not usable(e), not e.self_hosted, latency(e)))
+        else:
+            ranked = sorted(self.endpoints, key=lambda e: (not self.is_up_to_date(e, best), latency(e)))
+
+        # Unhealthy endpoints stay at the end as a last resort
+        return ranked
+
+    def call(self, method, params=None, purpose=PURPOSE_DEFAULT, min_height=None, hedge=True):
+        """Send an RPC call, hedging read-only methods to the next endpoint if the first is slow"""
+        hedge = hedge and method in HEDGE_SAFE_METHODS
+        return self._hedged(lambda endpoint: endpoint.call(method, params), method, purpose, min_height, hedge)
+
+    def batch(self, calls, purpose=PURPOSE_DEFAULT, min_height=None, hedge=True):
+        """Send [(method, params)] as one JSON-RPC batch to a single endpoint, hedged like call()"""
+        if not calls:
+            return []
+        label = f"batch of {len(calls)} {calls[0][0]}"
+        hedge = hedge and all(method in HEDGE_SAFE_METHODS for method, _ in calls)
+        return self._hedged(lambda endpoint: endpoint.batch(calls), label, purpose, min_height, hedge)
+
+    def stream(self, method, params=None, purpose=PURPOSE_DEFAULT, min_height=None):
+        """Open a streamed response on the first endpoint that accepts it
+
+        A stream can't be raced without buffering it, so there is failover but no hedging.
+        """
+        errors = []
+        for endpoint in self.candidates(purpose, min_height):
+            try:
+                return endpoint.stream(method, params)
+            except Exception as e:
+                errors.append(f"{endpoint.name}: {e}")
+        raise RpcError(f"All RPC endpoints failed for {method}: {'; '.join(errors)}")
+
+    def _hedged(self, request, label, purpose, min_height, hedge):
+        ranked = self.candidates(purpose, min_height)
+        if not ranked:
+            raise RpcError("No RPC endpoints configured")
+
+        errors = []
+        pending = {}
+        remaining = list(ranked)
+
+        def submit_next():
+            endpoint = remaining.pop(0)
+            pending[self._pool.submit(request, endpoint)] = endpoint
+
+        submit_next()
+        while pending:
+            timeout = self.hedge_delay if hedge and remaining else None
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Primary is slow: race it against the next endpoint
+                submit_next()
+                continue
+
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    result = future.result()
+                except RpcMethodError:
+                    # The endpoint answered; another one would give the same error
+                    for other in pending:
+                        other.cancel()
+                    raise
+                except Exception as e:
+                    errors.append(f"{endpoint.name}: {e}")
+                    continue
+                for other in pending:
+                    other.cancel()
+                return result
+
+            if not pending and remaining:
+                submit_next()
+
+        raise RpcError(f"All RPC endpoints failed for {label}: {'; '.join(errors)}")
+
+    def status(self):
+        return [endpoint.status() for endpoint in self.endpoints]
@@ -0,0 +1,160 @@
+import json
+import time
+import hashlib
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for bitcoind's JSON-RPC, serving a deterministic synthetic chain
+STUB_TIP = 10_000
+STUB_TXS_PER_BLOCK = 20
+
+
+def _hash(*parts):
+    return hashlib.sha256(":".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def block_hash(height):
+    return _hash("block", height)
+
+
+def synthetic_tx(height, index, inputs=2, outputs=2):
+    txid = _hash("tx", height, index)
+    if index == 0:
+        vin = [{"coinbase": f"03{height:06x}", "sequence": 4294967295}]
+    else:
+        vin = [
+            {
+                "txid": _hash("tx", max(height - 1 - i, 0), (index + i) % STUB_TXS_PER_BLOCK),
+                "vout": i % outputs,
+                "scriptSig": {"asm": "", "hex": ""},
+                "txinwitness": [_hash("sig", height, index, i) * 2, "02" + _hash("pub", index % 50)],
+                "sequence": 4294967293,
+            }
+            for i in range(inputs)
+        ]
+    vout = []
+    for n in range(outputs):
+        pubkey_hash = _hash("addr", (height * 7 + index + n) % 5000)[:40]
+        vout.append({
+            "value": round(((height * 31 + index * 7 + n) % 1000) / 100.0, 8),
+            "n": n,
+            "scriptPubKey": {
+                "asm": f"0 {pubkey_hash}",
+                "desc": f"addr(bc1stub{pubkey_hash[:20]})",
+                "hex": f"0014{pubkey_hash}",
+                "address": f"bc1stub{pubkey_hash[:20]}",
+                "type": "witness_v0_keyhash",
+            },
+        })
+    return {
+        "txid": txid, "hash": txid, "version": 2, "size": 222, "vsize": 141, "weight": 561, "locktime": 0,
+        "vin": vin, "vout": vout, "fee": 0 if index == 0 else 0.00001 * (1 + index % 20),
+    }
+
+
+@lru_cache(maxsize=4096)
+def synthetic_block(height, txs=STUB_TXS_PER_BLOCK, tip=STUB_TIP):
+    tx = [synthetic_tx(height, index) for index in range(txs)]
+    return {
+        "hash": block_hash(height),
+        "confirmations": tip - height + 1,
+        "height": height,
+        "version": 536870912,
+        "versionHex": "20000000",
+        "merkleroot": _hash("merkle", height),
+        "time": 1231006505 + height * 600,
+        "mediantime": 1231006505 + height * 600 - 3000,
+        "nonce": height * 7919 % 4294967296,
+        "bits": "1d00ffff",
+        "difficulty": 1.0,
+        "chainwork": f"{height + 1:064x}",
+        "nTx": txs,
+        "previousblockhash": block_hash(height - 1) if height else None,
+        "strippedsize": 200 * txs,
+        "size": 222 * txs,
+        "weight": 561 * txs,
+        "tx": tx,
+    }
+
+
+class StubChain:
+    """State behind the stub server; tests can move the tip"""
+
+    def __init__(self, tip=STUB_TIP, txs_per_block=STUB_TXS_PER_BLOCK, latency=0.0):
+        self.tip = tip
+        self.txs_per_block = txs_per_block
+        self.latency = latency
+        self.calls = 0
+        self.mempool = {}
+        self.blocks = {}              # replayed blocks by hash, served ahead of synthetic ones
+        self.best_block_hash = None   # overrides the synthetic tip hash when replaying
+        self._heights = {}
+
+    def height_of(self, hash_):
+        if not self._heights:
+            self._heights = {block_hash(h): h for h in range(self.tip + 1)}
+        return self._heights[hash_]
+
+    def handle(self, method, params):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if method == "getblockcount":
+            return self.tip
+        if method == "getbestblockhash":
+            return self.best_block_hash or block_hash(self.tip)
+        if method == "getblockhash":
+            return block_hash(params[0])
+        if method == "getblockchaininfo":
+            return {"chain": "main", "blocks": self.tip, "headers": self.tip, "bestblockhash": block_hash(self.tip),
+                    "verificationprogress": 1.0, "initialblockdownload": False}
+        if method == "getblock" and params[0] in self.blocks:
+            return self.blocks[params[0]]
+        if method in ("getblock", "getblockheader"):
+            block = synthetic_block(self.height_of(params[0]), self.txs_per_block, self.tip)
+            verbosity = params[1] if len(params) > 1 else 1
+            if method == "getblockheader":
+                return {k: v for k, v in block.items() if k != "tx"}
+            if verbosity == 1:
+                return {**block, "tx": [tx["txid"] for tx in block["tx"]]}
+            return block
+        if method == "getrawmempool":
+            verbose = params[0] if params else False
+            return dict(self.mempool) if verbose else list(self.mempool)
+        raise ValueError(f"Method not found: {method}")
+
+
+def _make_handler(chain):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+            def answer(request):
+                try:
+                    result = chain.handle(request["method"], request.get("params") or [])
+                    return {"result": result, "error": None, "id": request.get("id")}
+                except Exception as e:
+                    return {"result": None, "error": {"code": -32601, "message": str(e)}, "id": request.get("id")}
+
+            response = [answer(r) for r in body] if isinstance(body, list) else answer(body)
+            encoded = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub_server(chain=None, port=0):
+    """Serve `chain` on localhost in a daemon thread; returns (server, url, chain)"""
+    chain = chain or StubChain()
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(chain))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", chain
@@ -0,0 +1,445 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+
+# "text": script_pubkey/vin_witness TEXT rows, "dedup": content-addressed binary scripts
+SCRIPT_STORAGE = os.getenv("SCRIPT_STORAGE", "text")
+# Script/witness ids kept in memory per writer process
+ID_CACHE_SIZE = 500_000
+
+# Content-addressed scripts and witness items; outputs/inputs reference them by id.
+# asm and desc are not stored: they are derived from the script bytes on read.
+DEDUP_DDL = [
+    """CREATE TABLE IF NOT EXISTS script (
+        id BIGINT PRIMARY KEY AUTO_INCREMENT,
+        script_hash BINARY(32) NOT NULL,
+        script BLOB NOT NULL,
+        type VARCHAR(50),
+        address VARCHAR(100),
+        UNIQUE KEY uq_script_hash (script_hash)
+    )""",
+    """CREATE TABLE IF NOT EXISTS txout_script (
+        txid BINARY(32) NOT NULL,
+        n INTEGER NOT NULL,
+        script_id BIGINT NOT NULL,
+        height INTEGER,
+        PRIMARY KEY (txid, n),
+        KEY idx_txout_script_height (height)
+    )""",
+    """CREATE TABLE IF NOT EXISTS witness_item (
+        id BIGINT PRIMARY KEY AUTO_INCREMENT,
+        item_hash BINARY(32) NOT NULL,
+        data BLOB NOT NULL,
+        UNIQUE KEY uq_witness_item_hash (item_hash)
+    )""",
+    """CREATE TABLE IF NOT EXISTS txin_witness (
+        txid BINARY(32) NOT NULL,
+        vin_n INTEGER NOT NULL,
+        position SMALLINT NOT NULL,
+        witness_id BIGINT NOT NULL,
+        height INTEGER,
+        PRIMARY KEY (txid, vin_n, position),
+        KEY idx_txin_witness_height (height)
+    )""",
+]
+# Per-output/input tables, keyed to the height that wrote them so a retry or reorg can undo it
+HEIGHT_TABLES = ["txout_script", "txin_witness"]
+
+OPCODE_NAMES = {
+    0x61: "OP_NOP", 0x62: "OP_VER", 0x63: "OP_IF", 0x64: "OP_NOTIF", 0x65: "OP_VERIF", 0x66: "OP_VERNOTIF",
+    0x67: "OP_ELSE", 0x68: "OP_ENDIF", 0x69: "OP_VERIFY", 0x6a: "OP_RETURN",
+    0x6b: "OP_TOALTSTACK", 0x6c: "OP_FROMALTSTACK", 0x6d: "OP_2DROP", 0x6e: "OP_2DUP", 0x6f: "OP_3DUP",
+    0x70: "OP_2OVER", 0x71: "OP_2ROT", 0x72: "OP_2SWAP", 0x73: "OP_IFDUP", 0x74: "OP_DEPTH", 0x75: "OP_DROP",
+    0x76: "OP_DUP", 0x77: "OP_NIP", 0x78: "OP_OVER", 0x79: "OP_PICK", 0x7a: "OP_ROLL", 0x7b: "OP_ROT",
+    0x7c: "OP_SWAP", 0x7d: "OP_TUCK",
+    0x7e: "OP_CAT", 0x7f: "OP_SUBSTR", 0x80: "OP_LEFT", 0x81: "OP_RIGHT", 0x82: "OP_SIZE",
+    0x83: "OP_INVERT", 0x84: "OP_AND", 0x85: "OP_OR", 0x86: "OP_XOR", 0x87: "OP_EQUAL", 0x88: "OP_EQUALVERIFY",
+    0x89: "OP_RESERVED1", 0x8a: "OP_RESERVED2",
+    0x8b: "OP_1ADD", 0x8c: "OP_1SUB", 0x8d: "OP_2MUL", 0x8e: "OP_2DIV", 0x8f: "OP_NEGATE", 0x90: "OP_ABS",
+    0x91: "OP_NOT", 0x92: "OP_0NOTEQUAL", 0x93: "OP_ADD", 0x94: "OP_SUB", 0x95: "OP_MUL", 0x96: "OP_DIV",
+    0x97: "OP_MOD", 0x98: "OP_LSHIFT", 0x99: "OP_RSHIFT", 0x9a: "OP_BOOLAND", 0x9b: "OP_BOOLOR",
+    0x9c: "OP_NUMEQUAL", 0x9d: "OP_NUMEQUALVERIFY", 0x9e: "OP_NUMNOTEQUAL", 0x9f: "OP_LESSTHAN",
+    0xa0: "OP_GREATERTHAN", 0xa1: "OP_LESSTHANOREQUAL", 0xa2: "OP_GREATERTHANOREQUAL", 0xa3: "OP_MIN",
+    0xa4: "OP_MAX", 0xa5: "OP_WITHIN",
+    0xa6: "OP_RIPEMD160", 0xa7: "OP_SHA1", 0xa8: "OP_SHA256", 0xa9: "OP_HASH160", 0xaa: "OP_HASH256",
+    0xab: "OP_CODESEPARATOR", 0xac: "OP_CHECKSIG", 0xad: "OP_CHECKSIGVERIFY", 0xae: "OP_CHECKMULTISIG",
+    0xaf: "OP_CHECKMULTISIGVERIFY",
+    0xb0: "OP_NOP1", 0xb1: "OP_CHECKLOCKTIMEVERIFY", 0xb2: "OP_CHECKSEQUENCEVERIFY", 0xb3: "OP_NOP4",
+    0xb4: "OP_NOP5", 0xb5: "OP_NOP6", 0xb6: "OP_NOP7", 0xb7: "OP_NOP8", 0xb8: "OP_NOP9", 0xb9: "OP_NOP10",
+    0xba: "OP_CHECKSIGADD", 0x50: "OP_RESERVED",
+}
+
+
+def parse_script(script):
+    """Yield (opcode, pushed data or None); raises ValueError on a truncated push"""
+    i = 0
+    while i < len(script):
+        opcode = script[i]
+        i += 1
+        if opcode <= 0x4e:
+            if opcode < 0x4c:
+                size = opcode
+            else:
+                width = {0x4c: 1, 0x4d: 2, 0x4e: 4}[opcode]
+                if i + width > len(script):
+                    raise ValueError("truncated push size")
+                size = int.from_bytes(script[i:i + width], "little")
+                i += width
+            if i + size > len(script):
+                raise ValueError("truncated push")
+            yield opcode, script[i:i + size]
+            i += size
+        else:
+            yield opcode, None
+
+
+def _script_num(data):
+    if not data:
+        return 0
+    value = int.from_bytes(data, "little")
+    if data[-1] & 0x80:
+        return -(value & ~(0x80 << (8 * (len(data) - 1))))
+    return value
+
+
+def script_asm(script):
+    """Disassemble like bitcoind's scriptPubKey.asm"""
+    parts = []
+    try:
+        for opcode, data in parse_script(script):
+            if data is not None:
+                parts.append(str(_script_num(data)) if len(data) <= 4 else data.hex())
+            elif opcode == 0x4f:
+                parts.append("-1")
+            elif 0x51 <= opcode <= 0x60:
+                parts.append(str(opcode - 0x50))
+            else:
+                parts.append(OPCODE_NAMES.get(opcode, "OP_UNKNOWN"))
+    except ValueError:
+        parts.append("[error]")
+    return " ".join(parts)
+
+
+DESC_INPUT_CHARSET = "0123456789()[],'/*abcdefgh@:$%{}IJKLMNOPQRSTUVWXYZ&+-.;<=>?!^_|~ijklmnopqrstuvwxyzABCDEFGH`#\"\\ "
+DESC_CHECKSUM_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+DESC_GENERATOR = [0xf5dee51989, 0xa9fdca3312, 0x1bab10e32d, 0x3706b1677a, 0x644d626ffd]
+
+
+def _descsum_polymod(symbols):
+    chk = 1
+    for value in symbols:
+        top = chk >> 35
+        chk = (chk & 0x7ffffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= DESC_GENERATOR[i] if (top >> i) & 1 else 0
+    return chk
+
+
+def descriptor_checksum(descriptor):
+    """BIP-380 descriptor checksum"""
+    symbols, groups = [], []
+    for char in descriptor:
+        value = DESC_INPUT_CHARSET.find(char)
+        symbols.append(value & 31)
+        groups.append(value >> 5)
+        if len(groups) == 3:
+            symbols.append(groups[0] * 9 + groups[1] * 3 + groups[2])
+            groups = []
+    if len(groups) == 1:
+        symbols.append(groups[0])
+    elif len(groups) == 2:
+        symbols.append(groups[0] * 3 + groups[1])
+    checksum = _descsum_polymod(symbols + [0] * 8) ^ 1
+    return "".join(DESC_CHECKSUM_CHARSET[(checksum >> (5 * (7 - i))) & 31] for i in range(8))
+
+
+def script_desc(script, script_type, address):
+    """Infer the descriptor bitcoind reports as scriptPubKey.desc"""
+    if script_type == "pubkey":
+        descriptor = f"pk({list(parse_script(script))[0][1].hex()})"
+    elif script_type == "multisig":
+        ops = list(parse_script(script))
+        required = ops[0][0] - 0x50
+        descriptor = f"multi({required},{','.join(data.hex() for _, data in ops[1:-2])})"
+    elif address:
+        descriptor = f"addr({address})"
+    else:
+        descriptor = f"raw({script.hex()})"
+    return f"{descriptor}#{descriptor_checksum(descriptor)}"
+
+
+class IdCache:
+    """Bounded hash -> id map shared by the writers of one process
+
+    Ids read inside a transaction are staged and only become shared on commit(): an
+    AUTO_INCREMENT id from a rolled-back insert must never be handed to a later block.
+    """
+
+    def __init__(self, size=ID_CACHE_SIZE):
+        self.size = size
+        self._ids = OrderedDict()
+        self._staged = {}
+
+    def get(self, key):
+        value = self._staged.get(key)
+        if value is not None:
+            return value
+        value = self._ids.get(key)
+        if value is not None:
+            self._ids.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._staged[key] = value
+
+    def commit(self):
+        for key, value in self._staged.items():
+            self._ids[key] = value
+            self._ids.move_to_end(key)
+        self._staged = {}
+        while len(self._ids) > self.size:
+            self._ids.popitem(last=False)
+
+    def discard(self):
+        self._staged = {}
+
+
+script_ids = IdCache()
+witness_ids = IdCache()
+
+
+def commit_cached_ids():
+    """Call after the transaction that stored scripts commits"""
+    script_ids.commit()
+    witness_ids.commit()
+
+
+def discard_cached_ids():
+    """Call after the transaction that stored scripts rolls back"""
+    script_ids.discard()
+    witness_ids.discard()
+
+
+_height_columns_checked = False
+
+
+def create_dedup_tables(cursor):
+    """Create the dedup tables (DDL commits implicitly, so call before any DML)"""
+    global _height_columns_checked
+    for ddl in DEDUP_DDL:
+        cursor.execute(ddl)
+    if _height_columns_checked:
+        return
+    # Tables created before rows carried their height
+    for table in HEIGHT_TABLES:
+        cursor.execute("""
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'height'
+        """, (table,))
+        if cursor.fetchone()[0] == 0:
+            print(f"🔧 Adding height column to {table}")
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN height INTEGER, ADD KEY idx_{table}_height (height)")
+    _height_columns_checked = True
+
+
+def unstore_height(cursor, height):
+    """Undo a height's output scripts and witnesses before it is re-ingested (retry or reorg)
+
+    Shared script/witness_item content stays; it is referenced by hash from other heights.
+    """
+    for table in HEIGHT_TABLES:
+        cursor.execute(f"DELETE FROM {table} WHERE height = %s", (height,))
+
+
+def _intern(cursor, table, hash_column, data_columns, items, cache):
+    """Insert unseen content rows and return {hash: id}; items is {hash: (data values...)}"""
+    ids = {}
+    missing = {}
+    for digest, values in items.items():
+        cached = cache.get(digest)
+        if cached is None:
+            missing[digest] = values
+        else:
+            ids[digest] = cached
+    if missing:
+        columns = [hash_column] + data_columns
+        cursor.executemany(
+            f"INSERT IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+            [(digest, *values) for digest, values in missing.items()],
+        )
+        digests = list(missing)
+        for offset in range(0, len(digests), 1000):
+            batch = digests[offset:offset + 1000]
+            cursor.execute(
+                f"SELECT {hash_column}, id FROM {table} WHERE {hash_column} IN ({', '.join(['%s'] * len(batch))})",
+                batch,
+            )
+            for digest, row_id in cursor.fetchall():
+                digest = bytes(digest)
+                ids[digest] = row_id
+                cache.put(digest, row_id)
+    return ids
+
+
+def store_mapped_scripts(cursor, mapped_data, height=None):
+    """Write output scripts and input witnesses of one mapped block in the dedup layout
+
+    `mapped_data` is the output of map_json_to_tables; vin/vout entries are (row, raw) tuples.
+    Ids are cached as staged; call commit_cached_ids/discard_cached_ids once the transaction ends.
+    """
+    scripts, outputs = {}, []
+    for vout_data, vout_raw in mapped_data.get("vout", []):
+        script = vout_raw.get("scriptPubKey")
+        if not script:
+            continue
+        script_bytes = bytes.fromhex(script.get("hex", ""))
+        digest = hashlib.sha256(script_bytes).digest()
+        address = script.get("address") or (script.get("addresses") or [None])[0]
+        scripts[digest] = (script_bytes, script.get("type"), address)
+        outputs.append((bytes.fromhex(vout_data["txid"]), vout_raw["n"], digest))
+
+    items, witnesses, vin_positions = {}, [], {}
+    for vin_data, vin_raw in mapped_data.get("vin", []):
+        txid = vin_data["txid"]
+        vin_n = vin_positions.get(txid, 0)
+        vin_positions[txid] = vin_n + 1
+        for position, item in enumerate(vin_raw.get("txinwitness", vin_raw.get("witness", [])) or []):
+            item_bytes = bytes.fromhex(item)
+            digest = hashlib.sha256(item_bytes).digest()
+            items[digest] = (item_bytes,)
+            witnesses.append((bytes.fromhex(txid), vin_n, position, digest))
+
+    ids = _intern(cursor, "script", "script_hash", ["script", "type", "address"], scripts, script_ids)
+    cursor.executemany(
+        "INSERT IGNORE INTO txout_script (txid, n, script_id, height) VALUES (%s, %s, %s, %s)",
+        [(txid, n, ids[digest], height) for txid, n, digest in outputs],
+    )
+    ids = _intern(cursor, "witness_item", "item_hash", ["data"], items, witness_ids)
+    cursor.executemany(
+        "INSERT IGNORE INTO txin_witness (txid, vin_n, position, witness_id, height) VALUES (%s, %s, %s, %s, %s)",
+        [(txid, vin_n, position, ids[digest], height) for txid, vin_n, position, digest in witnesses],
+    )
+    return len(outputs), len(scripts), len(witnesses)
+
+
+def load_output_scripts(cursor, height):
+    """{txid hex: {n: scriptPubKey dict}} for a height's outputs, with asm/desc derived on read"""
+    cursor.execute("""
+        SELECT o.txid, o.n, s.script, s.type, s.address
+        FROM txout_script o JOIN script s ON s.id = o.script_id
+        WHERE o.height = %s
+    """, (height,))
+    outputs = {}
+    for txid, n, script, script_type, address in cursor.fetchall():
+        script = bytes(script)
+        outputs.setdefault(bytes(txid).hex(), {})[n] = {
+            "asm": script_asm(script),
+            "desc": script_desc(script, script_type, address),
+            "hex": script.hex(),
+            "address": address,
+            "type": script_type,
+        }
+    return outputs
+
+
+def layout_bytes(blocks):
+    """Approximate stored bytes per block: TEXT script_pubkey/vin_witness rows vs the dedup layout"""
+    text_bytes = 0
+    dedup_bytes = 0
+    seen_scripts, seen_items = set(), set()
+    for block in blocks:
+        for tx in block.get("tx", []):
+            for vout in tx.get("vout", []):
+                script = vout.get("scriptPubKey", {})
+                text_bytes += 4 + sum(len(script.get(key, "") or "") for key in ("asm", "desc", "hex", "address", "type"))
+                dedup_bytes += 32 + 4 + 8  # txout_script row
+                raw = bytes.fromhex(script.get("hex", ""))
+                digest = hashlib.sha256(raw).digest()
+                if digest not in seen_scripts:
+                    seen_scripts.add(digest)
+                    dedup_bytes += 8 + 32 + len(raw) + len(script.get("type", "") or "") + len(script.get("address", "") or "")
+            for vin in tx.get("vin", []):
+                for item in vin.get("txinwitness", []) or []:
+                    text_bytes += 8 + len(item)
+                    dedup_bytes += 32 + 4 + 2 + 8  # txin_witness row
+                    raw = bytes.fromhex(item)
+                    digest = hashlib.sha256(raw).digest()
+                    if digest not in seen_items:
+                        seen_items.add(digest)
+                        dedup_bytes += 8 + 32 + len(raw)
+    count = max(len(blocks), 1)
+    return {
+        "text_bytes_per_block": text_bytes // count,
+        "dedup_bytes_per_block": dedup_bytes // count,
+        "unique_scripts": len(seen_scripts),
+        "unique_witness_items": len(seen_items),
+    }
+
+
+def benchmark_script_storage(text_conn, dedup_conn, mapped_blocks):
+    """Insert throughput of the TEXT script_pubkey/vin_witness rows vs the dedup layout
+
+    `text_conn` is a database created from block_info_schema.sql; the parent transaction,
+    vout and vin rows its foreign keys need are inserted first, outside the timing.
+    """
+    with text_conn.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM vout")
+        next_vout_id = cursor.fetchone()[0] + 1
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM vin")
+        next_vin_id = cursor.fetchone()[0] + 1
+        vout_ids, vin_ids = [], []
+        for mapped in mapped_blocks:
+            height = mapped.get("bitcoin_block", [{}])[0].get("height")
+            txids = sorted({row["txid"] for row, _ in mapped.get("vout", []) + mapped.get("vin", [])})
+            cursor.executemany("INSERT IGNORE INTO transaction (txid, height) VALUES (%s, %s)",
+                               [(txid, height) for txid in txids])
+            outputs = list(range(next_vout_id, next_vout_id + len(mapped.get("vout", []))))
+            cursor.executemany("INSERT INTO vout (id, txid, height, value, n) VALUES (%s, %s, %s, %s, %s)",
+                               [(vout_id, vout_data["txid"], height, raw.get("value"), raw.get("n"))
+                                for vout_id, (vout_data, raw) in zip(outputs, mapped.get("vout", []))])
+            inputs = list(range(next_vin_id, next_vin_id + len(mapped.get("vin", []))))
+            cursor.executemany("INSERT INTO vin (id, txid, height) VALUES (%s, %s, %s)",
+                               [(vin_id, vin_data["txid"], height)
+                                for vin_id, (vin_data, _) in zip(inputs, mapped.get("vin", []))])
+            vout_ids.append(outputs)
+            vin_ids.append(inputs)
+            next_vout_id += len(outputs)
+            next_vin_id += len(inputs)
+    text_conn.commit()
+
+    started = time.perf_counter()
+    outputs = 0
+    with text_conn.cursor() as cursor:
+        for mapped, block_vout_ids, block_vin_ids in zip(mapped_blocks, vout_ids, vin_ids):
+            for vout_id, (vout_data, vout_raw) in zip(block_vout_ids, mapped.get("vout", [])):
+                script = vout_raw.get("scriptPubKey", {})
+                cursor.execute(
+                    "INSERT INTO script_pubkey (vout_id, asm, description, hex, address, type) VALUES (%s, %s, %s, %s, %s, %s)",
+                    (vout_id, script.get("asm", ""), script.get("desc", ""), script.get("hex", ""),
+                     script.get("address"), script.get("type", "")),
+                )
+                outputs += 1
+            for vin_id, (vin_data, vin_raw) in zip(block_vin_ids, mapped.get("vin", [])):
+                for item in vin_raw.get("txinwitness", []) or []:
+                    cursor.execute("INSERT INTO vin_witness (vin_id, witness) VALUES (%s, %s)", (vin_id, item))
+    text_conn.commit()
+    text_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with dedup_conn.cursor() as cursor:
+        create_dedup_tables(cursor)
+        for mapped in mapped_blocks:
+            store_mapped_scripts(cursor, mapped, mapped.get("bitcoin_block", [{}])[0].get("height"))
+    dedup_conn.commit()
+    commit_cached_ids()
+    dedup_seconds = time.perf_counter() - started
+
+    report = {
+        "outputs": outputs,
+        "text_outputs_per_second": round(outputs / text_seconds, 1) if text_seconds else None,
+        "dedup_outputs_per_second": round(outputs / dedup_seconds, 1) if dedup_seconds else None,
+    }
+    print(f"⏱️ Script storage insert throughput: text={report['text_outputs_per_second']}/s, "
+          f"dedup={report['dedup_outputs_per_second']}/s")
+    return report
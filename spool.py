@@ -0,0 +1,207 @@
+import os
+import json
+import zlib
+import struct
+
+# Spool root (the fy-bitcoin-spool volume mount)
+SPOOL_DIR = os.getenv("SPOOL_DIR", "/spool")
+# A new segment file is started once the active one reaches this size
+SEGMENT_BYTES = 64 * 1024 * 1024
+ZLIB_LEVEL = 6
+
+# Record framing: sequence number, block height, payload length, CRC32 of the payload
+RECORD_HEADER = struct.Struct(">QIII")
+
+
+class BlockSpool:
+    """Append-only log of fetched blocks between the RPC fetch and the database write
+
+    Blocks are zlib-compressed JSON records in numbered segment files
+    (segments/<first seq>.log). Appends are fsync'd before they count as spooled, and a
+    torn record left by a crash mid-append is truncated on open. Each consumer keeps an
+    offset file that is atomically replaced after every block it has handled, so a crash
+    or database outage replays from the first unhandled block.
+    """
+
+    def __init__(self, root=SPOOL_DIR, segment_bytes=SEGMENT_BYTES):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.segment_dir = os.path.join(root, "segments")
+        self.offset_dir = os.path.join(root, "offsets")
+        os.makedirs(self.segment_dir, exist_ok=True)
+        os.makedirs(self.offset_dir, exist_ok=True)
+        self._recover()
+
+    def _segments(self):
+        return sorted(int(name[:-4]) for name in os.listdir(self.segment_dir) if name.endswith(".log"))
+
+    def _segment_path(self, first_seq):
+        return os.path.join(self.segment_dir, f"{first_seq:016d}.log")
+
+    def _scan(self, first_seq, position=0):
+        """Yield (seq, height, payload, end position) for the intact records of a segment"""
+        with open(self._segment_path(first_seq), "rb") as f:
+            f.seek(position)
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                seq, height, length, crc = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return
+                position += RECORD_HEADER.size + length
+                yield seq, height, payload, position
+
+    def _recover(self):
+        """Find the head of the log, dropping a torn tail record"""
+        self.next_seq = max([offset["seq"] for offset in self._offsets().values()] + [0])
+        self.last_height = self.last_hash = None
+        segments = self._segments()
+        if not segments:
+            return
+        active = segments[-1]
+        self.next_seq = max(self.next_seq, active)
+        end, last = 0, None
+        for seq, height, payload, position in self._scan(active):
+            end, last = position, (seq, height, payload)
+        path = self._segment_path(active)
+        if os.path.getsize(path) > end:
+            print(f"⚠️ Truncating torn spool record in {os.path.basename(path)} at byte {end}")
+            with open(path, "r+b") as f:
+                f.truncate(end)
+                os.fsync(f.fileno())
+        if last:
+            seq, self.last_height, payload = last
+            self.next_seq = seq + 1
+            self.last_hash = json.loads(zlib.decompress(payload))["hash"]
+
+    def append(self, blocks):
+        """Spool verbosity-2 blocks in order with a single fsync; returns the last sequence number"""
+        segments = self._segments()
+        active = segments[-1] if segments else None
+        if active is None or os.path.getsize(self._segment_path(active)) >= self.segment_bytes:
+            active = self.next_seq
+        path = self._segment_path(active)
+        created = not os.path.exists(path)
+        with open(path, "ab") as f:
+            for block in blocks:
+                payload = zlib.compress(json.dumps(block, separators=(",", ":")).encode(), ZLIB_LEVEL)
+                f.write(RECORD_HEADER.pack(self.next_seq, block["height"], len(payload), zlib.crc32(payload)))
+                f.write(payload)
+                self.next_seq += 1
+                self.last_height, self.last_hash = block["height"], block["hash"]
+            f.flush()
+            os.fsync(f.fileno())
+        if created:
+            _fsync_dir(self.segment_dir)
+        return self.next_seq - 1
+
+    def _offset_path(self, consumer):
+        return os.path.join(self.offset_dir, f"{consumer}.json")
+
+    def _offsets(self):
+        offsets = {}
+        for name in os.listdir(self.offset_dir):
+            if name.endswith(".json"):
+                with open(os.path.join(self.offset_dir, name)) as f:
+                    offsets[name[:-5]] = json.load(f)
+        return offsets
+
+    def load_offset(self, consumer):
+        """{"segment", "position", "seq"}: where `consumer` resumes (seq is the next record it reads)"""
+        path = self._offset_path(consumer)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        segments = self._segments()
+        first = segments[0] if segments else self.next_seq
+        return {"segment": first, "position": 0, "seq": first}
+
+    def commit(self, consumer, offset):
+        """Durably record that `consumer` has handled everything before `offset`"""
+        path = self._offset_path(consumer)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(offset, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def read(self, consumer):
+        """Yield (height, block, offset after it) from `consumer`'s offset to the head"""
+        offset = self.load_offset(consumer)
+        for first_seq in self._segments():
+            if first_seq < offset["segment"]:
+                continue
+            position = offset["position"] if first_seq == offset["segment"] else 0
+            for seq, height, payload, end in self._scan(first_seq, position):
+                yield height, json.loads(zlib.decompress(payload)), {"segment": first_seq, "position": end,
+                                                                     "seq": seq + 1}
+
+    def recent_hashes(self, min_height):
+        """{height: block hash} of the spooled blocks at or above `min_height`, newest record per height"""
+        hashes = {}
+        for first_seq in reversed(self._segments()):
+            records = [(height, payload) for _, height, payload, _ in self._scan(first_seq)]
+            for height, payload in reversed(records):
+                if height >= min_height and height not in hashes:
+                    hashes[height] = json.loads(zlib.decompress(payload))["hash"]
+            if any(height < min_height for height, _ in records):
+                break
+        return hashes
+
+    def depth(self, consumer):
+        """Spool depth metric: blocks and bytes not yet handled by `consumer`"""
+        offset = self.load_offset(consumer)
+        pending_bytes = 0
+        for first_seq in self._segments():
+            if first_seq >= offset["segment"]:
+                size = os.path.getsize(self._segment_path(first_seq))
+                pending_bytes += size - offset["position"] if first_seq == offset["segment"] else size
+        return {"blocks": self.next_seq - offset["seq"], "bytes": pending_bytes,
+                "segments": len(self._segments()), "head_height": self.last_height}
+
+    def trim(self):
+        """Delete segments every consumer has moved past (the active segment is always kept)"""
+        offsets = self._offsets()
+        if not offsets:
+            return 0
+        oldest = min(offset["segment"] for offset in offsets.values())
+        removed = 0
+        for first_seq in self._segments()[:-1]:
+            if first_seq < oldest:
+                os.remove(self._segment_path(first_seq))
+                removed += 1
+        return removed
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def drain(spool, write_block, consumer="writer", limit=None):
+    """Hand spooled blocks to `write_block` in order, committing the offset after each success
+
+    Stops at the first block `write_block` reports as failed, which stays spooled for the next run.
+    """
+    written = 0
+    for height, block, offset in spool.read(consumer):
+        try:
+            ok = write_block(block)
+        except Exception as e:
+            print(f"❌ Writing spooled block #{height} failed: {e}")
+            ok = False
+        if not ok:
+            print(f"⏸️ Leaving block #{height} and later in the spool")
+            break
+        spool.commit(consumer, offset)
+        written += 1
+        if limit and written >= limit:
+            break
+    spool.trim()
+    return written
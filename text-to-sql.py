@@ -1,9 +1,11 @@
 import os
+import time
 import pymysql
 from openai import OpenAI
 
-# Initialize OpenAI client
+# Initialize OpenAI client (OPENAI_BASE_URL points it at another OpenAI-compatible server)
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
 
 # Default database connection parameters
 DEFAULT_DB_CONFIG = {
@@ -14,6 +16,20 @@ DEFAULT_DB_CONFIG = {
     "port": int(os.getenv("DB_PORT", "3306"))
 }
 
+# Cold tier location (fy-bitcoin-cold volume), see cold_storage.py
+COLD_STORE_DIR = os.getenv("COLD_STORE_DIR", "/cold")
+
+# Query traffic goes to the read replicas in DB_READER_HOSTS (see db_router.py)
+_db_routers = {}
+
+def get_db_router(db_config=DEFAULT_DB_CONFIG):
+    """One pooled reader/writer router per database config"""
+    from db_router import DbRouter
+    key = tuple(sorted(db_config.items()))
+    if key not in _db_routers:
+        _db_routers[key] = DbRouter.from_config(db_config)
+    return _db_routers[key]
+
 def extract_schema(db_config=DEFAULT_DB_CONFIG):
     """Extract schema from MySQL database"""
     conn = pymysql.connect(
@@ -113,34 +129,73 @@ def extract_schema(db_config=DEFAULT_DB_CONFIG):
     
     return "\n\n".join(schema)
 
+def get_cold_horizon(db_config=DEFAULT_DB_CONFIG):
+    """Highest height whose transactions were moved to the cold tier (-1 if none)
+
+    Read from the cold_tier row tier_cold_blocks keeps in MySQL, so it is right without
+    the cold volume mounted; COLD_HORIZON only applies when the database can't be read.
+    """
+    from cold_storage import read_horizon
+    try:
+        with get_db_router(db_config).reader() as conn:
+            with conn.cursor() as cursor:
+                return read_horizon(cursor)
+    except Exception as e:
+        print(f"⚠️ Could not read the cold horizon: {e}")
+        return int(os.getenv("COLD_HORIZON", "-1"))
+
+def execute_cold_sql(sql, db_config=DEFAULT_DB_CONFIG):
+    """Execute SQL over the cold tier, locally if the volume is mounted, else on Modal"""
+    from cold_storage import ColdStore, execute_cold_sql as run_cold
+    try:
+        if os.path.isdir(COLD_STORE_DIR):
+            with get_db_router(db_config).reader() as conn:
+                result = run_cold(sql, conn, ColdStore(COLD_STORE_DIR))
+        else:
+            import modal
+            result = modal.Function.from_name("fy-db-auto-fetch-server", "cold_execute_sql").remote(sql)
+        return result if result else "Query returned no results"
+    except Exception as e:
+        return f"SQL execution error: {str(e)}"
+
 def execute_sql(sql, db_config=DEFAULT_DB_CONFIG):
-    """Execute SQL query on MySQL database"""
-    conn = pymysql.connect(
-        host=db_config["host"],
-        user=db_config["user"],
-        password=db_config["password"],
-        database=db_config["database"],
-        port=db_config["port"],
-        cursorclass=pymysql.cursors.DictCursor
-    )
-    
+    """Execute SQL query on MySQL database, or on the cold tier for old height ranges
+
+    A query over transaction-level tables that reaches below the cold horizon but not
+    entirely into it is answered from MySQL with a notice that cold heights are excluded.
+    """
+    from cold_storage import is_cold_query, spans_cold_horizon
+    horizon = get_cold_horizon(db_config)
+    if is_cold_query(sql, horizon):
+        return execute_cold_sql(sql, db_config)
+
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql)
-            result = cursor.fetchall()
-            return list(result) if result else "Query returned no results"
+        # Analytic queries run on a replica, never contending with block inserts on the primary
+        with get_db_router(db_config).reader() as conn:
+            with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+                cursor.execute(sql)
+                result = cursor.fetchall()
+                result = list(result) if result else "Query returned no results"
     except Exception as e:
         return f"SQL execution error: {str(e)}"
+    if spans_cold_horizon(sql, horizon):
+        return {"result": result,
+                "notice": f"Results exclude cold heights <= {horizon} (transactions, inputs and outputs "
+                          f"there live in the cold tier; ask about a range below {horizon + 1} to query them)"}
+    return result
+
+def timed(timings, stage, fn, *args):
+    """Call fn(*args), adding its wall time in seconds to timings[stage] if timings is given"""
+    started = time.perf_counter()
+    try:
+        return fn(*args)
     finally:
-        conn.close()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0) + time.perf_counter() - started
 
-def text_to_sql(nlq, db_config=DEFAULT_DB_CONFIG):
-    """Convert natural language query to SQL query"""
-    # Get database schema
-    db_schema = extract_schema(db_config)
-    
-    # Build system prompt
-    SYSTEM_PROMPT = f"""You are a SQL developer that is expert in Bitcoin and you answer natural language questions about the Bitcoin database in MySQL.
+def build_system_prompt(db_schema):
+    """System prompt for the SQL generator, given the extracted schema"""
+    return f"""You are a SQL developer that is expert in Bitcoin and you answer natural language questions about the Bitcoin database in MySQL.
 You always only respond with SQL statements that are correct for MySQL 8.0.
 The schema of the Bitcoin database is the following:
 
@@ -167,13 +222,21 @@ Guidelines:
    a. The 'time' field in bitcoin_block is a Unix timestamp (seconds since epoch)
    b. Use UNIX_TIMESTAMP() for current time comparisons
    c. For time intervals, subtract the appropriate number of seconds (e.g., 3600 for 1 hour, 86400 for 1 day)
+10. For fee, fee-rate, input/output count, output volume and SegWit questions, use the block_stats table:
+   a. It has one row per block keyed by height (blockhash matches bitcoin_block.hash) and also carries time and mediantime
+   b. Fees and values (totalfee, avgfee, medianfee, total_out, subsidy) are in satoshis; divide by 100000000 for BTC
+   c. Fee rates (avgfeerate, minfeerate, maxfeerate, feerate_p10..feerate_p90) are in sat/vB
+   d. SegWit share is swtxs / txs; ins and outs are input and output counts
+   e. Prefer block_stats over aggregating vin/vout, which may be unpopulated
 """
-    
+
+def generate_sql(system_prompt, nlq):
+    """Ask the model for the SQL answering `nlq`"""
     # Call OpenAI API
     completion = client.chat.completions.create(
-        model="gpt-4o",
+        model=OPENAI_MODEL,
         messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": system_prompt},
             {"role": "user", "content": nlq}
         ]
     )
@@ -182,11 +245,25 @@ Guidelines:
     sql = completion.choices[0].message.content
     return sql
 
+def text_to_sql(nlq, db_config=DEFAULT_DB_CONFIG, timings=None):
+    """Convert natural language query to SQL query"""
+    # Get database schema
+    db_schema = timed(timings, "schema", extract_schema, db_config)
+    
+    # Build system prompt
+    system_prompt = timed(timings, "prompt", build_system_prompt, db_schema)
+    
+    return timed(timings, "llm", generate_sql, system_prompt, nlq)
+
 def format_result_for_humans(result):
     """Format query results to be more human-readable"""
     # If result is already a string, return as is
     if isinstance(result, str):
         return result
+
+    # Partial result with a notice (see execute_sql)
+    if isinstance(result, dict) and "notice" in result:
+        return {"result": format_result_for_humans(result["result"]), "notice": result["notice"]}
         
     # If result is an empty list
     if not result:
@@ -209,17 +286,17 @@ def format_result_for_humans(result):
     # For all other cases return as is
     return result
 
-def natural_query_to_answer(query, db_config=DEFAULT_DB_CONFIG):
-    """Convert natural language query to answer"""
+def natural_query_to_answer(query, db_config=DEFAULT_DB_CONFIG, timings=None):
+    """Convert natural language query to answer; per-stage seconds go into `timings` if given"""
     # Convert natural language query to SQL query
-    sql = text_to_sql(query, db_config)
+    sql = text_to_sql(query, db_config, timings)
     print(f"Generated SQL: {sql}")
     
     # Execute SQL query and return results
-    raw_result = execute_sql(sql, db_config)
+    raw_result = timed(timings, "sql", execute_sql, sql, db_config)
     
     # Format result for human readability
-    formatted_result = format_result_for_humans(raw_result)
+    formatted_result = timed(timings, "format", format_result_for_humans, raw_result)
     return formatted_result
 
 # Example usage
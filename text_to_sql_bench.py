@@ -0,0 +1,353 @@
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+import threading
+import subprocess
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_PATH = os.path.join(HERE, "text_to_sql_fixtures.json")
+BASELINE_PATH = os.path.join(HERE, "text_to_sql_baseline.json")
+
+# Standard question corpus; recorded once against OpenAI + RDS, then replayed offline
+QUESTIONS = [
+    "What is the total number of blocks in the database?",
+    "What is the latest block hash?",
+    "How many transactions were in the latest block?",
+    "What was the average number of transactions per block over the last 100 blocks?",
+    "Which block in the database has the most transactions?",
+    "What was the median fee rate in the last 10 blocks?",
+    "What were the total fees paid in the last 144 blocks in BTC?",
+    "What share of transactions in the last 1000 blocks were SegWit?",
+    "How many blocks were mined in the last 24 hours?",
+    "What is the average time between blocks over the last 2016 blocks?",
+]
+
+# Reference SQL for the corpus, used to seed fixtures before a live recording exists
+SEED_SQL = {
+    QUESTIONS[0]: "SELECT MAX(height) + 1 AS total_blocks FROM bitcoin_block",
+    QUESTIONS[1]: "SELECT hash FROM bitcoin_block ORDER BY height DESC LIMIT 1",
+    QUESTIONS[2]: "SELECT nTx FROM bitcoin_block ORDER BY height DESC LIMIT 1",
+    QUESTIONS[3]: "SELECT AVG(nTx) AS avg_txs FROM (SELECT nTx FROM bitcoin_block ORDER BY height DESC LIMIT 100) b",
+    QUESTIONS[4]: "SELECT height, hash, nTx FROM bitcoin_block ORDER BY nTx DESC LIMIT 1",
+    QUESTIONS[5]: "SELECT AVG(feerate_p50) AS median_feerate FROM (SELECT feerate_p50 FROM block_stats "
+                  "ORDER BY height DESC LIMIT 10) s",
+    QUESTIONS[6]: "SELECT SUM(totalfee) / 100000000 AS total_fees_btc FROM (SELECT totalfee FROM block_stats "
+                  "ORDER BY height DESC LIMIT 144) s",
+    QUESTIONS[7]: "SELECT SUM(swtxs) / SUM(txs) AS segwit_share FROM (SELECT swtxs, txs FROM block_stats "
+                  "ORDER BY height DESC LIMIT 1000) s",
+    QUESTIONS[8]: "SELECT COUNT(*) AS blocks FROM bitcoin_block WHERE time >= UNIX_TIMESTAMP() - 86400",
+    QUESTIONS[9]: "SELECT (MAX(time) - MIN(time)) / (COUNT(*) - 1) AS avg_block_interval FROM (SELECT time "
+                  "FROM bitcoin_block ORDER BY height DESC LIMIT 2016) b",
+}
+SCHEMA_PATH = os.path.join(HERE, "block_info_schema.sql")
+
+STAGES = ["schema", "prompt", "llm", "sql", "format"]
+# A stage regresses when its median grows by more than this fraction over the baseline
+REGRESSION_THRESHOLD = 0.25
+
+
+def load_pipeline():
+    """Import text-to-sql.py (its file name is not importable as a module)"""
+    spec = importlib.util.spec_from_file_location("text_to_sql", os.path.join(HERE, "text-to-sql.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_replay_pipeline():
+    """load_pipeline for replays, which only talk to the stub model server
+
+    text-to-sql.py builds its OpenAI client at import time, which fails without a key,
+    so a placeholder is set when none is configured.
+    """
+    os.environ.setdefault("OPENAI_API_KEY", "replay")
+    return load_pipeline()
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _normalize(result):
+    """Comparable JSON form of a query result (Decimal, datetime and bytes become strings)"""
+    return json.loads(json.dumps(result, default=str))
+
+
+def explain(db_config, sql):
+    """EXPLAIN rows of a query as dicts (table, type, key, rows, Extra, ...)"""
+    import pymysql
+
+    conn = pymysql.connect(**db_config, cursorclass=pymysql.cursors.DictCursor)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {sql}")
+            return _normalize(cursor.fetchall())
+    except Exception as e:
+        return [{"error": str(e)}]
+    finally:
+        conn.close()
+
+
+def record(questions=QUESTIONS, fixtures_path=FIXTURES_PATH, db_config=None):
+    """Run the corpus against the live model and database and save every response as fixtures"""
+    pipeline = load_pipeline()
+    db_config = db_config or pipeline.DEFAULT_DB_CONFIG
+    schema = pipeline.extract_schema(db_config)
+    system_prompt = pipeline.build_system_prompt(schema)
+    fixtures = {"model": pipeline.OPENAI_MODEL, "schema": schema, "prompt_sha256": _digest(system_prompt),
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"), "questions": {}}
+    for question in questions:
+        started = time.perf_counter()
+        sql = pipeline.generate_sql(system_prompt, question)
+        llm_seconds = time.perf_counter() - started
+        fixtures["questions"][question] = {
+            "sql": sql,
+            "llm_seconds": round(llm_seconds, 3),
+            "result": _normalize(pipeline.execute_sql(sql, db_config)),
+            "plan": explain(db_config, sql),
+        }
+        print(f"📥 Recorded: {question}")
+    with open(fixtures_path, "w") as f:
+        json.dump(fixtures, f, indent=2, sort_keys=True)
+    print(f"✅ {len(questions)} questions recorded to {fixtures_path}")
+    return fixtures
+
+
+def seed(fixtures_path=FIXTURES_PATH, schema_path=SCHEMA_PATH):
+    """Write fixtures from SEED_SQL and the schema file, for replays before a live recording exists
+
+    Seeded fixtures carry no results, plans, model latency or prompt digest, so a replay of
+    them measures only the pipeline's own overhead. `record` replaces them.
+    """
+    import re
+
+    with open(schema_path) as f:
+        schema = "\n\n".join(re.findall(r"CREATE TABLE IF NOT EXISTS .*?\n\);", f.read(), re.DOTALL))
+    fixtures = {"model": None, "source": "seed", "schema": schema, "prompt_sha256": None, "recorded_at": None,
+                "questions": {question: {"sql": SEED_SQL[question], "llm_seconds": 0.0, "result": None, "plan": []}
+                              for question in QUESTIONS}}
+    with open(fixtures_path, "w") as f:
+        json.dump(fixtures, f, indent=2, sort_keys=True)
+    print(f"✅ {len(QUESTIONS)} seed questions written to {fixtures_path}")
+    return fixtures
+
+
+class StubOpenAI:
+    """OpenAI-compatible chat completions server answering from recorded fixtures
+
+    The user message selects the recorded SQL. `latency` is "none" (answer at once) or
+    "recorded" (sleep as long as the live call took).
+    """
+
+    def __init__(self, fixtures, latency="none"):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.prompt_mismatches = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                messages = {message["role"]: message["content"] for message in body["messages"]}
+                recorded = stub.fixtures["questions"].get(messages.get("user"))
+                if recorded is None:
+                    self.send_error(404, "Question not in fixtures")
+                    return
+                recorded_prompt = stub.fixtures.get("prompt_sha256")
+                if recorded_prompt and _digest(messages.get("system", "")) != recorded_prompt:
+                    stub.prompt_mismatches.add(messages.get("user"))
+                if stub.latency == "recorded":
+                    time.sleep(recorded["llm_seconds"])
+                payload = json.dumps({
+                    "id": "chatcmpl-replay", "object": "chat.completion", "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": recorded["sql"]}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] if ordered else None
+
+
+def _stage_summary(runs):
+    summary = {}
+    for stage in STAGES + ["total"]:
+        values = [run[stage] for run in runs if stage in run]
+        if values:
+            summary[stage] = {"p50_ms": round(_percentile(values, 0.5) * 1000, 2),
+                              "p95_ms": round(_percentile(values, 0.95) * 1000, 2),
+                              "mean_ms": round(sum(values) / len(values) * 1000, 2)}
+    return summary
+
+
+def replay(fixtures_path=FIXTURES_PATH, db_config=None, repeats=3, concurrency=(1, 4, 16), latency="none"):
+    """Replay the recorded corpus through the stub model server
+
+    With `db_config` (a local MySQL loaded with the same data) schema extraction, SQL
+    execution and EXPLAIN run for real; without it they are answered from the fixtures,
+    so only the pipeline's own overhead is measured.
+    """
+    import openai
+
+    with open(fixtures_path) as f:
+        fixtures = json.load(f)
+    pipeline = load_replay_pipeline()
+    questions = list(fixtures["questions"])
+    live_db = db_config is not None
+    if live_db:
+        # Keep every query on the local database, whatever DB_READER_HOSTS says
+        from db_router import DbRouter
+        pipeline._db_routers[tuple(sorted(db_config.items()))] = DbRouter.from_config(db_config, hosts="")
+    else:
+        pipeline.extract_schema = lambda db_config: fixtures["schema"]
+        pipeline.execute_sql = lambda sql, db_config: next(
+            (q["result"] for q in fixtures["questions"].values() if q["sql"] == sql), "Query returned no results")
+        db_config = pipeline.DEFAULT_DB_CONFIG
+
+    # The pipeline prints every generated SQL; keep that out of the report
+    with StubOpenAI(fixtures, latency) as stub, contextlib.redirect_stdout(io.StringIO()):
+        pipeline.client = openai.OpenAI(base_url=stub.base_url, api_key="replay")
+
+        def run(question):
+            timings = {}
+            started = time.perf_counter()
+            answer = pipeline.natural_query_to_answer(question, db_config, timings)
+            timings["total"] = time.perf_counter() - started
+            return question, timings, answer
+
+        runs, mismatches = [], set()
+        for _ in range(repeats):
+            for question, timings, answer in map(run, questions):
+                runs.append(timings)
+                expected = pipeline.format_result_for_humans(fixtures["questions"][question]["result"])
+                if _normalize(answer) != _normalize(expected):
+                    mismatches.add(question)
+
+        throughput = {}
+        for workers in concurrency:
+            batch = questions * repeats
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(run, batch))
+            throughput[str(workers)] = round(len(batch) / (time.perf_counter() - started), 2)
+
+        prompt_mismatches = sorted(stub.prompt_mismatches)
+
+    plans = {question: (explain(db_config, recorded["sql"]) if live_db else recorded["plan"])
+             for question, recorded in fixtures["questions"].items()}
+    return {
+        "commit": _git_commit(),
+        "fixtures_sha256": _digest(json.dumps(fixtures, sort_keys=True)),
+        "mode": "local-db" if live_db else "fixtures",
+        "llm_latency": latency,
+        "questions": len(questions),
+        "stages": _stage_summary(runs),
+        "throughput_qps": throughput,
+        "result_mismatches": sorted(mismatches),
+        "prompt_changed": prompt_mismatches,
+        "full_scans": {question: [row.get("table") for row in plan if row.get("type") == "ALL"]
+                       for question, plan in plans.items() if any(row.get("type") == "ALL" for row in plan)},
+        "plans": plans,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=HERE).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report, baseline):
+    """Print stage medians and throughput against a baseline report; returns regressed stages"""
+    regressions = []
+    print(f"⏱️ {report['commit']} vs {baseline.get('commit')} ({report['mode']}, {report['questions']} questions)")
+    for stage, summary in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage, {}).get("p50_ms")
+        marker = ""
+        if previous and summary["p50_ms"] > previous * (1 + REGRESSION_THRESHOLD):
+            regressions.append(stage)
+            marker = f" ❌ regressed from {previous} ms"
+        print(f"    {stage:>7}: p50 {summary['p50_ms']:>9} ms  p95 {summary['p95_ms']:>9} ms{marker}")
+    for workers, qps in report["throughput_qps"].items():
+        previous = baseline.get("throughput_qps", {}).get(workers)
+        print(f"    {workers:>3} workers: {qps} q/s" + (f" (was {previous})" if previous else ""))
+    for question in report["result_mismatches"]:
+        print(f"❌ Result differs from recording: {question}")
+    for question, tables in report["full_scans"].items():
+        if tables != baseline.get("full_scans", {}).get(question):
+            print(f"⚠️ Full scan of {', '.join(map(str, tables))}: {question}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record or replay the text-to-SQL benchmark corpus")
+    parser.add_argument("mode", choices=["record", "seed", "replay"])
+    parser.add_argument("--fixtures", default=FIXTURES_PATH)
+    parser.add_argument("--local-db", help="host:port of a local MySQL with the recorded data (replay)")
+    parser.add_argument("--latency", choices=["none", "recorded"], default="none")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--out", help="write the replay report as JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        record(fixtures_path=args.fixtures)
+        sys.exit(0)
+    if args.mode == "seed":
+        seed(fixtures_path=args.fixtures)
+        sys.exit(0)
+
+    local_db = None
+    if args.local_db:
+        host, _, port = args.local_db.partition(":")
+        local_db = dict(load_replay_pipeline().DEFAULT_DB_CONFIG, host=host, port=int(port or 3306))
+    result = replay(args.fixtures, local_db, args.repeats, latency=args.latency)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif not args.update_baseline:
+        print(f"⚠️ No baseline at {args.baseline}; recording this run as the baseline (commit it)")
+        args.update_baseline = True
+    regressed = compare(result, baseline)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"✅ Baseline written to {args.baseline}")
+    sys.exit(1 if regressed or result["result_mismatches"] else 0)
@@ -0,0 +1,66 @@
+import time
+import threading
+
+# How long a resolved tunnel url is trusted before it is refreshed
+TUNNEL_URL_TTL = 300
+# Refresh in the background once this fraction of the TTL has passed
+REFRESH_AHEAD = 0.8
+
+
+class TunnelUrlCache:
+    """In-memory TTL cache for the bitcoind tunnel url
+
+    `loader` is the slow lookup (modal.Dict or volume reload). Callers get the
+    cached url immediately; it is refreshed in the background before it expires
+    and dropped on connection failure so the next call reloads it.
+    """
+
+    def __init__(self, loader, ttl=TUNNEL_URL_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self._url = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _load(self):
+        url = self.loader()
+        with self._lock:
+            self._url = url
+            self._expires_at = time.time() + self.ttl
+        return url
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self._load()
+            except Exception as e:
+                print(f"❌ Background tunnel url refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get(self):
+        now = time.time()
+        with self._lock:
+            url, expires_at = self._url, self._expires_at
+        if url is None or now >= expires_at:
+            return self._load()
+        if now >= expires_at - self.ttl * (1 - REFRESH_AHEAD):
+            self._refresh_in_background()
+        return url
+
+    def invalidate(self):
+        with self._lock:
+            self._url = None
+            self._expires_at = 0
+
+    def __call__(self):
+        return self.get()
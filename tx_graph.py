@@ -0,0 +1,517 @@
+import os
+import json
+import time
+
+import numpy as np
+
+# Graph root (the fy-bitcoin-graph volume mount)
+TX_GRAPH_DIR = os.getenv("TX_GRAPH_DIR", "/graph")
+KEY_BYTES = 32
+
+# Edge logs, appended per block in height order. Node ids are dense indexes into the
+# txid / scripthash key files.
+# An output: funding tx pays an address
+OUTPUT_DTYPE = np.dtype([("tx", "<u4"), ("addr", "<u4"), ("value", "<i8"), ("height", "<u4")])
+# A spend: an output of fund_tx, held by addr, consumed by spend_tx
+SPEND_DTYPE = np.dtype([("fund_tx", "<u4"), ("addr", "<u4"), ("spend_tx", "<u4"), ("value", "<i8"),
+                        ("height", "<u4")])
+
+# Adjacency indexes: name -> (log, source field, target field, source nodes, target nodes)
+CSR_INDEXES = {
+    "tx_spent_by": ("spends", "fund_tx", "spend_tx", "txs", "txs"),
+    "tx_funded_by": ("spends", "spend_tx", "fund_tx", "txs", "txs"),
+    "tx_pays": ("outputs", "tx", "addr", "txs", "addresses"),
+    "tx_inputs_from": ("spends", "spend_tx", "addr", "txs", "addresses"),
+    "addr_received_in": ("outputs", "addr", "tx", "addresses", "txs"),
+    "addr_spent_in": ("spends", "addr", "spend_tx", "addresses", "txs"),
+}
+
+# Indexes are rebuilt once the edges appended since the last build exceed this fraction
+REBUILD_FRACTION = 0.05
+# Keys appended since the last sort are searched separately until there are this many
+KEY_TAIL_LIMIT = 50_000
+# Block hashes kept for the most recent synced heights, to find the fork point of a reorg
+HASH_HISTORY = 1000
+SYNC_BATCH_HEIGHTS = 1000
+
+
+def _prefixes(keys):
+    """First 8 bytes of each 32-byte key as big-endian integers (sort/search keys)"""
+    return np.ascontiguousarray(keys[:, :8]).view(">u8").ravel()
+
+
+def _as_keys(keys):
+    if isinstance(keys, np.ndarray):
+        return keys.reshape(-1, KEY_BYTES)
+    return np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(-1, KEY_BYTES)
+
+
+def _open_log(path, dtype):
+    count = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,)) if count else np.empty(0, dtype)
+
+
+def _append(path, data):
+    with open(path, "ab") as f:
+        f.write(np.ascontiguousarray(data).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _truncate(path, size):
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+            os.fsync(f.fileno())
+
+
+class KeyIndex:
+    """Dense ids for 32-byte keys (txids, scripthashes), in append order
+
+    Lookups binary-search a sorted array of 8-byte prefixes (confirming the full key),
+    plus a small separately sorted tail of keys appended since the last full sort.
+    """
+
+    def __init__(self, path, count):
+        self.path = path
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        _truncate(path, count * KEY_BYTES)
+        self._sorted_upto = 0
+        self._reload(resort=True)
+
+    def _reload(self, resort=False):
+        count = os.path.getsize(self.path) // KEY_BYTES
+        self.keys = (np.memmap(self.path, dtype=np.uint8, mode="r", shape=(count, KEY_BYTES)) if count
+                     else np.empty((0, KEY_BYTES), np.uint8))
+        if resort or count - self._sorted_upto > max(KEY_TAIL_LIMIT, REBUILD_FRACTION * count):
+            prefixes = _prefixes(self.keys)
+            self._order = np.argsort(prefixes, kind="stable")
+            self._sorted = prefixes[self._order]
+            self._sorted_upto = count
+        tail = _prefixes(self.keys[self._sorted_upto:])
+        self._tail_order = np.argsort(tail, kind="stable")
+        self._tail_sorted = tail[self._tail_order]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _search(self, sorted_prefixes, order, base, query, query_prefixes, ids):
+        pos = np.searchsorted(sorted_prefixes, query_prefixes)
+        pending = ids < 0
+        step = 0
+        # Walk runs of equal prefixes until the full key matches (collisions are rare)
+        while True:
+            at = pos + step
+            valid = pending & (at < len(sorted_prefixes))
+            valid[valid] &= sorted_prefixes[at[valid]] == query_prefixes[valid]
+            if not valid.any():
+                return
+            candidates = order[at[valid]] + base
+            match = (self.keys[candidates] == query[valid]).all(axis=1)
+            found = np.flatnonzero(valid)[match]
+            ids[found] = candidates[match]
+            pending[found] = False
+            step += 1
+
+    def lookup(self, keys):
+        """Ids of `keys` (list of bytes or (n, 32) uint8 array); -1 for unknown keys"""
+        query = _as_keys(keys)
+        ids = np.full(len(query), -1, dtype=np.int64)
+        if len(query) and len(self.keys):
+            query_prefixes = _prefixes(query)
+            self._search(self._sorted, self._order, 0, query, query_prefixes, ids)
+            self._search(self._tail_sorted, self._tail_order, self._sorted_upto, query, query_prefixes, ids)
+        return ids
+
+    def get_or_add(self, keys):
+        """Ids of `keys`, appending the unknown ones"""
+        query = _as_keys(keys)
+        if not len(query):
+            return np.empty(0, dtype=np.int64)
+        unique, inverse = np.unique(np.ascontiguousarray(query).view(f"V{KEY_BYTES}").ravel(), return_inverse=True)
+        unique = unique.view(np.uint8).reshape(-1, KEY_BYTES)
+        ids = self.lookup(unique)
+        new = ids < 0
+        if new.any():
+            ids[new] = np.arange(len(self.keys), len(self.keys) + new.sum())
+            _append(self.path, unique[new])
+            self._reload()
+        return ids[inverse.ravel()]
+
+    def key(self, node_id):
+        return bytes(self.keys[node_id])
+
+
+def connected_components(n, u, v):
+    """Component label (smallest member id) of n nodes joined by edges u[i]-v[i]
+
+    Vectorized union-find: hook each root to the smallest root it touches, then
+    pointer-jump until every node points at its root; repeat until no edge spans roots.
+    """
+    parent = np.arange(n, dtype=np.int64)
+    u, v = np.asarray(u, dtype=np.int64), np.asarray(v, dtype=np.int64)
+    while len(u):
+        root_u, root_v = parent[u], parent[v]
+        spanning = root_u != root_v
+        if not spanning.any():
+            break
+        u, v = u[spanning], v[spanning]
+        low = np.minimum(root_u[spanning], root_v[spanning])
+        high = np.maximum(root_u[spanning], root_v[spanning])
+        order = np.lexsort((low, high))
+        high, low = high[order], low[order]
+        first = np.ones(len(high), dtype=bool)
+        first[1:] = high[1:] != high[:-1]
+        parent[high[first]] = np.minimum(parent[high[first]], low[first])
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    return parent
+
+
+class TxGraph:
+    """Transaction/address flow graph in memory-mapped NumPy arrays
+
+    Edge logs grow per block; compressed sparse row (CSR) indexes over them are rebuilt
+    when enough new edges accumulate, and the unindexed tail is scanned on each query.
+    """
+
+    def __init__(self, directory=TX_GRAPH_DIR):
+        self.directory = directory
+        self.csr_dir = os.path.join(directory, "csr")
+        os.makedirs(self.csr_dir, exist_ok=True)
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.meta = {"height": -1, "hashes": {}, "outputs": 0, "spends": 0, "txs": 0, "addresses": 0, "csr": {}}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta.update(json.load(f))
+        legacy_hash = self.meta.pop("hash", None)
+        if legacy_hash:
+            self.meta["hashes"].setdefault(str(self.meta["height"]), legacy_hash)
+        # Anything written after the last meta update belongs to an interrupted append
+        for name, dtype in (("outputs", OUTPUT_DTYPE), ("spends", SPEND_DTYPE)):
+            _truncate(self._log_path(name), self.meta[name] * dtype.itemsize)
+        self.txs = KeyIndex(os.path.join(directory, "txids.bin"), self.meta["txs"])
+        self.addresses = KeyIndex(os.path.join(directory, "scripthashes.bin"), self.meta["addresses"])
+        self.refresh()
+
+    def _log_path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def refresh(self):
+        self.outputs = _open_log(self._log_path("outputs"), OUTPUT_DTYPE)
+        self.spends = _open_log(self._log_path("spends"), SPEND_DTYPE)
+        self._csr = {}
+        self._labels = None
+
+    def _save_meta(self):
+        self.meta.update(outputs=len(self.outputs), spends=len(self.spends), txs=len(self.txs),
+                         addresses=len(self.addresses))
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.meta_path)
+
+    # Ingestion
+
+    def append_block_edges(self, outputs, spends, height, block_hashes=None):
+        """Append edges up to `height`
+
+        `outputs` are (height, txid, scripthash, value) and `spends` are
+        (spent_height, txid, scripthash, spent_txid, value) rows, both in height order,
+        with 32-byte binary keys as stored in address_history. `block_hashes` maps the
+        appended heights to their block hashes.
+        """
+        if outputs:
+            heights, txids, scripthashes, values = zip(*outputs)
+            log = np.empty(len(outputs), OUTPUT_DTYPE)
+            log["tx"] = self.txs.get_or_add(list(txids))
+            log["addr"] = self.addresses.get_or_add(list(scripthashes))
+            log["value"], log["height"] = values, heights
+            _append(self._log_path("outputs"), log)
+        if spends:
+            heights, txids, scripthashes, spent_txids, values = zip(*spends)
+            log = np.empty(len(spends), SPEND_DTYPE)
+            log["fund_tx"] = self.txs.get_or_add(list(txids))
+            log["addr"] = self.addresses.get_or_add(list(scripthashes))
+            log["spend_tx"] = self.txs.get_or_add(list(spent_txids))
+            log["value"], log["height"] = values, heights
+            _append(self._log_path("spends"), log)
+        self.refresh()
+        hashes = self.meta["hashes"]
+        hashes.update((str(h), block_hash) for h, block_hash in (block_hashes or {}).items())
+        self.meta.update(height=height, hashes={h: block_hash for h, block_hash in hashes.items()
+                                                if int(h) > height - HASH_HISTORY})
+        self._save_meta()
+
+    def ingest_range(self, cursor, low, high):
+        """Append the address_history edges of heights [low, high]"""
+        cursor.execute("""
+            SELECT height, txid, scripthash, value FROM address_history
+            WHERE height BETWEEN %s AND %s ORDER BY height
+        """, (low, high))
+        outputs = cursor.fetchall()
+        cursor.execute("""
+            SELECT spent_height, txid, scripthash, spent_txid, value FROM address_history
+            WHERE spent_height BETWEEN %s AND %s ORDER BY spent_height
+        """, (low, high))
+        spends = cursor.fetchall()
+        cursor.execute("""
+            SELECT height, block_hash FROM ingestion_ledger
+            WHERE height BETWEEN %s AND %s
+        """, (max(low, high - HASH_HISTORY + 1), high))
+        self.append_block_edges(outputs, spends, high, dict(cursor.fetchall()))
+        return len(outputs), len(spends)
+
+    def unwind(self, height):
+        """Drop edges at `height` and above (node ids stay allocated)"""
+        for name, log in (("outputs", self.outputs), ("spends", self.spends)):
+            keep = int(np.searchsorted(log["height"], height)) if len(log) else 0
+            _truncate(self._log_path(name), keep * log.dtype.itemsize)
+        self.refresh()
+        hashes = {h: block_hash for h, block_hash in self.meta["hashes"].items() if int(h) < height}
+        self.meta.update(height=height - 1, hashes=hashes, csr={})
+        self._save_meta()
+
+    def fork_height(self, cursor):
+        """Lowest synced height whose block is no longer the ingested one, or None
+
+        Walks back from the graph tip until a kept hash matches the ledger; if none of
+        the kept hashes match, the fork is below them and the whole graph is rebuilt.
+        """
+        hashes = self.meta["hashes"]
+        if not hashes:
+            return None
+        cursor.execute("""
+            SELECT height, block_hash FROM ingestion_ledger
+            WHERE height BETWEEN %s AND %s AND status = 'done'
+        """, (min(map(int, hashes)), self.meta["height"]))
+        current = {str(height): block_hash for height, block_hash in cursor.fetchall()}
+        height = self.meta["height"]
+        while height >= 0 and str(height) in hashes:
+            if current.get(str(height)) == hashes[str(height)]:
+                return height + 1 if height < self.meta["height"] else None
+            height -= 1
+        print(f"⚠️ No kept block hash matches below #{self.meta['height']}, rebuilding the graph")
+        return 0
+
+    def complete_through(self, cursor, low, limit):
+        """Last height of the contiguous run of fully ingested heights from `low` (at most `limit` heights)
+
+        Heights are read from the ledger, so a height that was never queued stops the run
+        just like a pending one: spends written into address_history for it later would
+        otherwise land below the graph tip and be missed.
+        """
+        cursor.execute("""
+            SELECT height FROM ingestion_ledger
+            WHERE height BETWEEN %s AND %s AND status = 'done'
+            ORDER BY height
+        """, (low, low + limit - 1))
+        high = low - 1
+        for (height,) in cursor.fetchall():
+            if height != high + 1:
+                break
+            high = height
+        return high
+
+    def sync(self, cursor, batch_heights=SYNC_BATCH_HEIGHTS):
+        """Follow address_history up to the last height below which ingestion is complete"""
+        fork = self.fork_height(cursor)
+        if fork is not None:
+            print(f"🔀 Block #{fork} changed, unwinding {self.meta['height'] - fork + 1} heights")
+            self.unwind(fork)
+
+        low = self.meta["height"] + 1
+        while True:
+            high = self.complete_through(cursor, low, batch_heights)
+            if high < low:
+                break
+            outputs, spends = self.ingest_range(cursor, low, high)
+            print(f"🕸️ Graph heights {low}..{high}: {outputs} outputs, {spends} spends")
+            low = high + 1
+        self.build_indexes()
+        return self.meta["height"]
+
+    # Adjacency
+
+    def _node_count(self, kind):
+        return len(self.txs) if kind == "txs" else len(self.addresses)
+
+    def build_indexes(self, force=False):
+        """Rebuild the CSR indexes whose unindexed tail outgrew REBUILD_FRACTION"""
+        for name, (log_name, source, target, source_kind, _) in CSR_INDEXES.items():
+            log = getattr(self, log_name)
+            built = self.meta["csr"].get(name, 0)
+            if not force and built and len(log) - built <= REBUILD_FRACTION * len(log):
+                continue
+            counts = np.bincount(log[source], minlength=self._node_count(source_kind)) if len(log) else \
+                np.zeros(self._node_count(source_kind), dtype=np.int64)
+            indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=indptr[1:])
+            edges = np.argsort(log[source], kind="stable").astype(np.int64)
+            np.save(os.path.join(self.csr_dir, f"{name}.indptr.npy"), indptr)
+            np.save(os.path.join(self.csr_dir, f"{name}.edges.npy"), edges)
+            self.meta["csr"][name] = len(log)
+        self._save_meta()
+        self._csr = {}
+
+    def _index(self, name):
+        if name not in self._csr:
+            built = self.meta["csr"].get(name, 0)
+            if built:
+                indptr = np.load(os.path.join(self.csr_dir, f"{name}.indptr.npy"), mmap_mode="r")
+                edges = np.load(os.path.join(self.csr_dir, f"{name}.edges.npy"), mmap_mode="r")
+            else:
+                indptr, edges = np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64)
+            self._csr[name] = (indptr, edges, built)
+        return self._csr[name]
+
+    def expand(self, name, nodes):
+        """(edge positions in the log, target nodes) of every edge leaving `nodes`"""
+        log_name, source, target, _, _ = CSR_INDEXES[name]
+        log = getattr(self, log_name)
+        indptr, edges, built = self._index(name)
+        nodes = np.asarray(nodes, dtype=np.int64)
+        indexed = nodes[nodes < len(indptr) - 1]
+        starts, ends = indptr[indexed], indptr[indexed + 1]
+        counts = ends - starts
+        total = int(counts.sum())
+        # Gather every [start, end) slice of the edge array in one vectorized step
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        found = edges[positions] if total else np.empty(0, dtype=np.int64)
+        tail = log[built:]
+        if len(tail):
+            found = np.concatenate([found, built + np.flatnonzero(np.isin(tail[source], nodes))])
+        return found, log[target][found].astype(np.int64)
+
+    # Queries
+
+    def trace(self, txids, max_hops=5, direction="forward", max_txs=1_000_000):
+        """Breadth-first taint trace from `txids` through spending (or funding) transactions
+
+        Returns per-hop transaction counts and the value carried across each hop, and the
+        hop at which every reached transaction was first seen.
+        """
+        name = "tx_spent_by" if direction == "forward" else "tx_funded_by"
+        start = self.txs.lookup(txids)
+        start = start[start >= 0]
+        hop_of = np.full(len(self.txs), -1, dtype=np.int16)
+        hop_of[start] = 0
+        frontier, hops, reached = start, [], len(start)
+        for hop in range(1, max_hops + 1):
+            if not len(frontier) or reached >= max_txs:
+                break
+            positions, targets = self.expand(name, frontier)
+            new = np.unique(targets[hop_of[targets] < 0])
+            hop_of[new] = hop
+            hops.append({"hop": hop, "txs": len(new),
+                         "value": int(self.spends["value"][positions].sum()) if len(positions) else 0})
+            frontier, reached = new, reached + len(new)
+        tainted = np.flatnonzero(hop_of >= 0)
+        return {"hops": hops, "reached": {self.txs.key(i).hex(): int(hop_of[i]) for i in tainted[:10_000]}}
+
+    def cluster_labels(self):
+        """Common-input-ownership clusters: addresses spent together in one transaction are merged"""
+        if self._labels is None:
+            spends = self.spends
+            order = np.argsort(spends["spend_tx"], kind="stable")
+            spend_tx, addr = spends["spend_tx"][order], spends["addr"][order]
+            together = spend_tx[1:] == spend_tx[:-1]
+            self._labels = connected_components(len(self.addresses), addr[:-1][together], addr[1:][together])
+        return self._labels
+
+    def cluster(self, scripthash, limit=1000):
+        """Size and members (scripthash hex) of the cluster containing an address"""
+        node = self.addresses.lookup([scripthash])[0]
+        if node < 0:
+            return None
+        labels = self.cluster_labels()
+        members = np.flatnonzero(labels == labels[node])
+        return {"size": len(members), "members": [self.addresses.key(i).hex() for i in members[:limit]]}
+
+    def k_hop(self, scripthash, k=2, direction="forward", limit=1000):
+        """Addresses within `k` payment hops of an address
+
+        Forward, a hop is address -> transaction it spent into -> addresses that
+        transaction paid; backward follows the same path against the flow.
+        """
+        steps = (("addr_spent_in", "tx_pays") if direction == "forward"
+                 else ("addr_received_in", "tx_inputs_from"))
+        node = self.addresses.lookup([scripthash])[0]
+        if node < 0:
+            return None
+        hop_of = np.full(len(self.addresses), -1, dtype=np.int16)
+        hop_of[node] = 0
+        frontier, hops = np.array([node]), []
+        for hop in range(1, k + 1):
+            _, txs = self.expand(steps[0], frontier)
+            _, addresses = self.expand(steps[1], np.unique(txs))
+            new = np.unique(addresses[hop_of[addresses] < 0])
+            hop_of[new] = hop
+            hops.append({"hop": hop, "txs": len(np.unique(txs)), "addresses": len(new)})
+            frontier = new
+            if not len(frontier):
+                break
+        reached = np.flatnonzero(hop_of > 0)
+        return {"hops": hops,
+                "addresses": {self.addresses.key(i).hex(): int(hop_of[i]) for i in reached[:limit]}}
+
+    def stats(self):
+        return {"height": self.meta["height"], "txs": len(self.txs), "addresses": len(self.addresses),
+                "outputs": len(self.outputs), "spends": len(self.spends)}
+
+
+def synthetic_graph(directory, n_tx=500_000, inputs=2, outputs=2, n_addresses=200_000, txs_per_block=2000, seed=0):
+    """Fill a graph with random spends of earlier outputs (for benchmarks)"""
+    rng = np.random.default_rng(seed)
+    graph = TxGraph(directory)
+    txids = rng.integers(0, 256, size=(n_tx, KEY_BYTES), dtype=np.uint8)
+    scripthashes = rng.integers(0, 256, size=(n_addresses, KEY_BYTES), dtype=np.uint8)
+    txid_bytes = [bytes(row) for row in txids]
+    address_bytes = [bytes(row) for row in scripthashes]
+    owner = rng.integers(0, n_addresses, size=(n_tx, outputs))
+    unspent = []
+    for height, first in enumerate(range(0, n_tx, txs_per_block)):
+        block_outputs, block_spends = [], []
+        for tx in range(first, min(first + txs_per_block, n_tx)):
+            for _ in range(inputs if unspent else 0):
+                fund_tx, n = unspent.pop(rng.integers(len(unspent)))
+                block_spends.append((height, txid_bytes[fund_tx], address_bytes[owner[fund_tx, n]], txid_bytes[tx],
+                                     1000))
+            for n in range(outputs):
+                block_outputs.append((height, txid_bytes[tx], address_bytes[owner[tx, n]], 1000))
+                unspent.append((tx, n))
+        graph.append_block_edges(block_outputs, block_spends, height)
+    graph.build_indexes(force=True)
+    return graph
+
+
+def benchmark_graph(graph, samples=20, seed=0):
+    """Seconds for taint traces, k-hop queries and a full clustering pass"""
+    rng = np.random.default_rng(seed)
+    results = {"stats": graph.stats()}
+
+    tx_ids = rng.integers(0, len(graph.txs) // 2, size=samples)
+    started = time.perf_counter()
+    reached = [len(graph.trace([graph.txs.key(i)], max_hops=6)["reached"]) for i in tx_ids]
+    results["trace_6_hops_s"] = round((time.perf_counter() - started) / samples, 4)
+    results["trace_mean_reached"] = int(np.mean(reached))
+
+    address_ids = rng.integers(0, len(graph.addresses), size=samples)
+    started = time.perf_counter()
+    for i in address_ids:
+        graph.k_hop(graph.addresses.key(i), k=2)
+    results["k_hop_2_s"] = round((time.perf_counter() - started) / samples, 4)
+
+    graph._labels = None
+    started = time.perf_counter()
+    labels = graph.cluster_labels()
+    results["clustering_s"] = round(time.perf_counter() - started, 2)
+    results["clusters"] = int(len(np.unique(labels)))
+    print(f"⏱️ Graph benchmark: {results}")
+    return results